@@ -0,0 +1,234 @@
+"""
+Offline benchmark of the conversion steps that run after LaTeXML.
+
+For every fixture of the corpus (see `corpus.py`), the JATS to
+Markdown converters, `get_main_texfile` and `concat_metadata` are run
+`--repeat` times. The throughput, the peak memory of a single run and
+whether the Markdown matches the golden output are reported. No network
+access or LaTeXML installation is needed.
+
+    python benchmarks/bench_convert.py
+    python benchmarks/bench_convert.py --backend lxml --repeat 10
+    python benchmarks/bench_convert.py --json results.json
+    python benchmarks/bench_convert.py --update-golden
+
+The exit status is 1 if any output differs from its golden file.
+"""
+
+from pathlib import Path
+import argparse
+import difflib
+import gc
+import hashlib
+import json
+import sys
+import time
+import tracemalloc
+
+from arxiv2md._api import CONVERTERS, get_converter
+from arxiv2md._utils import get_main_texfile, concat_metadata
+
+from corpus import FIXTURES, FNAME_JATS, FNAME_METADATA, FNAME_MAIN_TEX
+from corpus import generate
+
+
+DPATH_GOLDEN = Path(__file__).parent / "golden"
+FNAME_HASHES = "hashes.json"
+DIFF_LINES = 40
+
+
+def _timeit(func, repeat):
+    gc.collect()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, min(times), sum(times)
+
+
+def _peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _load_hashes():
+    fpath = DPATH_GOLDEN / FNAME_HASHES
+    if not fpath.exists():
+        return {}
+    with open(fpath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _check_golden(name, markdown, hashes):
+    """Return None if `markdown` matches the golden output, else a diff."""
+    sha256 = hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+    if hashes.get(name, {}).get("sha256") == sha256:
+        return None
+
+    fpath_golden = DPATH_GOLDEN / f"{name}.md"
+    if not fpath_golden.exists():
+        if name not in hashes:
+            return "no golden output (run with --update-golden)"
+        return f"sha256 {sha256[:12]} != {hashes[name]['sha256'][:12]}"
+    golden = fpath_golden.read_text(encoding="utf-8")
+    diff = list(difflib.unified_diff(
+        golden.splitlines(), markdown.splitlines(),
+        f"golden/{name}.md", "output", lineterm="",
+    ))
+    if len(diff) > DIFF_LINES:
+        diff = diff[:DIFF_LINES] + [f"... ({len(diff) - DIFF_LINES} more)"]
+    return "\n".join(diff)
+
+
+def _update_golden(name, markdown, hashes, committed):
+    DPATH_GOLDEN.mkdir(exist_ok=True)
+    hashes[name] = {
+        "sha256": hashlib.sha256(markdown.encode("utf-8")).hexdigest(),
+    }
+    # Full outputs are only kept for the small fixtures
+    if committed:
+        (DPATH_GOLDEN / f"{name}.md").write_text(markdown, encoding="utf-8")
+
+
+def bench_fixture(name, backends, repeat):
+    dpath = generate(name)
+    size = (dpath / FNAME_JATS).stat().st_size
+    with open(dpath / FNAME_METADATA, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    rows, outputs = [], {}
+    for backend in backends:
+        converter = get_converter(backend)
+        convert = lambda: converter(dpath).convert_to_md()
+        markdown, best, total = _timeit(convert, repeat)
+        rows.append({
+            "fixture": name,
+            "step": f"convert[{backend}]",
+            "best": best,
+            "papers_per_s": repeat / total,
+            "mb_per_s": size * repeat / total / 1024 ** 2,
+            "peak_memory": _peak_memory(convert),
+        })
+        outputs[backend] = concat_metadata(markdown, metadata)
+
+    fpath_main, best, total = _timeit(
+        lambda: get_main_texfile(dpath, metadata["title"]), repeat
+    )
+    rows.append({
+        "fixture": name,
+        "step": "get_main_texfile",
+        "best": best,
+        "papers_per_s": repeat / total,
+        "mb_per_s": None,
+        "peak_memory": _peak_memory(
+            lambda: get_main_texfile(dpath, metadata["title"])
+        ),
+        "main_tex": fpath_main.name if fpath_main else None,
+    })
+
+    markdown = outputs[backends[0]]
+    _, best, total = _timeit(
+        lambda: concat_metadata(markdown, metadata), repeat
+    )
+    rows.append({
+        "fixture": name,
+        "step": "concat_metadata",
+        "best": best,
+        "papers_per_s": repeat / total,
+        "mb_per_s": None,
+        "peak_memory": None,
+    })
+    return rows, outputs
+
+
+def _format_row(row):
+    mb_per_s = f"{row['mb_per_s']:8.2f}" if row["mb_per_s"] else " " * 8
+    peak = (
+        f"{row['peak_memory'] / 1024 ** 2:9.1f}"
+        if row["peak_memory"] is not None else " " * 9
+    )
+    return (
+        f"{row['fixture']:<8} {row['step']:<18} {row['best'] * 1000:10.2f}"
+        f" {row['papers_per_s']:10.1f} {mb_per_s} {peak}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument(
+        "fixtures", nargs="*", default=list(FIXTURES),
+        help="The fixtures to run. Defaults to all of them.",
+    )
+    parser.add_argument(
+        "--backend", action="append", choices=list(CONVERTERS),
+        help="The converter backend to run. Can be given more than once. "
+        "Defaults to all of them.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--json", type=Path, dest="fpath_json",
+        help="Also write the results to this JSON file.",
+    )
+    parser.add_argument(
+        "--update-golden", action="store_true",
+        help="Store the current outputs as the golden outputs.",
+    )
+    args = parser.parse_args()
+    backends = args.backend or list(CONVERTERS)
+
+    hashes = _load_hashes()
+    results, failures = [], []
+    print(
+        f"{'fixture':<8} {'step':<18} {'best ms':>10} {'papers/s':>10}"
+        f" {'MB/s':>8} {'peak MiB':>9}"
+    )
+    for name in args.fixtures:
+        rows, outputs = bench_fixture(name, backends, args.repeat)
+        for row in rows:
+            print(_format_row(row))
+        results += rows
+
+        main_tex = next(
+            r["main_tex"] for r in rows if r["step"] == "get_main_texfile"
+        )
+        if main_tex != FNAME_MAIN_TEX:
+            failures.append((name, "get_main_texfile", f"picked {main_tex}"))
+
+        if args.update_golden:
+            _update_golden(
+                name, outputs[backends[0]], hashes, FIXTURES[name][2]
+            )
+            continue
+        for backend, markdown in outputs.items():
+            diff = _check_golden(name, markdown, hashes)
+            if diff:
+                failures.append((name, f"convert[{backend}]", diff))
+
+    if args.update_golden:
+        with open(DPATH_GOLDEN / FNAME_HASHES, "w", encoding="utf-8") as f:
+            json.dump(hashes, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Updated the golden outputs in {DPATH_GOLDEN}")
+
+    if args.fpath_json:
+        with open(args.fpath_json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"repeat": args.repeat, "results": results}, f, indent=2
+            )
+
+    for name, step, message in failures:
+        print(f"\nMISMATCH {name} {step}:\n{message}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Throughput of `normalize_ids` on a large list of arXiv IDs.
+
+Two lists of `--lines` lines are generated. `harvest` is like an OAI
+harvest: new-style IDs, some with a version or an `oai:arXiv.org:`
+prefix, old-style IDs and a few percent of duplicates. `mixed` also
+has a URL in every hundred lines and an invalid line in every
+thousand. Each list is read three times: line by line without parsing,
+as a reference for the I/O, with `parse_arxiv_id` on every line and a
+set of the IDs seen, and with `normalize_ids`. Lines/s and MB/s of
+each are reported. The IDs of both parsers must be equal.
+
+    python benchmarks/bench_ids.py
+    python benchmarks/bench_ids.py --lines 5000000 --repeat 5
+
+The exit status is 1 if the IDs differ.
+"""
+
+from pathlib import Path
+import argparse
+import random
+import sys
+import tempfile
+import time
+
+from arxiv2md._ids import parse_arxiv_id, normalize_ids
+
+
+ARCHIVES = ["hep-th", "hep-ph", "astro-ph", "cond-mat", "math", "quant-ph"]
+
+
+def _line(rnd: random.Random, i: int, mixed: bool) -> str:
+    kind = rnd.random()
+    if kind < 0.15:
+        yymm = f"{rnd.randint(92, 106) % 100:02d}{rnd.randint(1, 12):02d}"
+        arxiv_id = f"{rnd.choice(ARCHIVES)}/{yymm}{i % 1000:03d}"
+    else:
+        yymm = f"{rnd.randint(15, 25):02d}{rnd.randint(1, 12):02d}"
+        arxiv_id = f"{yymm}.{i % 100000:05d}"
+    if rnd.random() < 0.2:
+        arxiv_id += f"v{rnd.randint(1, 4)}"
+    if mixed and kind > 0.999:
+        return "not an ID"
+    if mixed and kind > 0.99:
+        return f"https://arxiv.org/pdf/{arxiv_id}.pdf"
+    if kind > 0.7:
+        return f"oai:arXiv.org:{arxiv_id}"
+    return arxiv_id
+
+
+def generate(fpath: Path, n_lines: int, mixed: bool) -> None:
+    rnd = random.Random(n_lines)
+    lines = []
+    for i in range(n_lines):
+        # A few percent of the lines repeat an earlier one
+        if lines and rnd.random() < 0.03:
+            lines.append(rnd.choice(lines[-1000:]))
+        else:
+            lines.append(_line(rnd, i, mixed))
+    fpath.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _read(fpath):
+    with open(fpath, "r", encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def _per_line(fpath):
+    parse = parse_arxiv_id.__wrapped__
+    arxiv_ids, seen = [], set()
+    with open(fpath, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                arxiv_id = str(parse(line.strip()))
+            except ValueError:
+                continue
+            if arxiv_id not in seen:
+                seen.add(arxiv_id)
+                arxiv_ids.append(arxiv_id)
+    return arxiv_ids
+
+
+def _normalize(fpath):
+    with open(fpath, "r", encoding="utf-8") as f:
+        return list(normalize_ids(f, on_invalid=lambda line: None))
+
+
+def _time(func, fpath, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(fpath)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'run':<24} {'s':>7} {'lines/s':>11} {'MB/s':>7} {'ids':>9}")
+    with tempfile.TemporaryDirectory() as tempdir:
+        for kind in ("harvest", "mixed"):
+            fpath = Path(tempdir) / f"{kind}.txt"
+            generate(fpath, args.lines, mixed=kind == "mixed")
+            size = fpath.stat().st_size / 2**20
+
+            results = {}
+            for name, func in (
+                ("read", _read),
+                ("parse per line", _per_line),
+                ("normalize_ids", _normalize),
+            ):
+                seconds, results[name] = _time(func, fpath, args.repeat)
+                n_ids = (
+                    len(results[name]) if isinstance(results[name], list)
+                    else "-"
+                )
+                print(
+                    f"{f'{kind} {name}':<24} {seconds:>7.2f}"
+                    f" {args.lines / seconds:>11.0f} {size / seconds:>7.1f}"
+                    f" {n_ids:>9}"
+                )
+            if results["normalize_ids"] != results["parse per line"]:
+                failures += 1
+                print(f"MISMATCH {kind}", file=sys.stderr)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
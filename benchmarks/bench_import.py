@@ -0,0 +1,119 @@
+"""
+Start-up time of the library and the CLI.
+
+Each case runs in `--repeat` fresh interpreters. The best and the
+median wall time of each case are reported, with the time of a bare
+interpreter for reference. The heavy dependencies must stay unloaded
+until a conversion needs them: every case checks that none of
+`DEFERRED` has been imported.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 20 --max-ms 150
+
+The exit status is 1 if a case loads a deferred module or, with
+`--max-ms`, takes longer than that beyond the bare interpreter.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Imported only by the stage that needs them
+DEFERRED = ("arxiv", "feedparser", "requests", "urllib3", "bs4", "halo")
+
+CASES = {
+    "python": "pass",
+    "import arxiv2md": "import arxiv2md",
+    "import arxiv2md.cli": "import arxiv2md.cli",
+    "arxiv2md --help": (
+        "from arxiv2md.cli import app\n"
+        "try:\n"
+        "    app(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+    "arxiv2md reconvert --help": (
+        "from arxiv2md.cli import app\n"
+        "try:\n"
+        "    app(['reconvert', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+    "arxiv2md serve --help": (
+        "from arxiv2md.cli import app\n"
+        "try:\n"
+        "    app(['serve', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+}
+
+# Prints the deferred modules that the case has loaded
+CHECK = (
+    "\nimport sys, json\n"
+    f"print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]),"
+    " file=sys.stderr)\n"
+)
+
+
+def _run(code):
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-c", code + CHECK],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(process.stderr.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--max-ms", type=float, default=None,
+        help="The time allowed for each case beyond a bare interpreter.",
+    )
+    args = parser.parse_args()
+
+    failures = 0
+    baseline = None
+    print(f"{'case':<28} {'best ms':>8} {'median ms':>10}  loaded")
+    for name, code in CASES.items():
+        times, loaded = [], []
+        for _ in range(args.repeat):
+            elapsed, loaded = _run(code)
+            times.append(elapsed)
+        best = min(times) * 1000
+        median = statistics.median(times) * 1000
+        print(
+            f"{name:<28} {best:>8.1f} {median:>10.1f}"
+            f"  {', '.join(loaded) or '-'}"
+        )
+
+        if baseline is None:
+            baseline = best
+            continue
+        if loaded:
+            failures += 1
+        if args.max_ms is not None and best - baseline > args.max_ms:
+            failures += 1
+            print(
+                f"SLOW {name}: {best - baseline:.1f} ms > {args.max_ms} ms",
+                file=sys.stderr,
+            )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Conversion of math-dense papers and the formula index.
+
+A paper of `--formulas` formulas is generated with MathML as deep as
+LaTeXML's (presentation MathML, content MathML and the TeX annotation
+of each formula), a fifth of them displayed. It is converted by each
+backend, and by a copy of the converters that searches as before:
+the whole MathML of every formula for its alttext, and the whole
+document for the abstract and the references. The time per paper of
+each and the time of `iter_formulas` are reported. The outputs of both
+must be equal, and the index must hold every formula.
+
+    python benchmarks/bench_math.py
+    python benchmarks/bench_math.py --formulas 50000 --repeat 5
+
+The exit status is 1 if an output or the index is wrong.
+"""
+
+from pathlib import Path
+from contextlib import contextmanager
+import argparse
+import random
+import sys
+import tempfile
+import time
+from xml.sax.saxutils import quoteattr
+
+from arxiv2md import _convert
+from arxiv2md._api import CONVERTERS
+from arxiv2md._convert_lxml import _find
+from arxiv2md._convert import FNAME_JATS
+from arxiv2md._math import iter_formulas
+
+
+FORMULAS_PER_PARAGRAPH = 8
+PARAGRAPHS_PER_SECTION = 20
+DISPLAY_RATIO = 0.2
+N_REFERENCES = 50
+TOKENS = ["x", "y", "i", "n", "α", "θ", "2", "1", "+", "="]
+
+
+def _mathml(rnd: random.Random, depth: int) -> str:
+    # A presentation tree with its content tree, as LaTeXML writes them
+    if depth == 0 or rnd.random() < 0.3:
+        token = rnd.choice(TOKENS)
+        tag = "mn" if token.isdigit() else "mo" if token in "+=" else "mi"
+        return f"<mml:{tag}>{token}</mml:{tag}>"
+    tag = rnd.choice(["mrow", "msub", "msup", "mfrac"])
+    children = "".join(_mathml(rnd, depth - 1) for _ in range(2))
+    return f"<mml:{tag}>{children}</mml:{tag}>"
+
+
+def _formula(rnd: random.Random, i: int, display: bool) -> str:
+    alttext = quoteattr(f"x_{{{i}}}^{{2}}+\\alpha_{{{i % 7}}}")
+    depth = 6 if display else 3
+    mode = "block" if display else "inline"
+    return (
+        f"<mml:math id=\"m{i}\" alttext={alttext} display=\"{mode}\">"
+        "<mml:semantics>"
+        f"{_mathml(rnd, depth)}"
+        "<mml:annotation-xml encoding=\"MathML-Content\">"
+        f"<mml:apply>{_mathml(rnd, depth)}</mml:apply>"
+        "</mml:annotation-xml>"
+        f"<mml:annotation encoding=\"application/x-tex\">{i}"
+        "</mml:annotation>"
+        "</mml:semantics></mml:math>"
+    )
+
+
+def generate(n_formulas: int) -> str:
+    rnd = random.Random(n_formulas)
+    sections, paragraphs = [], []
+    for i in range(n_formulas):
+        if rnd.random() < DISPLAY_RATIO:
+            paragraphs.append(
+                f"<disp-formula id=\"E{i}\">{_formula(rnd, i, True)}"
+                "</disp-formula>"
+            )
+        else:
+            paragraphs.append(
+                f"<p>Text before <inline-formula>{_formula(rnd, i, False)}"
+                "</inline-formula> and after.</p>"
+            )
+        if len(paragraphs) == FORMULAS_PER_PARAGRAPH * PARAGRAPHS_PER_SECTION:
+            n = len(sections) + 1
+            sections.append(
+                f"<sec id=\"S{n}\"><title>{n} Section</title>"
+                + "".join(paragraphs) + "</sec>"
+            )
+            paragraphs = []
+    n = len(sections) + 1
+    sections.append(
+        f"<sec id=\"S{n}\"><title>{n} Section</title>"
+        + "".join(paragraphs) + "</sec>"
+    )
+    return (
+        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+        "<article xmlns:mml=\"http://www.w3.org/1998/Math/MathML\">"
+        "<front><article-meta><title-group><article-title>Math"
+        "</article-title></title-group>"
+        "<abstract><p>An abstract.</p></abstract></article-meta></front>"
+        "<body>" + "".join(sections) + "</body>"
+        "<back><ref-list>" + "".join(
+            f"<ref id=\"bib.bib{i}\"><mixed-citation>Reference {i}."
+            "</mixed-citation></ref>"
+            for i in range(1, N_REFERENCES + 1)
+        ) + "</ref-list></back></article>\n"
+    )
+
+
+@contextmanager
+def _previous_find():
+    # The searches of the whole tree before they skipped the MathML
+    find_outside_math = _convert._find_outside_math
+    _convert._find_outside_math = lambda elem, name: elem.find(name)
+    try:
+        yield
+    finally:
+        _convert._find_outside_math = find_outside_math
+
+
+def _previous(cls):
+    # The lookup of the alttext before the fast path
+    class Previous(cls):
+        def _extract_math_text(self, formula_elem):
+            if cls.__name__ == "JATSConverter":
+                math_elem = formula_elem.find("math") or formula_elem
+            else:
+                math_elem = _find(formula_elem, "math")
+                if math_elem is None:
+                    math_elem = formula_elem
+            alttext = math_elem.get("alttext")
+            if alttext:
+                return self._clean_math_alttext(alttext)
+            return "[math]"
+
+    return Previous
+
+
+def _time(func, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument("--formulas", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tempdir:
+        dpath = Path(tempdir)
+        (dpath / FNAME_JATS).write_text(
+            generate(args.formulas), encoding="utf-8"
+        )
+        size = (dpath / FNAME_JATS).stat().st_size
+        print(f"{args.formulas} formulas, {size / 2**20:.1f} MiB of JATS")
+        print(f"{'run':<24} {'s':>8} {'formulas/s':>11} {'speed-up':>9}")
+
+        for backend, cls in CONVERTERS.items():
+            with _previous_find():
+                time_before, md_before = _time(
+                    lambda: _previous(cls)(dpath).convert_to_md(),
+                    args.repeat,
+                )
+            time_after, md_after = _time(
+                lambda: cls(dpath).convert_to_md(), args.repeat
+            )
+            if md_after != md_before:
+                failures += 1
+                print(f"MISMATCH {backend}", file=sys.stderr)
+            for name, seconds in (
+                (f"convert[{backend}] before", time_before),
+                (f"convert[{backend}]", time_after),
+            ):
+                print(
+                    f"{name:<24} {seconds:>8.2f}"
+                    f" {args.formulas / seconds:>11.0f}"
+                    f" {time_before / seconds:>8.2f}x"
+                )
+
+        time_index, formulas = _time(
+            lambda: list(iter_formulas(dpath)), args.repeat
+        )
+        if [f.id for f in formulas] != [f"m{i}" for i in range(args.formulas)]:
+            failures += 1
+            print("MISSING FORMULAS in the index", file=sys.stderr)
+        print(
+            f"{'iter_formulas':<24} {time_index:>8.2f}"
+            f" {args.formulas / time_index:>11.0f}"
+        )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Throughput of the JATS to Markdown stage with threads and processes.
+
+A batch of `--papers` papers, cycling through the corpus fixtures (see
+`corpus.py`), is converted once by a thread pool, as the batch API does
+by default, and once by a `ConverterPool` of each size given with
+`--processes`. Papers per second, the speed-up over the threads and
+the start-up time of the pool (including the warm-up of its workers)
+are reported. Every output is compared with a serial conversion.
+
+    python benchmarks/bench_pool.py
+    python benchmarks/bench_pool.py paper --papers 256 --processes 8 16 64
+
+The exit status is 1 if any output differs from the serial one.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from arxiv2md._api import CONVERTERS, get_converter
+from arxiv2md._pool import ConverterPool, CHUNKSIZE
+
+from corpus import FIXTURES
+from corpus import generate
+
+
+def _convert(dpath_work, backend):
+    return dpath_work, get_converter(backend)(dpath_work).convert_to_md()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument(
+        "fixtures", nargs="*", default=["letter", "paper"],
+        help="The fixtures to convert. Defaults to letter and paper.",
+    )
+    parser.add_argument("--papers", type=int, default=64)
+    parser.add_argument(
+        "--processes", type=int, nargs="+",
+        default=sorted({1, os.cpu_count() or 1}),
+    )
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backend", choices=CONVERTERS, default="bs4")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    unknown = set(args.fixtures) - set(FIXTURES)
+    if unknown:
+        parser.error(f"unknown fixtures: {', '.join(sorted(unknown))}")
+    dpaths = [generate(name) for name in args.fixtures]
+    expected = dict(_convert(d, args.backend) for d in dpaths)
+    batch = [dpaths[i % len(dpaths)] for i in range(args.papers)]
+
+    failures = 0
+    print(f"{'runner':<16} {'start s':>8} {'papers/s':>9} {'speed-up':>9}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        outputs = list(pool.map(_convert, batch, [args.backend] * len(batch)))
+    time_threads = time.perf_counter() - start
+    failures += sum(md != expected[d] for d, md in outputs)
+    print(
+        f"{f'{args.threads} threads':<16} {0:>8.2f}"
+        f" {args.papers / time_threads:>9.1f} {1:>8.1f}x"
+    )
+
+    for processes in args.processes:
+        start = time.perf_counter()
+        with ConverterPool(processes, (args.backend,)) as pool:
+            # Wait for every worker to have warmed up
+            list(pool.map([dpaths[0]] * processes, args.backend, chunksize=1))
+            time_start = time.perf_counter() - start
+
+            start = time.perf_counter()
+            outputs = list(pool.map(
+                batch, args.backend, chunksize=args.chunksize
+            ))
+            elapsed = time.perf_counter() - start
+        for dpath, md, error in outputs:
+            if error is not None or md != expected[dpath]:
+                failures += 1
+                print(f"MISMATCH {dpath.name}: {error}", file=sys.stderr)
+        print(
+            f"{f'{processes} processes':<16} {time_start:>8.2f}"
+            f" {args.papers / elapsed:>9.1f}"
+            f" {time_threads / elapsed:>8.1f}x"
+        )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Cost of restarting a large batch with `arxiv2md_resume`.
+
+A journal of `--papers` papers is generated as an interrupted run
+leaves it: most papers done, some failed for good or with a transient
+error, earlier attempts of a few papers and a line cut off at the end.
+The output files of the done papers are created empty. Then the batch
+is started again with `arxiv2md_batch` replaced by a stub, so only the
+journal is read and the papers are sorted into skipped and pending,
+once for the whole batch and once per shard of `--shards`. The time of
+each and the papers/s are reported. Every paper must be skipped or
+pending as the journal says, and the shards must split the batch.
+
+    python benchmarks/bench_resume.py
+    python benchmarks/bench_resume.py --papers 1000000 --shards 16
+
+The exit status is 1 if a paper is sorted wrongly.
+"""
+
+from pathlib import Path
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+
+from arxiv2md import _journal
+from arxiv2md._ids import file_safe_id
+
+
+def generate(dpath: Path, n_papers: int):
+    # The journal, the output files and the papers to be converted again
+    rnd = random.Random(n_papers)
+    arxiv_ids = [
+        f"{rnd.randint(15, 25):02d}{rnd.randint(1, 12):02d}.{i % 100000:05d}"
+        for i in range(n_papers)
+    ]
+    arxiv_ids = list(dict.fromkeys(arxiv_ids))
+    pending = set()
+    lines = []
+    for arxiv_id in arxiv_ids:
+        kind = rnd.random()
+        record = {
+            "arxiv_id": arxiv_id, "url": arxiv_id, "status": "done",
+            "attempt": 1, "output": None, "error": None,
+            "transient": False, "time": 0.0,
+            "stages": {"metadata": 0.1, "download": 0.5, "latexml": 4.0},
+        }
+        if kind < 0.05:
+            lines.append(json.dumps({
+                **record, "status": "failed", "error": "timed out",
+                "transient": True,
+            }))
+        if kind < 0.02:
+            record.update(status="failed", error="LaTeXML failed")
+        elif kind < 0.1:
+            record.update(status="failed", error="reset", transient=True)
+            pending.add(arxiv_id)
+        else:
+            record["output"] = f"arxiv_{file_safe_id(arxiv_id)}.md"
+            (dpath / record["output"]).touch()
+        lines.append(json.dumps(record))
+    fpath_journal = dpath / "journal.jsonl"
+    fpath_journal.write_text(
+        "\n".join(lines) + "\n" + lines[-1][:20], encoding="utf-8"
+    )
+    return arxiv_ids, fpath_journal, pending
+
+
+def _resume(arxiv_ids, dpath, fpath_journal, shard):
+    # The papers handed to the batch are collected, not converted, and
+    # the journal is left as it is, so that every run reads the same
+    pending = set()
+
+    def stub_batch(urls, **batch_options):
+        pending.update(urls)
+        return iter(())
+
+    journal = fpath_journal.read_bytes()
+    _journal.arxiv2md_batch = stub_batch
+    try:
+        skipped = {
+            result.arxiv_id for result in _journal.arxiv2md_resume(
+                arxiv_ids, dpath, fpath_journal, shard=shard,
+            )
+        }
+        return skipped, pending
+    finally:
+        fpath_journal.write_bytes(journal)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument("--papers", type=int, default=200_000)
+    parser.add_argument("--shards", type=int, default=4)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tempdir:
+        dpath = Path(tempdir)
+        arxiv_ids, fpath_journal, expected = generate(dpath, args.papers)
+        size = fpath_journal.stat().st_size / 2**20
+        print(
+            f"{len(arxiv_ids)} papers, {len(expected)} pending, "
+            f"{size:.1f} MiB of journal"
+        )
+        print(f"{'run':<16} {'s':>7} {'papers/s':>10}")
+
+        start = time.perf_counter()
+        skipped, pending = _resume(arxiv_ids, dpath, fpath_journal, None)
+        seconds = time.perf_counter() - start
+        print(
+            f"{'whole batch':<16} {seconds:>7.2f}"
+            f" {len(arxiv_ids) / seconds:>10.0f}"
+        )
+        if pending != expected or len(skipped) + len(pending) != len(
+            arxiv_ids
+        ):
+            failures += 1
+            print("MISMATCH whole batch", file=sys.stderr)
+
+        sharded = []
+        for index in range(args.shards):
+            start = time.perf_counter()
+            skipped, pending = _resume(
+                arxiv_ids, dpath, fpath_journal, (index, args.shards)
+            )
+            seconds = time.perf_counter() - start
+            sharded.append(skipped | pending)
+            print(
+                f"{f'shard {index}/{args.shards}':<16} {seconds:>7.2f}"
+                f" {len(arxiv_ids) / seconds:>10.0f}"
+            )
+        if sum(map(len, sharded)) != len(arxiv_ids) \
+                or set().union(*sharded) != set(arxiv_ids):
+            failures += 1
+            print("MISMATCH shards", file=sys.stderr)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Latency of `arxiv2md serve` against a process per request.
+
+`--requests` papers, all the `letter` fixture under different arXiv
+IDs, are converted one after the other by a fresh Python process each,
+as a caller without the service does, and by a `ConversionService`
+over HTTP (submit, then fetch the Markdown with `?wait=`). The service
+converts with a stub in place of arXiv and LaTeXML, so only the start-up
+and the JATS to Markdown stage are measured. The median latency and
+the requests per second of each are reported. Then `--clients` threads
+request the same paper at once, which must be converted only once.
+
+    python benchmarks/bench_serve.py
+    python benchmarks/bench_serve.py --requests 50 --clients 32
+
+The exit status is 1 if an output differs from a direct conversion or
+the concurrent requests are not coalesced.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from arxiv2md._api import CONVERTERS, _to_markdown
+from arxiv2md._server import ConversionService, make_server
+
+from corpus import generate
+
+
+PER_PROCESS = (
+    "import sys\n"
+    "from pathlib import Path\n"
+    "from arxiv2md._api import _to_markdown\n"
+    "sys.stdout.write(_to_markdown(Path(sys.argv[1]), sys.argv[2]))\n"
+)
+
+
+def _request(base_url, arxiv_id):
+    data = json.dumps({"id": arxiv_id}).encode("utf-8")
+    with urllib.request.urlopen(f"{base_url}/jobs", data) as response:
+        job = json.load(response)["job"]
+    url = f"{base_url}/jobs/{job}/markdown?wait=60"
+    with urllib.request.urlopen(url) as response:
+        return response.read().decode("utf-8")
+
+
+def _time(func, arxiv_ids):
+    times, outputs = [], []
+    for arxiv_id in arxiv_ids:
+        start = time.perf_counter()
+        outputs.append(func(arxiv_id))
+        times.append(time.perf_counter() - start)
+    return times, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--backend", choices=CONVERTERS, default="bs4")
+    args = parser.parse_args()
+
+    dpath_work = generate("letter")
+    expected = _to_markdown(dpath_work, args.backend)
+    arxiv_ids = [f"2101.{i:05d}" for i in range(args.requests)]
+    n_converted = 0
+
+    def convert(arxiv_id, cancel):
+        nonlocal n_converted
+        n_converted += 1
+        return _to_markdown(dpath_work, args.backend)
+
+    failures = 0
+    print(f"{'runner':<20} {'median ms':>10} {'req/s':>8} {'speed-up':>9}")
+
+    times_process, outputs = _time(
+        lambda _: subprocess.run(
+            [sys.executable, "-c", PER_PROCESS, dpath_work, args.backend],
+            capture_output=True, text=True, check=True,
+        ).stdout,
+        arxiv_ids,
+    )
+    failures += sum(output != expected for output in outputs)
+
+    service = ConversionService(
+        workers=1, convert=convert, frontmatter=False
+    )
+    with service:
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            times_service, outputs = _time(
+                lambda arxiv_id: _request(base_url, arxiv_id), arxiv_ids
+            )
+            failures += sum(output != expected for output in outputs)
+
+            n_converted = 0
+            with ThreadPoolExecutor(args.clients) as pool:
+                outputs = list(pool.map(
+                    lambda _: _request(base_url, "2102.00001"),
+                    range(args.clients),
+                ))
+            failures += sum(output != expected for output in outputs)
+            if n_converted != 1:
+                failures += 1
+                print(
+                    f"NOT COALESCED: {n_converted} conversions for "
+                    f"{args.clients} requests",
+                    file=sys.stderr,
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    base = statistics.median(times_process)
+    for name, times in (
+        ("process per request", times_process),
+        ("serve", times_service),
+    ):
+        median = statistics.median(times)
+        print(
+            f"{name:<20} {median * 1000:>10.1f}"
+            f" {len(times) / sum(times):>8.1f} {base / median:>8.1f}x"
+        )
+    print(f"{args.clients} identical requests: {n_converted} conversion(s)")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
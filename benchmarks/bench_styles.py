@@ -0,0 +1,194 @@
+"""
+Per-paper LaTeXML time with and without a `StyleStore`.
+
+Each paper is converted `--repeat` times by `tex2xml` without a style
+store, so that LaTeXML interprets its bundled style file as raw TeX,
+and as many times with a store that maps the style to a binding. The
+median time of each and the speed-up are reported. Unlike the other
+benchmarks, this one needs LaTeXML.
+
+By default, the papers are small documents that each bundle a
+generated stand-in for a conference style (`neurips_2023.sty`,
+`icml2024.sty`, `acl.sty`): a layout-heavy file of the size of the
+real ones, with a binding that defines only its commands. Real style
+files can be given with `--styles`, one paper is written for each of
+them, with the binding `<file>.ltxml` next to it if there is one:
+
+    python benchmarks/bench_styles.py
+    python benchmarks/bench_styles.py --styles ~/styles/*.sty --repeat 5
+
+The exit status is 1 if a conversion fails.
+"""
+
+from pathlib import Path
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+from arxiv2md._convert import tex2xml, ENGINES, LaTeXMLError
+from arxiv2md._styles import StyleStore, BINDING_SUFFIX
+
+
+STAND_INS = ("neurips_2023.sty", "icml2024.sty", "acl.sty")
+# Page layout, fonts and headings, repeated to the ~30 KiB of a real
+# conference style
+STAND_IN_BLOCK = r"""
+\setlength{\textwidth}{5.5in}
+\setlength{\textheight}{9in}
+\setlength{\oddsidemargin}{0pt}
+\setlength{\topmargin}{-0.5in}
+\def\@style@fontsize{\@setfontsize\normalsize{10}{11}}
+\renewcommand{\section}{\@startsection{section}{1}{\z@}%
+  {-2.0ex \@plus -0.5ex \@minus -0.2ex}{1.5ex \@plus 0.3ex}%
+  {\large\bf\raggedright}}
+\renewcommand{\subsection}{\@startsection{subsection}{2}{\z@}%
+  {-1.8ex \@plus -0.5ex \@minus -0.2ex}{0.8ex \@plus 0.2ex}%
+  {\normalsize\bf\raggedright}}
+\count@=\z@
+\loop\advance\count@\@ne\ifnum\count@<200\repeat
+"""
+STAND_IN_COMMANDS = r"""
+\newcommand{\And}{\and}
+\newcommand{\AND}{\and}
+\newcommand{\icmltitle}[1]{\title{#1}}
+\newcommand{\icmlauthor}[2]{\author{#1}}
+\newenvironment{icmlauthorlist}{}{}
+\newcommand{\aclfinalcopy}{}
+"""
+STAND_IN_BINDING = r"""
+package LaTeXML::Package::Pool;
+use strict;
+use warnings;
+use LaTeXML::Package;
+RawTeX(<<'EoTeX');
+\newcommand{\And}{\and}
+\newcommand{\AND}{\and}
+\newcommand{\icmltitle}[1]{\title{#1}}
+\newcommand{\icmlauthor}[2]{\author{#1}}
+\newenvironment{icmlauthorlist}{}{}
+\newcommand{\aclfinalcopy}{}
+EoTeX
+1;
+"""
+PAPER = r"""\documentclass{article}
+\usepackage{%s}
+\title{A Paper}
+\author{A. Author \And B. Author}
+\begin{document}
+\maketitle
+\section{Introduction}
+Some text with $x^{2}$ and a citation.
+\end{document}
+"""
+
+
+def _stand_in() -> str:
+    return (
+        "\\NeedsTeXFormat{LaTeX2e}\n\\makeatletter\n"
+        + STAND_IN_BLOCK * 150
+        + STAND_IN_COMMANDS
+        + "\\makeatother\n"
+    )
+
+
+def _write_paper(
+    dpath: Path,
+    fpath_style: Path | None,
+    fname: str,
+    store: StyleStore,
+) -> Tuple[Path, bool]:
+    # The source and whether the store has a binding for its style
+    dpath_source = dpath / "source"
+    dpath_source.mkdir(parents=True)
+    fpath_copy = dpath_source / fname
+    if fpath_style is None:
+        fpath_copy.write_text(_stand_in())
+        binding = STAND_IN_BINDING
+    else:
+        shutil.copy(fpath_style, fpath_copy)
+        fpath_binding = fpath_style.with_name(
+            fpath_style.name + BINDING_SUFFIX
+        )
+        binding = (
+            fpath_binding.read_text() if fpath_binding.exists() else None
+        )
+    if binding is not None:
+        store.add_binding(fpath_copy, binding)
+    (dpath_source / "main.tex").write_text(PAPER % Path(fname).stem)
+    return dpath_source, binding is not None
+
+
+def _time(dpath_source: Path, engine: str, store: StyleStore | None):
+    # A fresh copy for each run, so that no output is reused
+    with tempfile.TemporaryDirectory() as tempdir:
+        dpath_copy = Path(tempdir) / "source"
+        shutil.copytree(dpath_source, dpath_copy)
+        start = time.perf_counter()
+        tex2xml(
+            dpath_copy, "A Paper", False, engine=engine, style_store=store
+        )
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument(
+        "--styles", type=Path, nargs="+", default=None,
+        help="Style files to bundle with the papers.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engine", choices=ENGINES, default="latexml")
+    args = parser.parse_args()
+
+    if shutil.which("latexml") is None:
+        sys.exit("This benchmark needs LaTeXML: `latexml` is not on PATH.")
+
+    papers = (
+        [(fpath, fpath.name) for fpath in args.styles]
+        if args.styles else [(None, fname) for fname in STAND_INS]
+    )
+    failures = 0
+    print(
+        f"{'style':<24} {'binding':>8} {'raw s':>8} {'store s':>8}"
+        f" {'speed-up':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tempdir:
+        dpath_tmp = Path(tempdir)
+        store = StyleStore(dpath_tmp / "store")
+        for i, (fpath_style, fname) in enumerate(papers):
+            dpath_source, has_binding = _write_paper(
+                dpath_tmp / str(i), fpath_style, fname, store
+            )
+            binding = "yes" if has_binding else "no"
+            try:
+                times_raw = [
+                    _time(dpath_source, args.engine, None)
+                    for _ in range(args.repeat)
+                ]
+                times_store = [
+                    _time(dpath_source, args.engine, store)
+                    for _ in range(args.repeat)
+                ]
+            except LaTeXMLError as e:
+                failures += 1
+                print(f"FAILED {fname}: {e}", file=sys.stderr)
+                continue
+            raw = statistics.median(times_raw)
+            with_store = statistics.median(times_store)
+            print(
+                f"{fname:<24} {binding:>8} {raw:>8.2f} {with_store:>8.2f}"
+                f" {raw / with_store:>8.1f}x"
+            )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
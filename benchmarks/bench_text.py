@@ -0,0 +1,168 @@
+"""
+Micro-benchmark of the text cleanup of the JATS to Markdown converters.
+
+`_clean_text`, `_clean_paragraph` and `_clean_math_alttext` run on
+nearly every node. They are run on the text and the math alttext of
+the corpus fixtures (see `corpus.py`) and on edge cases, and compared
+with the previous regex-based implementations, kept below as the
+reference. The time of both and whether every output matches are
+reported.
+
+    python benchmarks/bench_text.py
+    python benchmarks/bench_text.py thesis --repeat 10
+
+The exit status is 1 if any output differs from the reference.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from arxiv2md._convert import JATSConverter
+
+from corpus import FIXTURES, FNAME_JATS
+from corpus import generate
+
+
+EDGE_CASES = [
+    "",
+    " ",
+    "\n\t  \r\n",
+    "  leading and trailing  ",
+    "non\u00a0breaking\u2009spaces\u3000here",
+    "separators\x1c\x1d\x1e\x1f\x85between",
+    "see [[^fn1]] and [[^fn2]][[^fn3]]",
+    "[[1], [2],\n [3]] and [[4]]",
+    "[[1],[2]] [[^a]] [[x]] [[]]",
+    "[[\u0661], [\u0662]] [[\uff11]]",
+    "[[1]",
+    "a &#10; b\n%c % d",
+    "&#1\n0; &#1%0; &#10&#10;;",
+    "\\frac{a}{b}%\n+c",
+    "%%%\n\n\n",
+]
+
+
+def _reference_clean_text(text):
+    if not text:
+        return ""
+    text = text.strip()
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\[\[(\^.*?)\]\]", r"[\1]", text)
+    return text
+
+
+def _reference_fix_citation_group(citation_text):
+    numbers = re.findall(r"\d+", citation_text)
+    return f"[{', '.join(numbers)}]"
+
+
+def _reference_clean_paragraph(processed_text):
+    processed_text = re.sub(
+        r"\[\[(\d+)\](?:,\s*\[(\d+)\])*\]",
+        lambda m: _reference_fix_citation_group(m.group(0)),
+        processed_text
+    )
+    return _reference_clean_text(processed_text)
+
+
+def _reference_clean_math_alttext(alttext):
+    if not alttext:
+        return ""
+
+    alttext = alttext.replace("&#10;", "")
+    alttext = alttext.replace("\n", "")
+    alttext = alttext.replace("%", "")
+    alttext = re.sub(r"\s+", " ", alttext)
+    return alttext.strip()
+
+
+def load_inputs(names):
+    """The text and the alttext of every element of the fixtures."""
+    texts, alttexts = list(EDGE_CASES), list(EDGE_CASES)
+    for name in names:
+        for elem in ET.parse(generate(name) / FNAME_JATS).iter():
+            if elem.text:
+                texts.append(elem.text)
+            if "alttext" in elem.attrib:
+                alttexts.append(elem.attrib["alttext"])
+
+    # Paragraphs as the converters join them, before the cleanup
+    rng = random.Random(0)
+    paragraphs = list(EDGE_CASES)
+    for i in range(0, len(texts), 8):
+        runs = texts[i:i + 8]
+        for _ in range(rng.randint(0, 3)):
+            group = ", ".join(
+                f"[{rng.randint(1, 600)}]" for _ in range(rng.randint(1, 4))
+            )
+            runs.insert(rng.randint(0, len(runs)), f" [{group}]")
+        if rng.random() < 0.3:
+            runs.append(f"[[^fn{i}]]")
+        paragraphs.append("\n".join(runs))
+    return texts, paragraphs, alttexts
+
+
+def _time(func, inputs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in inputs:
+            func(value)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip()
+    )
+    parser.add_argument(
+        "fixtures", nargs="*", default=list(FIXTURES),
+        help="The fixtures to take the inputs from. Defaults to all.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts, paragraphs, alttexts = load_inputs(args.fixtures)
+    # The cleanup does not use the parsed document
+    converter = JATSConverter.__new__(JATSConverter)
+    cases = [
+        ("_clean_text", texts,
+         _reference_clean_text, converter._clean_text),
+        ("_clean_paragraph", paragraphs,
+         _reference_clean_paragraph, converter._clean_paragraph),
+        ("_clean_math_alttext", alttexts,
+         _reference_clean_math_alttext, converter._clean_math_alttext),
+    ]
+
+    failures = 0
+    print(
+        f"{'function':<20} {'inputs':>8} {'reference ms':>13} {'ms':>9}"
+        f" {'speed-up':>9}"
+    )
+    for name, inputs, reference, func in cases:
+        for value in inputs:
+            if func(value) != reference(value):
+                failures += 1
+                print(
+                    f"MISMATCH {name}({value!r}): {func(value)!r} != "
+                    f"{reference(value)!r}",
+                    file=sys.stderr,
+                )
+        time_reference = _time(reference, inputs, args.repeat)
+        time_new = _time(func, inputs, args.repeat)
+        print(
+            f"{name:<20} {len(inputs):>8} {time_reference * 1000:>13.2f}"
+            f" {time_new * 1000:>9.2f} {time_reference / time_new:>8.1f}x"
+        )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
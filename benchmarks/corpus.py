@@ -0,0 +1,390 @@
+"""
+Deterministic generator of the benchmark corpus.
+
+Each fixture is a directory with the files the converter sees after a
+real run: the LaTeX source tree (a main file that `\\input`s its
+sections, plus a few other .tex files that must not be picked as the
+main one), the `paper.jats.xml` LaTeXML would have produced for it, and
+the `metadata.json` of the paper. The same seed always produces the
+same bytes, so the large fixtures do not need to be committed.
+
+    python benchmarks/corpus.py            # generate the missing fixtures
+    python benchmarks/corpus.py --force    # regenerate all of them
+"""
+
+from pathlib import Path
+import argparse
+import json
+import random
+from xml.sax.saxutils import escape, quoteattr
+
+
+DPATH_CORPUS = Path(__file__).parent / "corpus"
+FNAME_JATS = "paper.jats.xml"
+FNAME_METADATA = "metadata.json"
+FNAME_MAIN_TEX = "main.tex"
+
+# name: (pages, references, committed)
+FIXTURES = {
+    "letter": (4, 25, True),
+    "paper": (50, 120, False),
+    "thesis": (300, 600, False),
+    # A survey: a short text that cites a long reference list
+    "survey": (40, 1500, False),
+}
+
+PARAGRAPHS_PER_PAGE = 5
+PAGES_PER_SECTION = 4
+
+WORDS = """
+model models method data learning training network networks layer
+attention representation feature features input output sequence task
+tasks performance result results approach baseline baselines value
+values function loss gradient parameter parameters distribution sample
+samples error bound theorem lemma proof analysis experiment experiments
+set space matrix vector estimate estimator algorithm system signal
+structure graph node edge time step state policy reward agent prior
+posterior kernel operator dimension scale batch token encoder decoder
+the of and to in is that for we on with as by this are be an which our
+show propose consider observe find use obtain compare improve reduce
+large small simple efficient robust standard novel recent previous
+""".split()
+
+SURNAMES = """
+Smith Tanaka Müller Garcia Rossi Kowalski Nguyen Ivanov Dubois Chen
+Johansson O'Brien Novak Silva Kim Haddad Schmidt Kuznetsov Moreau Sato
+""".split()
+GIVEN_NAMES = """
+Alice Bob Carla David Eun-ji Fatima Gustav Hiro Ines Jamal Katarzyna
+Luis Marie Noah Olga Pierre Qi Rafael Sofia Tomás
+""".split()
+VENUES = [
+    "Advances in Neural Information Processing Systems",
+    "Journal of Machine Learning Research",
+    "Proceedings of the IEEE",
+    "Physical Review Letters",
+    "Annals of Statistics",
+    "arXiv preprint",
+]
+INLINE_MATH = [
+    r"x_{i}", r"\alpha+\beta", r"O(n\log n)", r"\mathbb{E}[X]",
+    r"f:\mathcal{X}\to\mathbb{R}", r"\|w\|_{2}^{2}", r"p(y|x)",
+    r"\sum_{k=1}^{K}a_{k}", r"\lambda\geq 0", r"d_{\text{model}}",
+]
+DISPLAY_MATH = [
+    r"\mathcal{L}(\theta)=-\sum_{i=1}^{N}\log p_{\theta}(y_{i}|x_{i})",
+    r"\mathrm{Attention}(Q,K,V)=\mathrm{softmax}\left(\frac{QK^{\top}}"
+    "{\\sqrt{d_{k}}}\\right)V % scaled\n",
+    r"\hat{\theta}=\operatorname*{arg\,min}_{\theta}\;\frac{1}{n}"
+    r"\sum_{i=1}^{n}\ell(f_{\theta}(x_{i}),y_{i})",
+    r"\nabla_{w}J(w)=\mathbb{E}_{\pi}\left[\nabla_{w}\log\pi(a|s)Q(s,a)"
+    r"\right]",
+]
+
+
+class _Paper:
+    """One generated paper, written both as LaTeX and as JATS."""
+
+    def __init__(self, name: str, pages: int, n_refs: int):
+        self.rnd = random.Random(name)
+        self.name = name
+        self.pages = pages
+        self.n_refs = n_refs
+        self.n_figures = 0
+        self.n_tables = 0
+        self.n_equations = 0
+        self.n_footnotes = 0
+        self.title = self._sentence(6, 10).rstrip(".").title()
+
+    def _words(self, n: int) -> list[str]:
+        return [self.rnd.choice(WORDS) for _ in range(n)]
+
+    def _sentence(self, low: int, high: int) -> str:
+        words = self._words(self.rnd.randint(low, high))
+        return " ".join(words).capitalize() + "."
+
+    def _paragraph(self) -> list[tuple[str, object]]:
+        # A paragraph is a list of (kind, value) runs
+        runs = []
+        for _ in range(self.rnd.randint(4, 7)):
+            runs.append(("text", self._sentence(8, 20) + " "))
+            roll = self.rnd.random()
+            if roll < 0.35:
+                runs.append(("math", self.rnd.choice(INLINE_MATH)))
+                runs.append(("text", " "))
+            elif roll < 0.55:
+                refs = sorted({
+                    self.rnd.randint(1, self.n_refs)
+                    for _ in range(self.rnd.randint(1, 3))
+                })
+                runs.append(("cite", refs))
+                runs.append(("text", " "))
+            elif roll < 0.65:
+                runs.append(("italic", " ".join(self._words(2))))
+                runs.append(("text", " "))
+            elif roll < 0.72:
+                runs.append(("bold", " ".join(self._words(2))))
+                runs.append(("text", " "))
+            elif roll < 0.76:
+                runs.append(("footnote", self._sentence(5, 12)))
+        return runs
+
+    # LaTeX
+
+    def _tex_paragraph(self, runs) -> str:
+        parts = []
+        for kind, value in runs:
+            if kind == "text":
+                parts.append(value)
+            elif kind == "math":
+                parts.append(f"${value}$")
+            elif kind == "cite":
+                parts.append(
+                    "\\cite{" + ",".join(f"ref{i}" for i in value) + "}"
+                )
+            elif kind == "italic":
+                parts.append(f"\\emph{{{value}}}")
+            elif kind == "bold":
+                parts.append(f"\\textbf{{{value}}}")
+            elif kind == "footnote":
+                parts.append(f"\\footnote{{{value}}}")
+        return "".join(parts).strip()
+
+    # JATS
+
+    def _jats_paragraph(self, runs) -> str:
+        parts = []
+        for kind, value in runs:
+            if kind == "text":
+                parts.append(escape(value))
+            elif kind == "math":
+                parts.append(
+                    "<inline-formula><mml:math alttext="
+                    f"{quoteattr(value)} display=\"inline\">"
+                    f"<mml:mi>{escape(value[0])}</mml:mi></mml:math>"
+                    "</inline-formula>"
+                )
+            elif kind == "cite":
+                xrefs = ", ".join(
+                    f"<xref rid=\"bib.bib{i}\">{i}</xref>" for i in value
+                )
+                parts.append(f"[{xrefs}]")
+            elif kind == "italic":
+                parts.append(f"<italic>{escape(value)}</italic>")
+            elif kind == "bold":
+                parts.append(f"<bold>{escape(value)}</bold>")
+            elif kind == "footnote":
+                self.n_footnotes += 1
+                parts.append(
+                    f"<fn id=\"id{self.n_footnotes}\">"
+                    f"<p>{escape(value)}</p></fn>"
+                )
+        return "<p>" + "".join(parts).strip() + "</p>"
+
+    def _jats_reference(self, i: int) -> str:
+        rnd = self.rnd
+        if rnd.random() < 0.15:
+            # Unstructured reference, as LaTeXML emits for plain \bibitem
+            text = escape(self._sentence(10, 20))
+            return (
+                f"<ref id=\"bib.bib{i}\"><mixed-citation>{text}"
+                "</mixed-citation></ref>"
+            )
+        names = "".join(
+            "<name><surname>"
+            + escape(rnd.choice(SURNAMES))
+            + "</surname><given-names>"
+            + escape(" ".join(
+                rnd.choice(GIVEN_NAMES) for _ in range(rnd.randint(1, 2))
+            ))
+            + "</given-names></name>"
+            for _ in range(rnd.randint(1, 6))
+        )
+        title = escape(self._sentence(5, 12).rstrip("."))
+        return (
+            f"<ref id=\"bib.bib{i}\"><mixed-citation>"
+            f"<person-group person-group-type=\"author\">{names}"
+            f"</person-group> <article-title>{title}</article-title>. "
+            f"<source>{escape(rnd.choice(VENUES))}</source> "
+            f"<year>{rnd.randint(1990, 2024)}</year>.</mixed-citation></ref>"
+        )
+
+    def _bib_entry(self, i: int) -> str:
+        return (
+            f"@article{{ref{i},\n"
+            f"  author = {{{self.rnd.choice(SURNAMES)}, "
+            f"{self.rnd.choice(GIVEN_NAMES)}}},\n"
+            f"  title = {{{self._sentence(5, 12).rstrip('.')}}},\n"
+            f"  journal = {{{self.rnd.choice(VENUES)}}},\n"
+            f"  year = {{{self.rnd.randint(1990, 2024)}}},\n"
+            "}\n"
+        )
+
+    def write(self, dpath: Path) -> None:
+        dpath_sections = dpath / "sections"
+        dpath_sections.mkdir(parents=True, exist_ok=True)
+
+        n_sections = max(2, self.pages // PAGES_PER_SECTION)
+        paragraphs_per_section = (
+            self.pages * PARAGRAPHS_PER_PAGE // n_sections
+        )
+        jats_body, inputs = [], []
+        for s in range(1, n_sections + 1):
+            title = self._sentence(2, 5).rstrip(".")
+            tex = [f"\\section{{{title}}}\n\\label{{sec:{s}}}\n"]
+            jats = [f"<sec id=\"S{s}\"><title>{s} {escape(title)}</title>"]
+            in_subsection = False
+            for k in range(paragraphs_per_section):
+                if k and k % PARAGRAPHS_PER_PAGE == 0:
+                    sub_title = self._sentence(2, 4).rstrip(".")
+                    tex.append(f"\\subsection{{{sub_title}}}\n")
+                    if in_subsection:
+                        jats.append("</sec>")
+                    in_subsection = True
+                    n_sub = k // PARAGRAPHS_PER_PAGE
+                    jats.append(
+                        f"<sec id=\"S{s}.SS{n_sub}\"><title>{s}.{n_sub} "
+                        f"{escape(sub_title)}</title>"
+                    )
+                runs = self._paragraph()
+                tex.append(self._tex_paragraph(runs) + "\n")
+                jats.append(self._jats_paragraph(runs))
+                roll = self.rnd.random()
+                if roll < 0.2:
+                    self.n_equations += 1
+                    math = self.rnd.choice(DISPLAY_MATH)
+                    tex.append(f"\\begin{{equation}}\n{math}\n\\end{{equation}}\n")
+                    jats.append(
+                        f"<disp-formula id=\"S{s}.E{self.n_equations}\">"
+                        f"<mml:math alttext={quoteattr(math)} "
+                        "display=\"block\"><mml:mi>L</mml:mi></mml:math>"
+                        "</disp-formula>"
+                    )
+                elif roll < 0.28:
+                    self.n_figures += 1
+                    caption = self._sentence(6, 14)
+                    tex.append(
+                        "\\begin{figure}\n\\centering\n"
+                        f"\\includegraphics{{fig{self.n_figures}.pdf}}\n"
+                        f"\\caption{{{caption}}}\n\\end{{figure}}\n"
+                    )
+                    jats.append(
+                        f"<fig id=\"S{s}.F{self.n_figures}\"><caption><p>"
+                        f"Figure {self.n_figures}: {escape(caption)}"
+                        "</p></caption></fig>"
+                    )
+                elif roll < 0.31:
+                    self.n_tables += 1
+                    caption = self._sentence(6, 14)
+                    tex.append(
+                        "\\begin{table}\n"
+                        f"\\caption{{{caption}}}\n"
+                        "\\begin{tabular}{lc}\nA & 1 \\\\\nB & 2\n"
+                        "\\end{tabular}\n\\end{table}\n"
+                    )
+                    jats.append(
+                        f"<table-wrap id=\"S{s}.T{self.n_tables}\"><caption>"
+                        f"<p>Table {self.n_tables}: {escape(caption)}</p>"
+                        "</caption></table-wrap>"
+                    )
+            if in_subsection:
+                jats.append("</sec>")
+            jats.append("</sec>")
+            jats_body.append("\n".join(jats))
+            fname = f"sec{s:03d}.tex"
+            (dpath_sections / fname).write_text("\n".join(tex), encoding="utf-8")
+            inputs.append(f"\\input{{sections/{fname[:-4]}}}")
+
+        abstract_runs = self._paragraph()
+        (dpath / FNAME_MAIN_TEX).write_text(
+            "\\documentclass[11pt]{article}\n"
+            "\\usepackage{amsmath,amssymb,graphicx}\n"
+            "\\input{macros}\n"
+            f"\\title{{{self.title}}}\n"
+            "\\author{A. Author \\and B. Author}\n"
+            "\\begin{document}\n"
+            "\\maketitle\n"
+            "\\begin{abstract}\n"
+            f"{self._tex_paragraph(abstract_runs)}\n"
+            "\\end{abstract}\n"
+            + "\n".join(inputs)
+            + "\n\\bibliographystyle{plain}\n\\bibliography{refs}\n"
+            "\\end{document}\n",
+            encoding="utf-8",
+        )
+        (dpath / "macros.tex").write_text(
+            "\\newcommand{\\R}{\\mathbb{R}}\n"
+            "\\newcommand{\\E}{\\mathbb{E}}\n"
+            "\\DeclareMathOperator*{\\argmin}{arg\\,min}\n",
+            encoding="utf-8",
+        )
+        # A standalone response letter shipped in the same tarball
+        (dpath / "response.tex").write_text(
+            "\\documentclass{letter}\n"
+            "\\begin{document}\n"
+            "\\title{Response to the reviewers}\n"
+            f"{self._sentence(20, 40)}\n"
+            "\\end{document}\n",
+            encoding="utf-8",
+        )
+        (dpath / "refs.bib").write_text(
+            "\n".join(self._bib_entry(i) for i in range(1, self.n_refs + 1)),
+            encoding="utf-8",
+        )
+
+        refs = "\n".join(
+            self._jats_reference(i) for i in range(1, self.n_refs + 1)
+        )
+        jats = (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+            "<!DOCTYPE article PUBLIC \"-//NLM//DTD JATS (Z39.96) Journal "
+            "Archiving and Interchange DTD v1.0 20120330//EN\" "
+            "\"JATS-archivearticle1.dtd\">\n"
+            "<article xmlns:mml=\"http://www.w3.org/1998/Math/MathML\" "
+            "xmlns:xlink=\"http://www.w3.org/1999/xlink\">\n"
+            "<front><article-meta><title-group><article-title>"
+            f"{escape(self.title)}</article-title></title-group>\n"
+            f"<abstract>{self._jats_paragraph(abstract_runs)}</abstract>\n"
+            "</article-meta></front>\n"
+            "<body>\n" + "\n".join(jats_body) + "\n</body>\n"
+            f"<back><ref-list><title>References</title>\n{refs}\n"
+            "</ref-list></back>\n</article>\n"
+        )
+        (dpath / FNAME_JATS).write_text(jats, encoding="utf-8")
+
+        metadata = {
+            "arxiv_id": f"0000.{sum(map(ord, self.name)):05d}",
+            "title": self.title,
+            "published": "2024-01-01",
+            "authors": ["A. Author", "B. Author"],
+        }
+        with open(dpath / FNAME_METADATA, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+
+def generate(name: str, force: bool = False) -> Path:
+    """Write the fixture `name` unless it already exists."""
+    dpath = DPATH_CORPUS / name
+    if force or not (dpath / FNAME_JATS).exists():
+        pages, n_refs, _ = FIXTURES[name]
+        _Paper(name, pages, n_refs).write(dpath)
+    return dpath
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("names", nargs="*", default=list(FIXTURES))
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Overwrite the fixtures that already exist.",
+    )
+    args = parser.parse_args()
+    for name in args.names:
+        dpath = generate(name, args.force)
+        size = (dpath / FNAME_JATS).stat().st_size
+        print(f"{name:<8} {size / 1024:9.1f} KiB  {dpath}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,65 @@
-from ._api import arxiv2md
+import importlib
 
-import importlib.metadata
-try:
-    __version__ = importlib.metadata.version(__package__)
-except importlib.metadata.PackageNotFoundError:
-    pass
+# The public names and their modules. They are imported on first
+# access, so that `import arxiv2md` does not pay for arxiv, requests
+# and bs4 before they are needed.
+_EXPORTS = {
+    "arxiv2md": "._api",
+    "arxiv2md_iter": "._api",
+    "arxiv2md_blocks": "._api",
+    "Block": "._document",
+    "Formula": "._document",
+    "iter_formulas": "._math",
+    "arxiv2md_batch": "._batch",
+    "BatchResult": "._batch",
+    "arxiv2md_reconvert": "._reconvert",
+    "ReconvertResult": "._reconvert",
+    "arxiv2md_resume": "._journal",
+    "Journal": "._journal",
+    "ConverterPool": "._pool",
+    "arxiv2md_async": "._async",
+    "AsyncSession": "._async",
+    "LaTeXMLError": "._convert",
+    "LaTeXMLNotFoundError": "._convert",
+    "DownloadManager": "._http",
+    "set_download_manager": "._http",
+    "SourceProvider": "._sources",
+    "HTTPSource": "._sources",
+    "TarballSource": "._sources",
+    "DirectorySource": "._sources",
+    "BulkArchiveSource": "._sources",
+    "set_source_provider": "._sources",
+    "SnapshotResolver": "._metadata",
+    "set_resolver": "._metadata",
+    "StyleStore": "._styles",
+    "set_style_store": "._styles",
+    "ConversionService": "._server",
+    "ArxivId": "._ids",
+    "parse_arxiv_id": "._ids",
+    "normalize_ids": "._ids",
+    "make_server": "._server",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name == "__version__":
+        from importlib import metadata
+        try:
+            value = metadata.version(__package__)
+        except metadata.PackageNotFoundError:
+            raise AttributeError(name) from None
+    elif name in _EXPORTS:
+        module = importlib.import_module(_EXPORTS[name], __package__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}"
+        )
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_EXPORTS})
@@ -1,75 +1,383 @@
 from pathlib import Path
+import json
 import tempfile
-from typing import Tuple, Dict
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Tuple
 
-from ._utils import extract_arxiv_id, get_source, concat_metadata
-from ._convert import tex2xml, JATSConverter
+from ._utils import extract_arxiv_id, concat_metadata, format_frontmatter
+from ._sources import get_source
+from ._convert import tex2xml, JATSConverter, LaTeXMLServerPool, ENGINES
+from ._convert_lxml import JATSStreamConverter
+from ._cache import Cache, CacheEntry
+from ._metadata import MetadataResolver
+from ._stats import Stats, stage, collect_stats
+from ._document import Block, Formula
+from ._math import iter_formulas
+from ._pool import ConverterPool
 
 
-def _core_arxiv2md_cli(
+CONVERTERS = {
+    "bs4": JATSConverter,
+    "lxml": JATSStreamConverter,
+}
+OUTPUT_FORMATS = ("markdown", "jsonl")
+
+
+def get_converter(backend: str) -> type[JATSConverter]:
+    if backend not in CONVERTERS:
+        raise ValueError(
+            f"Unknown converter backend: {backend}. "
+            f"Choose from {', '.join(CONVERTERS)}."
+        )
+    return CONVERTERS[backend]
+
+
+def check_engine(engine: str) -> None:
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unknown LaTeXML engine: {engine}. "
+            f"Choose from {', '.join(ENGINES)}."
+        )
+
+
+@dataclass
+class ConvertOptions:
+    verbose: bool = False
+    backend: str = "bs4"
+    engine: str = "latexml"
+    server_pool: LaTeXMLServerPool | None = None
+    timeout: float | None = None
+    memory_limit: int | None = None
+    cpu_limit: int | None = None
+    cancel: threading.Event | None = None
+    converter_pool: ConverterPool | None = None
+    on_formulas: Callable[[str, List[Formula]], None] | None = None
+
+
+def _prepare_source_dir(dpath_source: str | Path) -> Path:
+    dpath_source = Path(dpath_source).resolve()
+    if dpath_source.exists():
+        if len(list(dpath_source.iterdir())) >= 1:
+            raise FileExistsError(
+                f"The directory `{dpath_source}` already exists "
+                "and is not empty. Please specify an empty or "
+                "non-existing directory."
+            )
+    else:
+        dpath_source.mkdir(parents=True, exist_ok=True)
+    return dpath_source
+
+
+def _get_source(
     arxiv_id: str,
     dpath_source: Path,
-    verbose: bool,
+    cache: Cache | None = None,
+    resolver: MetadataResolver | None = None,
+) -> Tuple[Path, Path, Dict, CacheEntry | None]:
+    if cache:
+        entry = cache.get_source(arxiv_id, resolver)
+        return entry.dpath, entry.dpath_source_arxiv, entry.metadata, entry
+    dpath_source_arxiv, metadata = get_source(
+        arxiv_id, dpath_source, resolver
+    )
+    return dpath_source, dpath_source_arxiv, metadata, None
+
+
+def _convert(
+    dpath_work: Path,
+    dpath_source_arxiv: Path,
+    metadata: Dict,
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    entry: CacheEntry | None = None,
 ) -> str:
+    return "".join(_iter_convert(
+        dpath_work, dpath_source_arxiv, metadata, options, cache, entry
+    ))
+
+
+def _tex2xml(
+    dpath_source_arxiv: Path,
+    metadata: Dict,
+    options: ConvertOptions,
+    reuse: bool,
+) -> None:
+    tex2xml(
+        dpath_source_arxiv,
+        metadata["title"],
+        options.verbose,
+        reuse=reuse,
+        engine=options.engine,
+        server_pool=options.server_pool,
+        timeout=options.timeout,
+        memory_limit=options.memory_limit,
+        cpu_limit=options.cpu_limit,
+        cancel=options.cancel,
+    )
+
+
+def _iter_convert(
+    dpath_work: Path,
+    dpath_source_arxiv: Path,
+    metadata: Dict,
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    entry: CacheEntry | None = None,
+) -> Iterator[str]:
+    if not cache:
+        _tex2xml(dpath_source_arxiv, metadata, options, reuse=False)
+        yield from _iter_output(
+            dpath_work, options.backend, pool=options.converter_pool
+        )
+        _emit_formulas(dpath_work, metadata, options)
+        return
+
+    # Released even if the consumer stops early, and before the eviction
+    # so that the entry itself can be evicted
+    with entry:
+        content_md = cache.read_markdown(entry)
+        if content_md is not None:
+            yield content_md
+            _emit_formulas(dpath_work, metadata, options)
+            return
+
+        _tex2xml(dpath_source_arxiv, metadata, options, reuse=True)
+        chunks = _iter_output(
+            dpath_work, options.backend, pool=options.converter_pool
+        )
+        with cache.open_markdown(entry) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        _emit_formulas(dpath_work, metadata, options)
+    cache.evict()
+
+
+def _iter_blocks(
+    dpath_work: Path,
+    dpath_source_arxiv: Path,
+    metadata: Dict,
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    entry: CacheEntry | None = None,
+) -> Iterator[Block]:
+    # Only the JATS is cached, the blocks are cheap to rebuild from it
+    with entry or nullcontext():
+        _tex2xml(dpath_source_arxiv, metadata, options, reuse=bool(cache))
+        yield from _iter_output(
+            dpath_work, options.backend, blocks=True,
+            pool=options.converter_pool,
+        )
+        _emit_formulas(dpath_work, metadata, options)
+    if cache:
+        cache.evict()
+
+
+def _emit_formulas(
+    dpath_work: Path,
+    metadata: Dict,
+    options: ConvertOptions,
+) -> None:
+    # Read from the JATS, so that cached papers are indexed as well
+    if options.on_formulas is None:
+        return
+    with stage("math_index"):
+        formulas = list(iter_formulas(dpath_work))
+    options.on_formulas(metadata["arxiv_id"], formulas)
+
+
+def _iter_output(
+    dpath_work: Path,
+    backend: str,
+    blocks: bool = False,
+    pool: ConverterPool | None = None,
+) -> Iterator:
+    if pool:
+        # The whole output comes back from the worker at once
+        with stage("convert"):
+            output = pool.convert(dpath_work, backend, blocks)
+        if blocks:
+            yield from output
+        else:
+            yield output
+        return
+
+    # Only the time spent in the converter counts, not the consumer's
+    with stage("convert"):
+        converter = get_converter(backend)(dpath_work)
+        items = converter.iter_blocks() if blocks \
+            else converter.iter_markdown()
+    while True:
+        with stage("convert"):
+            item = next(items, None)
+        if item is None:
+            return
+        yield item
+
+
+def _to_markdown(dpath_work: Path, backend: str) -> str:
+    return "".join(_iter_output(dpath_work, backend))
+
+
+def _core_arxiv2md_cli(
+    arxiv_id: str,
+    dpath_source: Path,
+    frontmatter: bool,
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    stats: Stats | None = None,
+    output_format: str = "markdown",
+) -> Iterator[str]:
     from halo import Halo
 
-    with Halo(
+    with collect_stats(stats), Halo(
         text=f"Get source for arXiv:{arxiv_id}",
         spinner="dots",
     ) as spinner:
-        dpath_source_arxiv, metadata = get_source(arxiv_id, dpath_source)
+        dpath_work, dpath_source_arxiv, metadata, entry = _get_source(
+            arxiv_id, dpath_source, cache
+        )
         spinner.succeed()
 
-    with Halo(
-        text=f"Convert to Markdown",
-        spinner="dots",
-        enabled=not verbose,
-    ) as spinner:
-        if verbose:
-            print("Converting to Markdown")
-        tex2xml(dpath_source_arxiv, metadata["title"], verbose)
-        converter = JATSConverter(dpath_source)
-        content_md = converter.convert_to_md()
-        spinner.succeed()
+    with collect_stats(stats):
+        if output_format == "jsonl":
+            chunks = (
+                block.to_json() + "\n"
+                for block in _iter_blocks(
+                    dpath_work, dpath_source_arxiv, metadata, options, cache,
+                    entry,
+                )
+            )
+        else:
+            chunks = _iter_convert(
+                dpath_work, dpath_source_arxiv, metadata, options, cache,
+                entry,
+            )
+        with Halo(
+            text=f"Convert to Markdown",
+            spinner="dots",
+            enabled=not options.verbose,
+        ) as spinner:
+            if options.verbose:
+                print("Converting to Markdown")
+            # LaTeXML has finished once the first chunk is ready
+            first_chunk = next(chunks, "")
+            spinner.succeed()
 
-    return content_md, metadata
+        if frontmatter and output_format == "jsonl":
+            yield json.dumps(
+                {"type": "frontmatter", **metadata}, ensure_ascii=False
+            ) + "\n"
+        elif frontmatter:
+            yield format_frontmatter(metadata)
+        yield first_chunk
+        yield from chunks
 
 
 def _core_arxiv2md(
     arxiv_id: str,
     dpath_source: Path,
-    verbose: bool
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    stats: Stats | None = None,
 ) -> Tuple[str, Dict]:
-    dpath_source_arxiv, metadata = get_source(arxiv_id, dpath_source)
-    tex2xml(dpath_source_arxiv, metadata["title"], verbose)
-    converter = JATSConverter(dpath_source)
-    content_md = converter.convert_to_md()
+    with collect_stats(stats):
+        dpath_work, dpath_source_arxiv, metadata, entry = _get_source(
+            arxiv_id, dpath_source, cache
+        )
+        content_md = _convert(
+            dpath_work, dpath_source_arxiv, metadata, options, cache, entry
+        )
     return content_md, metadata
 
 
+def _core_arxiv2md_iter(
+    arxiv_id: str,
+    dpath_source: Path,
+    frontmatter: bool,
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    stats: Stats | None = None,
+) -> Iterator[str]:
+    with collect_stats(stats):
+        dpath_work, dpath_source_arxiv, metadata, entry = _get_source(
+            arxiv_id, dpath_source, cache
+        )
+        chunks = _iter_convert(
+            dpath_work, dpath_source_arxiv, metadata, options, cache, entry
+        )
+        # The front matter is not yielded if LaTeXML fails
+        first_chunk = next(chunks, "")
+        if frontmatter:
+            yield format_frontmatter(metadata)
+        yield first_chunk
+        yield from chunks
+
+
+def _core_arxiv2md_blocks(
+    arxiv_id: str,
+    dpath_source: Path,
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    stats: Stats | None = None,
+) -> Tuple[List[Block], Dict]:
+    with collect_stats(stats):
+        dpath_work, dpath_source_arxiv, metadata, entry = _get_source(
+            arxiv_id, dpath_source, cache
+        )
+        blocks = list(_iter_blocks(
+            dpath_work, dpath_source_arxiv, metadata, options, cache, entry
+        ))
+    return blocks, metadata
+
+
 def arxiv2md_cli(
     url: str,
     dpath_source: str | Path | None,
     frontmatter: bool,
-    verbose: bool,
-) -> str:
+    options: ConvertOptions,
+    cache: Cache | None = None,
+    stats: Stats | None = None,
+    output_format: str = "markdown",
+) -> Iterator[str]:
     arxiv_id = extract_arxiv_id(url)
 
     if dpath_source:
-        content_md, metadata = _core_arxiv2md_cli(
-            arxiv_id, dpath_source, verbose
+        yield from _core_arxiv2md_cli(
+            arxiv_id, dpath_source, frontmatter, options, cache, stats,
+            output_format,
         )
     else:
         with tempfile.TemporaryDirectory() as tempdir:
             dpath_source = Path(tempdir)
-            content_md, metadata = _core_arxiv2md_cli(
-                arxiv_id, dpath_source, verbose
+            yield from _core_arxiv2md_cli(
+                arxiv_id, dpath_source, frontmatter, options, cache, stats,
+                output_format,
             )
 
-    if frontmatter:
-        content_md = concat_metadata(content_md, metadata)
 
-    return content_md
+def _setup(
+    url: str,
+    verbose: bool,
+    dpath_cache: str | Path | None,
+    cache_max_size: int | None,
+    backend: str,
+    engine: str,
+    timeout: float | None,
+    memory_limit: int | None,
+    cpu_limit: int | None,
+) -> Tuple[str, Cache | None, ConvertOptions]:
+    arxiv_id = extract_arxiv_id(url)
+    cache = Cache(dpath_cache, cache_max_size) if dpath_cache else None
+    get_converter(backend)
+    check_engine(engine)
+    options = ConvertOptions(
+        verbose, backend, engine,
+        timeout=timeout, memory_limit=memory_limit, cpu_limit=cpu_limit,
+    )
+    return arxiv_id, cache, options
 
 
 def arxiv2md(
@@ -77,6 +385,14 @@ def arxiv2md(
     dpath_source: str | Path | None = None,
     frontmatter: bool = False,
     verbose: bool = False,
+    dpath_cache: str | Path | None = None,
+    cache_max_size: int | None = None,
+    backend: str = "bs4",
+    engine: str = "latexml",
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    on_stats: Callable[[Stats], None] | None = None,
 ) -> Tuple[str, Dict]:
     """
     Convert an arXiv paper to Markdown.
@@ -90,36 +406,193 @@ def arxiv2md(
             will include frontmatter metadata. Defaults to True.
         verbose (bool, optional): If True, print detailed logs during
             the conversion process. Defaults to False.
+        dpath_cache (str | Path | None, optional): The directory of a
+            persistent cache for the sources and the conversion
+            results. Cached papers are converted without network
+            access or LaTeXML runs. When a cache is used, the
+            intermediate files are kept in the cache instead of
+            `dpath_source`. If None, no cache is used. Defaults to
+            None.
+        cache_max_size (int | None, optional): The maximum size of the
+            cache in bytes. The least recently used papers are evicted
+            beyond this size. If None, the cache is not limited.
+            Defaults to None.
+        backend (str, optional): The JATS to Markdown converter.
+            "bs4" walks a BeautifulSoup tree, "lxml" converts in a
+            single streaming pass with less memory. Both produce the
+            same output. Defaults to "bs4".
+        engine (str, optional): How LaTeXML is run. "latexml" runs
+            `latexml` and `latexmlpost`, "latexmlc" runs both steps in
+            one `latexmlc` process, and "server" sends the conversion
+            to a warm `latexmls` server that is reused by later calls.
+            Defaults to "latexml".
+        timeout (float | None, optional): The wall-clock limit in
+            seconds for each LaTeXML process. If None, there is no
+            limit. Defaults to None.
+        memory_limit (int | None, optional): The address space limit
+            in bytes for each LaTeXML process. Not applied with the
+            "server" engine. Defaults to None.
+        cpu_limit (int | None, optional): The CPU time limit in seconds
+            for each LaTeXML process. Not applied with the "server"
+            engine. Defaults to None.
+        on_stats (Callable[[Stats], None] | None, optional): A function
+            called with the timings of the pipeline stages, the
+            downloaded bytes and the peak RSS once the conversion is
+            done. Defaults to None.
 
     Returns:
         Tuple[str, Dict]: A tuple containing the Markdown content and
             metadata. The metadata includes the arXiv ID, title,
             published date, and authors.
+
+    Raises:
+        LaTeXMLError: If LaTeXML fails, exceeds a limit or times out.
     """
-    arxiv_id = extract_arxiv_id(url)
+    arxiv_id, cache, options = _setup(
+        url, verbose, dpath_cache, cache_max_size, backend, engine,
+        timeout, memory_limit, cpu_limit,
+    )
+    stats = Stats() if on_stats else None
 
     if dpath_source:
-        dpath_source = Path(dpath_source).resolve()
-        if dpath_source.exists():
-            if len(list(dpath_source.iterdir())) >= 1:
-                raise FileExistsError(
-                    f"The directory `{dpath_source}` already exists "
-                    "and is not empty. Please specify an empty or "
-                    "non-existing directory."
-                )
-        else:
-            dpath_source.mkdir(parents=True, exist_ok=True)
+        dpath_source = _prepare_source_dir(dpath_source)
         content_md, metadata = _core_arxiv2md(
-            arxiv_id, dpath_source, verbose
+            arxiv_id, dpath_source, options, cache, stats
         )
     else:
         with tempfile.TemporaryDirectory() as tempdir:
             dpath_source = Path(tempdir)
             content_md, metadata = _core_arxiv2md(
-                arxiv_id, dpath_source, verbose
+                arxiv_id, dpath_source, options, cache, stats
             )
 
     if frontmatter:
         content_md = concat_metadata(content_md, metadata)
+    if on_stats:
+        on_stats(stats)
 
     return content_md, metadata
+
+
+def arxiv2md_iter(
+    url: str,
+    dpath_source: str | Path | None = None,
+    frontmatter: bool = False,
+    verbose: bool = False,
+    dpath_cache: str | Path | None = None,
+    cache_max_size: int | None = None,
+    backend: str = "bs4",
+    engine: str = "latexml",
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    on_stats: Callable[[Stats], None] | None = None,
+) -> Iterator[str]:
+    """
+    Convert an arXiv paper to Markdown and yield it in chunks.
+
+    The front matter, the title with the abstract, each top-level
+    section and the references are yielded one by one as they are
+    converted, so the whole document never has to be held as one
+    string. Joined, the chunks equal the Markdown of `arxiv2md`. With
+    the "lxml" backend, the first chunk is ready as soon as LaTeXML
+    has finished.
+
+    Takes the same arguments as `arxiv2md`. `on_stats` is called once
+    the last chunk has been yielded.
+
+    Yields:
+        str: The next chunk of the Markdown content.
+
+    Raises:
+        LaTeXMLError: If LaTeXML fails, exceeds a limit or times out.
+            Nothing is yielded in that case.
+    """
+    arxiv_id, cache, options = _setup(
+        url, verbose, dpath_cache, cache_max_size, backend, engine,
+        timeout, memory_limit, cpu_limit,
+    )
+    if dpath_source:
+        dpath_source = _prepare_source_dir(dpath_source)
+    return _iter_arxiv2md(
+        arxiv_id, dpath_source, frontmatter, options, cache, on_stats
+    )
+
+
+def _iter_arxiv2md(
+    arxiv_id: str,
+    dpath_source: Path | None,
+    frontmatter: bool,
+    options: ConvertOptions,
+    cache: Cache | None,
+    on_stats: Callable[[Stats], None] | None,
+) -> Iterator[str]:
+    stats = Stats() if on_stats else None
+    if dpath_source:
+        yield from _core_arxiv2md_iter(
+            arxiv_id, dpath_source, frontmatter, options, cache, stats
+        )
+    else:
+        with tempfile.TemporaryDirectory() as tempdir:
+            dpath_source = Path(tempdir)
+            yield from _core_arxiv2md_iter(
+                arxiv_id, dpath_source, frontmatter, options, cache, stats
+            )
+    if on_stats:
+        on_stats(stats)
+
+
+def arxiv2md_blocks(
+    url: str,
+    dpath_source: str | Path | None = None,
+    verbose: bool = False,
+    dpath_cache: str | Path | None = None,
+    cache_max_size: int | None = None,
+    backend: str = "bs4",
+    engine: str = "latexml",
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    on_stats: Callable[[Stats], None] | None = None,
+) -> Tuple[List[Block], Dict]:
+    """
+    Convert an arXiv paper to a list of structured blocks.
+
+    Each `Block` is a title, abstract paragraph, heading, paragraph,
+    figure or table caption, formula, reference or footnote, with the
+    titles of its enclosing sections and the bibliography IDs it
+    cites. The blocks are recorded while the JATS is converted, in the
+    same order as the Markdown of `arxiv2md`, so consumers do not need
+    to parse Markdown to split a paper by section.
+
+    Takes the same arguments as `arxiv2md`, except `frontmatter`.
+
+    Returns:
+        Tuple[List[Block], Dict]: A tuple containing the blocks and the
+            metadata of the paper.
+
+    Raises:
+        LaTeXMLError: If LaTeXML fails, exceeds a limit or times out.
+    """
+    arxiv_id, cache, options = _setup(
+        url, verbose, dpath_cache, cache_max_size, backend, engine,
+        timeout, memory_limit, cpu_limit,
+    )
+    stats = Stats() if on_stats else None
+
+    if dpath_source:
+        dpath_source = _prepare_source_dir(dpath_source)
+        blocks, metadata = _core_arxiv2md_blocks(
+            arxiv_id, dpath_source, options, cache, stats
+        )
+    else:
+        with tempfile.TemporaryDirectory() as tempdir:
+            dpath_source = Path(tempdir)
+            blocks, metadata = _core_arxiv2md_blocks(
+                arxiv_id, dpath_source, options, cache, stats
+            )
+
+    if on_stats:
+        on_stats(stats)
+
+    return blocks, metadata
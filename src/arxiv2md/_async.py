@@ -0,0 +1,522 @@
+from pathlib import Path
+import asyncio
+import itertools
+import os
+import signal
+import tempfile
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import (
+    TYPE_CHECKING, AsyncIterator, Callable, Dict, IO, List, Tuple
+)
+
+if TYPE_CHECKING:
+    import arxiv
+
+from ._utils import concat_metadata, save_source
+from ._convert import (
+    FNAME_JATS, LaTeXMLServerPool, _get_server_pool, _find_main_texfile,
+    _commands, _server_options, _style_options, _rlimits, _limit_resources,
+    _set_rlimits, _failed, _latexml_error,
+)
+from ._styles import StyleStore
+from ._cache import Cache, CacheEntry
+from ._sources import get_source_provider
+from ._metadata import MetadataResolver, get_resolver, PAGE_SIZE
+from ._api import (
+    ConvertOptions, _setup, _prepare_source_dir, _to_markdown,
+)
+from ._stats import Stats, stage, collect_stats
+
+
+API_URL = "https://export.arxiv.org/api/query"
+# The arXiv API asks for one request every 3 seconds
+API_DELAY = 3.0
+API_RETRIES = 3
+
+
+def _import_httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError(
+            "The async API requires httpx. Install it with "
+            "`pip install arxiv2md[async]`."
+        ) from None
+    return httpx
+
+
+class _AsyncMetadataResolver:
+    """
+    Looks up papers on the arXiv API without blocking the event loop.
+
+    Lookups that are waiting for the rate limit are merged into one
+    `id_list` query of up to `PAGE_SIZE` IDs. The results are shared
+    with the `MetadataResolver` of the synchronous API.
+    """
+
+    def __init__(self, client, resolver: MetadataResolver):
+        self.client = client
+        self.resolver = resolver
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._task: asyncio.Task | None = None
+        self._last_request = None
+
+    async def get(self, arxiv_id: str) -> "arxiv.Result":
+        paper = self.resolver.cached([arxiv_id]).get(arxiv_id)
+        if paper is not None:
+            return paper
+
+        future = self._pending.get(arxiv_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[arxiv_id] = future
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._flush())
+        # Other papers may be waiting for the same query
+        return await asyncio.shield(future)
+
+    async def _flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            if self._last_request is not None:
+                await asyncio.sleep(
+                    self._last_request + API_DELAY - loop.time()
+                )
+            arxiv_ids = list(itertools.islice(self._pending, PAGE_SIZE))
+            futures = {i: self._pending.pop(i) for i in arxiv_ids}
+            try:
+                papers = await self._query(arxiv_ids)
+            except Exception as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.resolver.add(papers, arxiv_ids)
+            found = self.resolver.cached(arxiv_ids)
+            for arxiv_id, future in futures.items():
+                if future.done():
+                    continue
+                if arxiv_id in found:
+                    future.set_result(found[arxiv_id])
+                else:
+                    future.set_exception(ValueError(
+                        f"Could not find the paper arXiv:{arxiv_id}."
+                    ))
+
+    async def _query(self, arxiv_ids: List[str]) -> "List[arxiv.Result]":
+        httpx = _import_httpx()
+        loop = asyncio.get_running_loop()
+        params = {
+            "id_list": ",".join(arxiv_ids),
+            "start": 0,
+            "max_results": len(arxiv_ids),
+        }
+        for retry in range(API_RETRIES + 1):
+            try:
+                response = await self.client.get(API_URL, params=params)
+                response.raise_for_status()
+                break
+            except httpx.HTTPError:
+                if retry == API_RETRIES:
+                    raise
+                await asyncio.sleep(API_DELAY)
+            finally:
+                self._last_request = loop.time()
+
+        import arxiv
+        import feedparser
+
+        feed = feedparser.parse(response.content)
+        papers = []
+        for entry in feed.entries:
+            try:
+                papers.append(arxiv.Result._from_feed_entry(entry))
+            except arxiv.Result.MissingFieldError:
+                pass
+        return papers
+
+
+class AsyncSession:
+    """
+    Resources shared by concurrent `arxiv2md_async` calls.
+
+    One HTTP/1.1 connection pool is used for the arXiv API, and
+    semaphores cap the number of concurrent downloads and LaTeXML jobs,
+    so hundreds of papers can be in flight on one event loop. The
+    sources come from the source provider (see `set_source_provider`)
+    and are downloaded by the shared `DownloadManager`, in worker
+    threads. Calls without an explicit session share a default session
+    of their event loop, which is never closed; use a session as an
+    async context manager to close its connections.
+
+    Args:
+        max_jobs (int | None, optional): The maximum number of
+            concurrent LaTeXML jobs. If None, the number of CPUs is
+            used. Defaults to None.
+        max_downloads (int, optional): The maximum number of
+            concurrent source downloads. Defaults to 8.
+        http_client (httpx.AsyncClient | None, optional): The HTTP
+            client for the arXiv API. If None, one is created and
+            closed with the session. Defaults to None.
+        resolver (MetadataResolver | None, optional): The metadata
+            cache shared with the synchronous API. Defaults to None.
+
+    Example:
+        async with AsyncSession(max_jobs=8) as session:
+            results = await asyncio.gather(*[
+                arxiv2md_async(url, session=session) for url in urls
+            ])
+    """
+
+    def __init__(
+        self,
+        max_jobs: int | None = None,
+        max_downloads: int = 8,
+        http_client=None,
+        resolver: MetadataResolver | None = None,
+    ):
+        httpx = _import_httpx()
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self._own_client = http_client is None
+        self.http_client = http_client or httpx.AsyncClient(
+            timeout=60,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=1),
+        )
+        self.metadata = _AsyncMetadataResolver(
+            self.http_client, resolver or get_resolver()
+        )
+        self.jobs = asyncio.Semaphore(self.max_jobs)
+        self.downloads = asyncio.Semaphore(max_downloads)
+        self._server_pool = None
+
+    @property
+    def server_pool(self) -> LaTeXMLServerPool:
+        # One server per job slot, so that a port is always free
+        if self._server_pool is None:
+            self._server_pool = LaTeXMLServerPool(self.max_jobs)
+        return self._server_pool
+
+    @asynccontextmanager
+    async def open_source(
+        self,
+        paper: "arxiv.Result",
+    ) -> AsyncIterator[IO[bytes]]:
+        """Open a source, to be read from a worker thread."""
+        # Downloads go through the shared `DownloadManager` in a thread,
+        # for its mirror, rate limit, retries and resumes. The stream is
+        # read from a thread anyway, to extract it.
+        source = get_source_provider().open(paper)
+        async with self.downloads:
+            stream = await asyncio.to_thread(source.__enter__)
+            try:
+                yield stream
+            except BaseException as e:
+                if not await asyncio.to_thread(
+                    source.__exit__, type(e), e, e.__traceback__
+                ):
+                    raise
+            else:
+                # Drains and verifies the rest of a download
+                await asyncio.to_thread(source.__exit__, None, None, None)
+
+    async def aclose(self) -> None:
+        if self._own_client:
+            await self.http_client.aclose()
+
+    async def __aenter__(self) -> "AsyncSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+# The default session of each event loop
+_default_sessions = weakref.WeakKeyDictionary()
+
+
+def _get_session() -> AsyncSession:
+    loop = asyncio.get_running_loop()
+    session = _default_sessions.get(loop)
+    if session is None:
+        session = _default_sessions[loop] = AsyncSession()
+    return session
+
+
+async def _run_async(
+    command: List,
+    fpath_dest: Path,
+    cwd: Path,
+    verbose: bool,
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+) -> None:
+    # Same as `_run`, with the task's cancellation instead of an Event
+    fpath_dest.unlink(missing_ok=True)
+    rlimits = _rlimits(memory_limit, cpu_limit)
+
+    with tempfile.TemporaryFile() as f_stderr, stage(Path(command[0]).name):
+        start = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            stdout=None if verbose else asyncio.subprocess.DEVNULL,
+            stderr=None if verbose else f_stderr,
+            start_new_session=True,
+            preexec_fn=_limit_resources(rlimits),
+        )
+        _set_rlimits(process.pid, rlimits)
+        timed_out = False
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            if process.returncode is None:
+                os.killpg(process.pid, signal.SIGKILL)
+                await process.wait()
+        elapsed = time.monotonic() - start
+
+        if not _failed(process.returncode, fpath_dest, timed_out):
+            return
+
+        f_stderr.seek(0)
+        stderr = f_stderr.read().decode("utf-8", errors="replace")
+
+    fpath_dest.unlink(missing_ok=True)
+    raise _latexml_error(
+        command, process.returncode, stderr, elapsed, timed_out
+    )
+
+
+async def tex2xml_async(
+    dpath_source: Path,
+    title: str,
+    verbose: bool,
+    reuse: bool = False,
+    engine: str = "latexml",
+    server_pool: LaTeXMLServerPool | None = None,
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    style_store: StyleStore | None = None,
+) -> Path:
+    """`tex2xml` on asyncio subprocesses. Cancel the task to kill them."""
+    dpath_work = dpath_source.parent
+    fpath_jats = dpath_work / FNAME_JATS
+    if reuse and fpath_jats.exists():
+        return fpath_jats
+
+    fpath_tex = await asyncio.to_thread(
+        _find_main_texfile, dpath_source, title, engine
+    )
+    latexml_options = await asyncio.to_thread(
+        _style_options, dpath_source, style_store
+    )
+    run_options = {
+        "cwd": dpath_work,
+        "verbose": verbose,
+        "timeout": timeout,
+    }
+
+    if engine != "server":
+        commands = _commands(
+            fpath_tex, dpath_work, engine, reuse,
+            latexml_options=latexml_options,
+        )
+        for command, fpath_dest in commands:
+            await _run_async(
+                command, fpath_dest, memory_limit=memory_limit,
+                cpu_limit=cpu_limit, **run_options,
+            )
+        return fpath_jats
+
+    server_pool = server_pool or _get_server_pool()
+    with server_pool.acquire() as port:
+        server_options = _server_options(server_pool, port, timeout)
+        commands = _commands(
+            fpath_tex, dpath_work, engine, reuse, server_options,
+            latexml_options,
+        )
+        for command, fpath_dest in commands:
+            await _run_async(command, fpath_dest, **run_options)
+    return fpath_jats
+
+
+async def _get_source_async(
+    arxiv_id: str,
+    dpath_source: Path,
+    session: AsyncSession,
+    cache: Cache | None = None,
+) -> Tuple[Path, Path, Dict, CacheEntry | None]:
+    if cache:
+        entry = await asyncio.to_thread(cache.lookup, arxiv_id)
+        if entry:
+            return entry.dpath, entry.dpath_source_arxiv, entry.metadata, entry
+
+    with stage("metadata"):
+        paper = await session.metadata.get(arxiv_id)
+
+    if cache:
+        entry = await asyncio.to_thread(cache.lookup_paper, paper)
+        if not entry:
+            async with session.open_source(paper) as stream:
+                entry = await asyncio.to_thread(cache._store, paper, stream)
+        return entry.dpath, entry.dpath_source_arxiv, entry.metadata, entry
+
+    async with session.open_source(paper) as stream:
+        dpath_source_arxiv, metadata = await asyncio.to_thread(
+            save_source, paper, stream, dpath_source
+        )
+    return dpath_source, dpath_source_arxiv, metadata, None
+
+
+async def _convert_async(
+    dpath_work: Path,
+    dpath_source_arxiv: Path,
+    metadata: Dict,
+    options: ConvertOptions,
+    session: AsyncSession,
+    cache: Cache | None = None,
+    entry: CacheEntry | None = None,
+) -> str:
+    if not cache:
+        return await _tex2md_async(
+            dpath_work, dpath_source_arxiv, metadata, options, session,
+        )
+
+    # Released also on errors and cancellation, and before the eviction
+    # so that the entry itself can be evicted
+    with entry:
+        content_md = await asyncio.to_thread(cache.read_markdown, entry)
+        if content_md is not None:
+            return content_md
+        content_md = await _tex2md_async(
+            dpath_work, dpath_source_arxiv, metadata, options, session,
+            reuse=True,
+        )
+        await asyncio.to_thread(cache.write_markdown, entry, content_md)
+    await asyncio.to_thread(cache.evict)
+    return content_md
+
+
+async def _tex2md_async(
+    dpath_work: Path,
+    dpath_source_arxiv: Path,
+    metadata: Dict,
+    options: ConvertOptions,
+    session: AsyncSession,
+    reuse: bool = False,
+) -> str:
+    server_pool = session.server_pool if options.engine == "server" else None
+    async with session.jobs:
+        await tex2xml_async(
+            dpath_source_arxiv,
+            metadata["title"],
+            options.verbose,
+            reuse=reuse,
+            engine=options.engine,
+            server_pool=server_pool,
+            timeout=options.timeout,
+            memory_limit=options.memory_limit,
+            cpu_limit=options.cpu_limit,
+        )
+        content_md = await asyncio.to_thread(
+            _to_markdown, dpath_work, options.backend
+        )
+    return content_md
+
+
+async def _core_arxiv2md_async(
+    arxiv_id: str,
+    dpath_source: Path,
+    options: ConvertOptions,
+    session: AsyncSession,
+    cache: Cache | None = None,
+    stats: Stats | None = None,
+) -> Tuple[str, Dict]:
+    with collect_stats(stats):
+        dpath_work, dpath_source_arxiv, metadata, entry = \
+            await _get_source_async(arxiv_id, dpath_source, session, cache)
+        content_md = await _convert_async(
+            dpath_work, dpath_source_arxiv, metadata, options, session,
+            cache, entry,
+        )
+    return content_md, metadata
+
+
+async def arxiv2md_async(
+    url: str,
+    dpath_source: str | Path | None = None,
+    frontmatter: bool = False,
+    verbose: bool = False,
+    dpath_cache: str | Path | None = None,
+    cache_max_size: int | None = None,
+    backend: str = "bs4",
+    engine: str = "latexml",
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    on_stats: Callable[[Stats], None] | None = None,
+    session: AsyncSession | None = None,
+) -> Tuple[str, Dict]:
+    """
+    Convert an arXiv paper to Markdown without blocking the event loop.
+
+    The arXiv API query uses an async HTTP client and LaTeXML runs in
+    asyncio subprocesses. The sources are downloaded by the shared
+    `DownloadManager` in worker threads, with its mirror, rate limit
+    and retries. Lookups of concurrent calls are merged into a few API
+    queries, and the number of concurrent downloads and LaTeXML jobs is
+    capped by `session`. Cancelling the task kills the running LaTeXML
+    processes. Requires `httpx` (`pip install arxiv2md[async]`).
+
+    Takes the same arguments as `arxiv2md`, plus `session`. Like
+    `arxiv2md`, it has no `on_formulas`; formulas can be read from the
+    JATS in `dpath_source` with `iter_formulas`.
+
+    Args:
+        url (str): The URL of the arXiv paper or the arXiv ID.
+        session (AsyncSession | None, optional): The connection pool
+            and job limits shared by concurrent calls. If None, the
+            default session of the running event loop is used, whose
+            connections stay open as long as the loop. Defaults to
+            None.
+
+    Returns:
+        Tuple[str, Dict]: A tuple containing the Markdown content and
+            metadata. The metadata includes the arXiv ID, title,
+            published date, and authors.
+
+    Raises:
+        LaTeXMLError: If LaTeXML fails, exceeds a limit or times out.
+    """
+    arxiv_id, cache, options = _setup(
+        url, verbose, dpath_cache, cache_max_size, backend, engine,
+        timeout, memory_limit, cpu_limit,
+    )
+    session = session or _get_session()
+    stats = Stats() if on_stats else None
+
+    if dpath_source:
+        dpath_source = _prepare_source_dir(dpath_source)
+        content_md, metadata = await _core_arxiv2md_async(
+            arxiv_id, dpath_source, options, session, cache, stats
+        )
+    else:
+        with tempfile.TemporaryDirectory() as tempdir:
+            dpath_source = Path(tempdir)
+            content_md, metadata = await _core_arxiv2md_async(
+                arxiv_id, dpath_source, options, session, cache, stats
+            )
+
+    if frontmatter:
+        content_md = concat_metadata(content_md, metadata)
+    if on_stats:
+        on_stats(stats)
+
+    return content_md, metadata
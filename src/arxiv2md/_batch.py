@@ -0,0 +1,277 @@
+from pathlib import Path
+import itertools
+import shutil
+import tempfile
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from ._utils import extract_arxiv_id, concat_metadata
+from ._ids import file_safe_id
+from ._cache import Cache, CacheEntry
+from ._metadata import MetadataResolver, get_resolver, PAGE_SIZE
+from ._api import (
+    _get_source, _convert, get_converter, check_engine, ConvertOptions
+)
+from ._convert import LaTeXMLServerPool
+from ._pool import ConverterPool
+from ._document import Formula
+from ._stats import Stats, collect_stats
+
+
+@dataclass
+class BatchResult:
+    url: str
+    arxiv_id: str | None = None
+    content_md: str | None = None
+    metadata: Dict = field(default_factory=dict)
+    error: Exception | None = None
+    stats: Stats = field(default_factory=Stats)
+    fpath_output: Path | None = None
+    skipped: bool = False
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _work_dir(dpath_root: Path, arxiv_id: str) -> Path:
+    return dpath_root / file_safe_id(arxiv_id)
+
+
+def _key(url: str) -> str | None:
+    try:
+        return extract_arxiv_id(url)
+    except ValueError:
+        return None
+
+
+def _fetch(
+    result: BatchResult,
+    dpath_root: Path,
+    resolver: MetadataResolver,
+    cache: Cache | None,
+) -> Tuple[Path, Path, CacheEntry | None]:
+    result.arxiv_id = extract_arxiv_id(result.url)
+    dpath_download = _work_dir(dpath_root, result.arxiv_id)
+    dpath_download.mkdir(parents=True, exist_ok=True)
+    with collect_stats(result.stats):
+        dpath_work, dpath_source_arxiv, result.metadata, entry = _get_source(
+            result.arxiv_id, dpath_download, cache, resolver
+        )
+    return dpath_work, dpath_source_arxiv, entry
+
+
+def _prefetch_metadata(
+    urls: Iterable[str],
+    resolver: MetadataResolver,
+    cache: Cache | None,
+) -> Iterator[str]:
+    # Resolve the metadata of the upcoming papers in one query per page
+    urls = iter(urls)
+    while chunk := list(itertools.islice(urls, PAGE_SIZE)):
+        arxiv_ids = []
+        for url in chunk:
+            try:
+                arxiv_id = extract_arxiv_id(url)
+            except ValueError:
+                continue
+            entry = cache.lookup(arxiv_id) if cache else None
+            if entry:
+                entry.release()
+            else:
+                arxiv_ids.append(arxiv_id)
+        try:
+            resolver.resolve(arxiv_ids)
+        except Exception:
+            # Each paper is looked up again and reports its own error
+            pass
+        yield from chunk
+
+
+def _convert_result(
+    result: BatchResult,
+    dpath_work: Path,
+    dpath_source_arxiv: Path,
+    entry: CacheEntry | None,
+    frontmatter: bool,
+    options: ConvertOptions,
+    cache: Cache | None,
+) -> BatchResult:
+    with collect_stats(result.stats):
+        content_md = _convert(
+            dpath_work, dpath_source_arxiv, result.metadata, options, cache,
+            entry,
+        )
+    if frontmatter:
+        content_md = concat_metadata(content_md, result.metadata)
+    result.content_md = content_md
+    return result
+
+
+def arxiv2md_batch(
+    urls: Iterable[str],
+    workers: int = 4,
+    fetch_workers: int | None = None,
+    dpath_source: str | Path | None = None,
+    frontmatter: bool = False,
+    verbose: bool = False,
+    dpath_cache: str | Path | None = None,
+    cache_max_size: int | None = None,
+    backend: str = "bs4",
+    engine: str = "latexml",
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    convert_processes: int | None = None,
+    on_formulas: Callable[[str, List[Formula]], None] | None = None,
+) -> Iterator[BatchResult]:
+    """
+    Convert many arXiv papers to Markdown concurrently.
+
+    Source downloads run in one thread pool and LaTeXML conversions in
+    another, so network waits overlap with conversions. A failure of
+    one paper is reported in its result and does not stop the batch.
+    A paper listed more than once is converted once, and its result is
+    repeated for each of its URLs.
+
+    Args:
+        urls (Iterable[str]): URLs of the arXiv papers or arXiv IDs.
+        workers (int, optional): The maximum number of concurrent
+            LaTeXML conversions. Defaults to 4.
+        fetch_workers (int | None, optional): The maximum number of
+            concurrent source downloads. If None, the same value as
+            `workers` is used. Defaults to None.
+        dpath_source (str | Path | None, optional): The directory to
+            store the source files. Each paper gets its own
+            subdirectory. If None, temporary directories are used and
+            removed as soon as each paper is done. Defaults to None.
+        frontmatter (bool, optional): If True, the output Markdown
+            will include frontmatter metadata. Defaults to False.
+        verbose (bool, optional): If True, print detailed logs during
+            the conversion process. Defaults to False.
+        dpath_cache (str | Path | None, optional): The directory of a
+            persistent cache for the sources and the conversion
+            results. If None, no cache is used. Defaults to None.
+        cache_max_size (int | None, optional): The maximum size of the
+            cache in bytes. If None, the cache is not limited.
+            Defaults to None.
+        backend (str, optional): The JATS to Markdown converter, "bs4"
+            or "lxml". Defaults to "bs4".
+        engine (str, optional): How LaTeXML is run: "latexml",
+            "latexmlc" or "server". With "server", a pool of `workers`
+            warm `latexmls` servers is used. Defaults to "latexml".
+        timeout (float | None, optional): The wall-clock limit in
+            seconds for each LaTeXML process. Defaults to None.
+        memory_limit (int | None, optional): The address space limit
+            in bytes for each LaTeXML process. Not applied with the
+            "server" engine. Defaults to None.
+        cpu_limit (int | None, optional): The CPU time limit in seconds
+            for each LaTeXML process. Not applied with the "server"
+            engine. Defaults to None.
+        convert_processes (int | None, optional): The number of
+            processes of a `ConverterPool` that converts the JATS to
+            Markdown, so that the conversions are not serialized by
+            the GIL. If None, each paper is converted in its LaTeXML
+            worker thread. Defaults to None.
+        on_formulas (Callable | None, optional): A function called
+            with the arXiv ID and the formulas of each converted
+            paper, e.g. to build a formula index. It is called from
+            the worker threads. Defaults to None.
+
+    Yields:
+        BatchResult: The result of each paper, in order of completion.
+            `error` holds the raised exception if the paper failed,
+            e.g. a `LaTeXMLError` with the exit code, the tail of
+            stderr and the elapsed time. Closing the generator kills
+            the running LaTeXML processes.
+    """
+    fetch_workers = fetch_workers or workers
+    keep_source = dpath_source is not None
+    resolver = get_resolver()
+    cache = Cache(dpath_cache, cache_max_size) if dpath_cache else None
+    get_converter(backend)
+    check_engine(engine)
+    server_pool = LaTeXMLServerPool(workers) if engine == "server" else None
+    cancel = threading.Event()
+    converter_pool = (
+        ConverterPool(convert_processes, backends=(backend,))
+        if convert_processes else None
+    )
+    options = ConvertOptions(
+        verbose, backend, engine, server_pool,
+        timeout=timeout, memory_limit=memory_limit, cpu_limit=cpu_limit,
+        cancel=cancel, converter_pool=converter_pool,
+        on_formulas=on_formulas,
+    )
+
+    # The converter pool is stopped only once no thread waits for it
+    with tempfile.TemporaryDirectory() as tempdir, \
+            converter_pool or nullcontext():
+        dpath_root = Path(dpath_source or tempdir).resolve()
+        pending_urls = _prefetch_metadata(urls, resolver, cache)
+        fetching, converting = {}, {}
+        # The URLs of each paper in progress that came after the first,
+        # which share its result instead of converting it again in the
+        # same work directory
+        duplicates = {}
+
+        with ThreadPoolExecutor(fetch_workers) as fetch_pool, \
+                ThreadPoolExecutor(workers) as convert_pool:
+
+            def submit_fetches():
+                # Do not download far ahead of the conversions
+                while len(fetching) + len(converting) < fetch_workers + workers:
+                    url = next(pending_urls, None)
+                    if url is None:
+                        return
+                    arxiv_id = _key(url)
+                    if arxiv_id in duplicates:
+                        duplicates[arxiv_id].append(url)
+                        continue
+                    if arxiv_id is not None:
+                        duplicates[arxiv_id] = []
+                    result = BatchResult(url=url)
+                    future = fetch_pool.submit(
+                        _fetch, result, dpath_root, resolver, cache
+                    )
+                    fetching[future] = result
+
+            try:
+                submit_fetches()
+                while fetching or converting:
+                    done, _ = wait(
+                        [*fetching, *converting], return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        if future in fetching:
+                            result = fetching.pop(future)
+                            if future.exception() is None:
+                                future_convert = convert_pool.submit(
+                                    _convert_result, result, *future.result(),
+                                    frontmatter, options, cache,
+                                )
+                                converting[future_convert] = result
+                                continue
+                        else:
+                            result = converting.pop(future)
+
+                        result.error = future.exception()
+                        if result.arxiv_id and not keep_source:
+                            shutil.rmtree(
+                                _work_dir(dpath_root, result.arxiv_id),
+                                ignore_errors=True,
+                            )
+                        yield result
+                        for url in duplicates.pop(result.arxiv_id, []):
+                            yield replace(result, url=url, stats=Stats())
+                    submit_fetches()
+            finally:
+                # Kill the running LaTeXML processes if the caller stops
+                # iterating early
+                cancel.set()
+                for future in [*fetching, *converting]:
+                    future.cancel()
@@ -0,0 +1,420 @@
+from pathlib import Path
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, IO, Iterator
+
+if TYPE_CHECKING:
+    import arxiv
+
+from ._utils import query_paper, get_metadata, extract_source
+from ._metadata import MetadataResolver, UNVERSIONED_TTL
+from ._sources import SourceProvider, get_source_provider
+from ._stats import stage
+
+
+DNAME_INDEX = "index"
+DNAME_OBJECTS = "objects"
+DNAME_SOURCE = "source"
+DNAME_MARKDOWN = "md"
+FNAME_SOURCE = "source.tar.gz"
+FNAME_LOCK = ".lock"
+
+
+# The modules that turn the JATS into Markdown
+CONVERTER_MODULES = ("_convert*.py", "_document.py", "_math.py")
+
+
+@lru_cache(maxsize=None)
+def converter_version() -> str:
+    """
+    Hash of the modules that turn the JATS into Markdown (see
+    `CONVERTER_MODULES`), used to key cached Markdown.
+    """
+    dpath_package = Path(__file__).parent
+    fpaths = {
+        fpath for pattern in CONVERTER_MODULES
+        for fpath in dpath_package.glob(pattern)
+    }
+    sha = hashlib.sha256()
+    for fpath in sorted(fpaths):
+        sha.update(fpath.read_bytes())
+    return sha.hexdigest()[:16]
+
+
+class _TeeStream(io.RawIOBase):
+    """Copy a stream to a file and hash it while it is being read."""
+
+    def __init__(self, stream: IO[bytes], f: IO[bytes]):
+        self._stream = stream
+        self._f = f
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        self._f.write(data)
+        self.sha256.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def drain(self) -> None:
+        while self.read(1 << 20):
+            pass
+
+
+def _dir_size(dpath: Path) -> int:
+    return sum(
+        f.stat().st_size for f in dpath.rglob("*") if f.is_file()
+    )
+
+
+def _checkout(dpath: Path) -> IO[bytes] | None:
+    # A shared lock on an object, held while it is in use so that
+    # `Cache.evict` skips it, or None if the object was evicted
+    try:
+        import fcntl
+    except ImportError:
+        # Not locked without `fcntl`, e.g. on Windows, where an open
+        # file would also keep the object from being renamed
+        return io.BytesIO() if (dpath / FNAME_LOCK).exists() else None
+    try:
+        f = open(dpath / FNAME_LOCK, "ab")
+    except FileNotFoundError:
+        return None
+    fcntl.flock(f, fcntl.LOCK_SH)
+    try:
+        # Evicted objects are moved away before their lock is released
+        current = os.path.samestat(
+            os.fstat(f.fileno()), os.stat(dpath / FNAME_LOCK)
+        )
+    except FileNotFoundError:
+        current = False
+    if not current:
+        f.close()
+        return None
+    return f
+
+
+def _sort_key(metadata: Dict) -> tuple:
+    return metadata["arxiv_id"], metadata["version"] or 0
+
+
+class CacheEntry:
+    def __init__(
+        self,
+        dpath: Path,
+        metadata: Dict,
+        lock: IO[bytes] | None = None,
+    ):
+        self.dpath = dpath
+        self.metadata = metadata
+        self._lock = lock
+
+    def release(self) -> None:
+        """Allow the object to be evicted. Also done when garbage collected."""
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def __del__(self):
+        self.release()
+
+    def __enter__(self) -> "CacheEntry":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    @property
+    def dpath_source_arxiv(self) -> Path:
+        return self.dpath / DNAME_SOURCE
+
+    @property
+    def fpath_markdown(self) -> Path:
+        return self.dpath / DNAME_MARKDOWN / f"{converter_version()}.md"
+
+
+class Cache:
+    """
+    Persistent cache of arXiv sources and conversion results.
+
+    Every paper version is mapped to the SHA-256 of its source tarball.
+    The tarball, the extracted tree, the LaTeXML outputs and the
+    Markdown of each converter version are stored together under that
+    hash, so identical sources are stored only once. When the cache
+    grows beyond `max_size` bytes, the least recently used sources are
+    evicted, except those in use by a `CacheEntry` of any thread or
+    process. An ID without a version is answered with the latest cached
+    version for `unversioned_ttl` seconds after arXiv last reported it
+    as the current one. Objects in use are only locked where `fcntl` is
+    available, not on Windows.
+    """
+
+    def __init__(
+        self,
+        dpath_cache: str | Path,
+        max_size: int | None = None,
+        unversioned_ttl: float = UNVERSIONED_TTL,
+    ):
+        self.dpath_cache = Path(dpath_cache).resolve()
+        self.dpath_index = self.dpath_cache / DNAME_INDEX
+        self.dpath_objects = self.dpath_cache / DNAME_OBJECTS
+        self.max_size = max_size
+        self.unversioned_ttl = unversioned_ttl
+        self.dpath_index.mkdir(parents=True, exist_ok=True)
+        self.dpath_objects.mkdir(parents=True, exist_ok=True)
+        # The size of each object, counted on the first eviction and
+        # kept up to date afterwards
+        self._sizes = None
+        self._sizes_lock = threading.Lock()
+
+    @staticmethod
+    def _key(arxiv_id: str) -> str:
+        return arxiv_id.replace("/", "_")
+
+    def lookup(self, arxiv_id: str) -> CacheEntry | None:
+        key = self._key(arxiv_id)
+        if re.search(r"v\d+$", key):
+            fpaths_index = [self.dpath_index / f"{key}.json"]
+        else:
+            # Use the latest cached version of the paper, as long as
+            # arXiv reported it as the current one recently
+            fpaths_index = sorted(
+                self.dpath_index.glob(f"{key}v*.json"),
+                key=lambda f: int(f.stem.rsplit("v", 1)[1]),
+                reverse=True,
+            )[:1]
+            if fpaths_index and not self._is_current(fpaths_index[0]):
+                return None
+
+        for fpath_index in fpaths_index:
+            if not fpath_index.exists():
+                continue
+            with open(fpath_index, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            dpath = self.dpath_objects / index["sha256"]
+            lock = _checkout(dpath) if dpath.exists() else None
+            if lock is None:
+                fpath_index.unlink(missing_ok=True)
+                continue
+            os.utime(dpath)
+            return CacheEntry(dpath, index["metadata"], lock)
+        return None
+
+    def _is_current(self, fpath_index: Path) -> bool:
+        try:
+            mtime = fpath_index.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return time.time() - mtime <= self.unversioned_ttl
+
+    def lookup_paper(self, paper: "arxiv.Result") -> CacheEntry | None:
+        """
+        Look up the version of `paper`, which arXiv just reported as
+        the current one, and restart the TTL of its unversioned ID.
+        """
+        entry = self.lookup(paper.get_short_id())
+        if entry:
+            fpath_index = self.dpath_index / (
+                f"{self._key(paper.get_short_id())}.json"
+            )
+            os.utime(fpath_index)
+        return entry
+
+    def _store(self, paper: "arxiv.Result", stream: IO[bytes]) -> CacheEntry:
+        # The source is extracted while it is downloaded, so the hash is
+        # only known at the end
+        dpath_tmp = Path(
+            tempfile.mkdtemp(prefix=".tmp-", dir=self.dpath_objects)
+        )
+        try:
+            with stage("extract"), open(dpath_tmp / FNAME_SOURCE, "wb") as f:
+                tee = _TeeStream(stream, f)
+                extract_source(tee, dpath_tmp / DNAME_SOURCE)
+                tee.drain()
+        except BaseException:
+            shutil.rmtree(dpath_tmp, ignore_errors=True)
+            raise
+
+        sha256 = tee.sha256.hexdigest()
+        dpath = self.dpath_objects / sha256
+        # Locked before it is visible, so it cannot be evicted before
+        # it is used
+        lock = _checkout(dpath_tmp)
+        for attempt in range(3):
+            try:
+                dpath_tmp.rename(dpath)
+                self._set_size(dpath)
+                break
+            except OSError:
+                # Already stored, e.g. by another worker, unless it was
+                # evicted meanwhile
+                lock_stored = _checkout(dpath)
+                if lock_stored is not None:
+                    lock.close()
+                    lock = lock_stored
+                    shutil.rmtree(dpath_tmp, ignore_errors=True)
+                    break
+                if attempt == 2:
+                    lock.close()
+                    shutil.rmtree(dpath_tmp, ignore_errors=True)
+                    raise
+
+        metadata = get_metadata(paper)
+        key = self._key(paper.get_short_id())
+        fpath_index = self.dpath_index / f"{key}.json"
+        fpath_tmp = fpath_index.with_suffix(".tmp")
+        with open(fpath_tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"sha256": sha256, "metadata": metadata},
+                f, ensure_ascii=False, indent=2,
+            )
+        fpath_tmp.replace(fpath_index)
+        return CacheEntry(dpath, metadata, lock)
+
+    def object_metadata(self) -> Dict[str, Dict]:
+        """
+        The metadata of the paper of each stored object, by its hash.
+        If several papers share the sources, the latest ID and version
+        is used.
+        """
+        metadata = {}
+        for fpath_index in self.dpath_index.glob("*.json"):
+            try:
+                with open(fpath_index, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except (FileNotFoundError, ValueError):
+                # Removed or being written meanwhile
+                continue
+            other = metadata.get(index["sha256"])
+            if other is None or _sort_key(other) < _sort_key(
+                index["metadata"]
+            ):
+                metadata[index["sha256"]] = index["metadata"]
+        return metadata
+
+    def get_source(
+        self,
+        arxiv_id: str,
+        resolver: MetadataResolver | None = None,
+        provider: SourceProvider | None = None,
+    ) -> CacheEntry:
+        entry = self.lookup(arxiv_id)
+        if entry:
+            return entry
+
+        paper = query_paper(arxiv_id, resolver)
+        entry = self.lookup_paper(paper)
+        if entry:
+            return entry
+        provider = provider or get_source_provider()
+        with provider.open(paper) as stream:
+            return self._store(paper, stream)
+
+    def read_markdown(self, entry: CacheEntry) -> str | None:
+        if not entry.fpath_markdown.exists():
+            return None
+        with open(entry.fpath_markdown, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def write_markdown(self, entry: CacheEntry, content_md: str) -> None:
+        with self.open_markdown(entry) as f:
+            f.write(content_md)
+
+    @contextmanager
+    def open_markdown(self, entry: CacheEntry) -> Iterator[IO[str]]:
+        """Write the Markdown of `entry` in pieces, kept only if complete."""
+        entry.fpath_markdown.parent.mkdir(exist_ok=True)
+        # Papers with identical sources share the entry and may write
+        # it at the same time
+        f = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=entry.fpath_markdown.parent,
+            suffix=".tmp", delete=False,
+        )
+        fpath_tmp = Path(f.name)
+        try:
+            with f:
+                yield f
+        except BaseException:
+            fpath_tmp.unlink(missing_ok=True)
+            raise
+        fpath_tmp.replace(entry.fpath_markdown)
+        # Also counts the LaTeXML outputs written since it was stored
+        self._set_size(entry.dpath)
+
+    def _set_size(self, dpath: Path) -> None:
+        with self._sizes_lock:
+            if self._sizes is not None:
+                self._sizes[dpath.name] = _dir_size(dpath)
+
+    def evict(self) -> None:
+        if self.max_size is None:
+            return
+
+        with self._sizes_lock:
+            if self._sizes is None:
+                self._sizes = {
+                    d.name: _dir_size(d)
+                    for d in self.dpath_objects.iterdir()
+                    if d.is_dir() and not d.name.startswith(".")
+                }
+            total_size = sum(self._sizes.values())
+            if total_size <= self.max_size:
+                return
+
+            mtimes = {}
+            for name in list(self._sizes):
+                try:
+                    mtimes[name] = (self.dpath_objects / name).stat().st_mtime
+                except FileNotFoundError:
+                    # Evicted by another process
+                    total_size -= self._sizes.pop(name)
+            for name in sorted(mtimes, key=mtimes.get):
+                if total_size <= self.max_size:
+                    break
+                if self._evict_object(self.dpath_objects / name):
+                    total_size -= self._sizes.pop(name)
+
+    def _evict_object(self, dpath: Path) -> bool:
+        # False if the object is in use
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        try:
+            f = open(dpath / FNAME_LOCK, "ab")
+        except FileNotFoundError:
+            return True
+        with f:
+            if fcntl:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            else:
+                # Windows does not rename a directory with open files
+                f.close()
+            # Moved away while locked, so that it cannot be checked out
+            # while it is being removed
+            dpath_trash = Path(
+                tempfile.mkdtemp(prefix=".evict-", dir=self.dpath_objects)
+            )
+            try:
+                dpath.rename(dpath_trash / dpath.name)
+            except PermissionError:
+                # Files of the object are open on Windows
+                dpath_trash.rmdir()
+                return False
+        shutil.rmtree(dpath_trash, ignore_errors=True)
+        return True
@@ -1,60 +1,434 @@
 from pathlib import Path
 import subprocess
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+import queue
+import os
 import re
-
-from bs4 import BeautifulSoup, NavigableString
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, Tuple
 
 from ._utils import get_main_texfile
+from ._document import Block
+from ._stats import stage
+from ._styles import StyleStore, get_style_store
 
 
 FNAME_XML = "paper.xml"
 FNAME_JATS = "paper.jats.xml"
 
 
-def tex2xml(dpath_source: Path, title: str, verbose: bool) -> Path:
-    dpath_work = dpath_source.parent
-    fpath_xml = dpath_work / FNAME_XML
-    fpath_jats = dpath_work / FNAME_JATS
+POSTPROCESS_OPTIONS = [
+    "--format=jats",
+    "--nographicimages",
+    "--nodefaultresources",
+    "--nopictureimages",
+    "--nomathimages",
+]
+ENGINES = ("latexml", "latexmlc", "server")
+STDERR_TAIL_LINES = 20
+
+_RE_FOOTNOTE_GROUP = re.compile(r"\[\[(\^.*?)\]\]")
+_RE_CITATION_GROUP = re.compile(r"\[\[(\d+)\](?:,\s*\[(\d+)\])*\]")
+_RE_DIGITS = re.compile(r"\d+")
+# Wider than any number in a reference ID, so that zero-padded numbers
+# sort in numeric order
+REF_KEY_DIGITS = 20
+CITATION_TAGS = ("mixed-citation", "element-citation")
+REFERENCE_FIELDS = ("article-title", "year", "source")
+NAME_FIELDS = ("surname", "given-names")
+# Characters dropped from math alttext, in one pass
+_ALTTEXT_DELETE = str.maketrans("", "", "\n%")
+
+
+class LaTeXMLError(RuntimeError):
+    """A LaTeXML process failed, timed out or was cancelled."""
+
+    def __init__(
+        self,
+        command: str,
+        returncode: int | None,
+        stderr_tail: str,
+        elapsed: float,
+        timed_out: bool = False,
+    ):
+        self.command = command
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+        if timed_out:
+            reason = "timed out"
+        elif returncode is None:
+            reason = "was cancelled"
+        else:
+            reason = f"failed with exit code {returncode}"
+        message = f"`{command}` {reason} after {elapsed:.1f} s"
+        if stderr_tail:
+            message += f":\n{stderr_tail}"
+        super().__init__(message)
+
+
+class LaTeXMLNotFoundError(FileNotFoundError):
+    """A LaTeXML command is not installed."""
+
+
+def _rlimits(
+    memory_limit: int | None,
+    cpu_limit: int | None,
+) -> List[Tuple[int, Tuple[int, int]]]:
+    # Imported in the parent: an import in a child forked from a thread
+    # can deadlock on an import lock held by another thread
+    import resource
+    rlimits = []
+    if memory_limit:
+        rlimits.append((resource.RLIMIT_AS, (memory_limit, memory_limit)))
+    if cpu_limit:
+        rlimits.append((resource.RLIMIT_CPU, (cpu_limit, cpu_limit)))
+    return rlimits
+
+
+def _limit_resources(rlimits: List[Tuple[int, Tuple[int, int]]]):
+    # A `preexec_fn` that sets the limits in the child, only where
+    # `resource.prlimit` is missing, as `preexec_fn` is not safe when
+    # other threads are running
+    import resource
+    if not rlimits or hasattr(resource, "prlimit"):
+        return None
+
+    def preexec():
+        for limit, value in rlimits:
+            resource.setrlimit(limit, value)
+    return preexec
+
+
+def _set_rlimits(pid: int, rlimits: List[Tuple[int, Tuple[int, int]]]):
+    # Set right after the process is started, before it loads anything
+    # worth limiting, and inherited by the processes it starts
+    import resource
+    if not hasattr(resource, "prlimit"):
+        return
+    try:
+        for limit, value in rlimits:
+            resource.prlimit(pid, limit, value)
+    except ProcessLookupError:
+        # Already exited
+        pass
+
+
+def _run(
+    command: List,
+    fpath_dest: Path,
+    cwd: Path,
+    verbose: bool,
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    cancel: threading.Event | None = None,
+) -> None:
+    # The process gets its own process group so that everything it
+    # spawns is killed on timeout or cancellation
+    fpath_dest.unlink(missing_ok=True)
+    rlimits = _rlimits(memory_limit, cpu_limit)
+
+    with tempfile.TemporaryFile() as f_stderr, stage(Path(command[0]).name):
+        start = time.monotonic()
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdout=None if verbose else subprocess.DEVNULL,
+            stderr=None if verbose else f_stderr,
+            start_new_session=True,
+            preexec_fn=_limit_resources(rlimits),
+        )
+        _set_rlimits(process.pid, rlimits)
+        timed_out = False
+        try:
+            while process.poll() is None:
+                elapsed = time.monotonic() - start
+                if timeout is not None and elapsed > timeout:
+                    timed_out = True
+                    break
+                if cancel is not None and cancel.is_set():
+                    break
+                try:
+                    process.wait(0.2)
+                except subprocess.TimeoutExpired:
+                    pass
+        finally:
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+        elapsed = time.monotonic() - start
+
+        if not _failed(process.returncode, fpath_dest, timed_out):
+            return
+
+        f_stderr.seek(0)
+        stderr = f_stderr.read().decode("utf-8", errors="replace")
 
-    result = subprocess.run(
-        ["which", "latexml"],
-        capture_output=True,
-        text=True,
+    fpath_dest.unlink(missing_ok=True)
+    returncode = None if (cancel is not None and cancel.is_set()) \
+        else process.returncode
+    raise _latexml_error(command, returncode, stderr, elapsed, timed_out)
+
+
+def _failed(returncode: int, fpath_dest: Path, timed_out: bool) -> bool:
+    return timed_out or returncode < 0 \
+        or (returncode != 0 and not fpath_dest.exists())
+
+
+def _latexml_error(
+    command: List,
+    returncode: int | None,
+    stderr: str,
+    elapsed: float,
+    timed_out: bool,
+) -> LaTeXMLError:
+    stderr_tail = "\n".join(stderr.splitlines()[-STDERR_TAIL_LINES:])
+    return LaTeXMLError(
+        Path(command[0]).name, returncode, stderr_tail, elapsed, timed_out
     )
-    if not result.stdout.strip():
-        raise FileNotFoundError(
-            "Could not find the `latexml` command. Please refer to "
+
+
+@lru_cache(maxsize=None)
+def _check_command(command: str) -> None:
+    if shutil.which(command) is None:
+        raise LaTeXMLNotFoundError(
+            f"Could not find the `{command}` command. Please refer to "
             "this guide for installing LaTeXML: "
             "https://github.com/misya11p/arxiv2md"
         )
 
-    fpath_tex = get_main_texfile(dpath_source, title)
+
+def _free_ports(n: int) -> List[int]:
+    # Bound at the same time, so that they are distinct. A server of
+    # this pool holds its port once it is started.
+    sockets = []
+    try:
+        for _ in range(n):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+class LaTeXMLServerPool:
+    """
+    Ports of warm `latexmls` servers shared by conversions.
+
+    `latexmlc --expire` spawns a server on its port the first time it
+    is used and later conversions are sent to it, so the Perl start-up
+    and the loading of bindings are paid once per server instead of
+    once per paper. Each port serves one conversion at a time, so each
+    pool gets its own ports.
+
+    Args:
+        size (int, optional): The number of servers. Defaults to 1.
+        port (int | None, optional): The port of the first server. The
+            others use the following ports. If None, free ports are
+            chosen, so that pools of other calls, processes and runs on
+            the same host do not share servers. Defaults to None.
+        expire (int, optional): The idle time in seconds after which a
+            server exits. Defaults to 600.
+        autoflush (int, optional): The number of conversions after
+            which a server is restarted to release its memory.
+            Defaults to 100.
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        port: int | None = None,
+        expire: int = 600,
+        autoflush: int = 100,
+    ):
+        self.expire = expire
+        self.autoflush = autoflush
+        self._ports = queue.Queue()
+        if port is None:
+            ports = _free_ports(size)
+        else:
+            ports = range(port, port + size)
+        for port in ports:
+            self._ports.put(port)
+
+    @contextmanager
+    def acquire(self) -> Iterator[int]:
+        port = self._ports.get()
+        try:
+            yield port
+        finally:
+            self._ports.put(port)
+
+
+_default_server_pool = None
+
+
+def _get_server_pool() -> LaTeXMLServerPool:
+    global _default_server_pool
+    if _default_server_pool is None:
+        _default_server_pool = LaTeXMLServerPool()
+    return _default_server_pool
+
+
+def tex2xml(
+    dpath_source: Path,
+    title: str,
+    verbose: bool,
+    reuse: bool = False,
+    engine: str = "latexml",
+    server_pool: LaTeXMLServerPool | None = None,
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+    cancel: threading.Event | None = None,
+    style_store: StyleStore | None = None,
+) -> Path:
+    """
+    Convert the main .tex file in `dpath_source` to JATS with LaTeXML.
+
+    With the "latexml" engine, `latexml` and `latexmlpost` run one
+    after the other and `paper.xml` is kept. "latexmlc" does both steps
+    in a single process, and "server" sends the conversion to a warm
+    `latexmls` server from `server_pool`.
+
+    Each process is killed with its whole process group when it runs
+    longer than `timeout` seconds or when `cancel` is set, and is run
+    with RLIMIT_AS of `memory_limit` bytes and RLIMIT_CPU of
+    `cpu_limit` seconds. With the "server" engine, the limits are not
+    applied: the `latexmls` server is started by the first `latexmlc`
+    client and would inherit them, and RLIMIT_CPU counts the CPU time
+    of all the papers it converts. Only the timeout is enforced, and
+    it is also passed to the server. A non-zero exit code is an error
+    only if no output was written, since LaTeXML also exits non-zero
+    on recoverable errors. Failures raise `LaTeXMLError`.
+
+    The style files bundled in `dpath_source` that `style_store` (or
+    the shared store, if one was set) has bindings for are not
+    interpreted by LaTeXML; their bindings are loaded instead.
+    """
+    dpath_work = dpath_source.parent
+    fpath_jats = dpath_work / FNAME_JATS
+    if reuse and fpath_jats.exists():
+        return fpath_jats
+
+    fpath_tex = _find_main_texfile(dpath_source, title, engine)
+    latexml_options = _style_options(dpath_source, style_store)
+    run_options = {
+        "cwd": dpath_work,
+        "verbose": verbose,
+        "timeout": timeout,
+        "cancel": cancel,
+    }
+
+    if engine != "server":
+        commands = _commands(
+            fpath_tex, dpath_work, engine, reuse,
+            latexml_options=latexml_options,
+        )
+        for command, fpath_dest in commands:
+            _run(
+                command, fpath_dest, memory_limit=memory_limit,
+                cpu_limit=cpu_limit, **run_options,
+            )
+        return fpath_jats
+
+    server_pool = server_pool or _get_server_pool()
+    with server_pool.acquire() as port:
+        server_options = _server_options(server_pool, port, timeout)
+        commands = _commands(
+            fpath_tex, dpath_work, engine, reuse, server_options,
+            latexml_options,
+        )
+        for command, fpath_dest in commands:
+            _run(command, fpath_dest, **run_options)
+    return fpath_jats
+
+
+def _find_main_texfile(dpath_source: Path, title: str, engine: str) -> Path:
+    _check_command("latexml" if engine == "latexml" else "latexmlc")
+
+    with stage("main_tex"):
+        fpath_tex = get_main_texfile(dpath_source, title)
     if not fpath_tex:
         raise FileNotFoundError(f"Could not find the main .tex file")
+    return fpath_tex
+
+
+def _style_options(
+    dpath_source: Path,
+    style_store: StyleStore | None,
+) -> List[str]:
+    style_store = style_store or get_style_store()
+    if style_store is None:
+        return []
+    return style_store.latexml_options(dpath_source)
+
+
+def _server_options(
+    server_pool: LaTeXMLServerPool,
+    port: int,
+    timeout: float | None,
+) -> List[str]:
+    options = [
+        f"--port={port}",
+        f"--expire={server_pool.expire}",
+        f"--autoflush={server_pool.autoflush}",
+    ]
+    if timeout is not None:
+        options.append(f"--timeout={int(timeout)}")
+    return options
+
+
+def _commands(
+    fpath_tex: Path,
+    dpath_work: Path,
+    engine: str,
+    reuse: bool = False,
+    server_options: List[str] | None = None,
+    latexml_options: List[str] | None = None,
+) -> List[Tuple[List, Path]]:
+    """The LaTeXML commands of `engine` and the file each one writes."""
+    fpath_xml = dpath_work / FNAME_XML
+    fpath_jats = dpath_work / FNAME_JATS
 
-    command_latexml = [
-        "latexml",
+    if engine == "latexml":
+        command_latexml = [
+            "latexml",
+            fpath_tex,
+            *(latexml_options or []),
+            f"--dest={fpath_xml}"
+        ]
+        command_latexmlpost = [
+            "latexmlpost",
+            fpath_xml,
+            *POSTPROCESS_OPTIONS,
+            f"--dest={fpath_jats}",
+        ]
+        commands = [(command_latexmlpost, fpath_jats)]
+        if not (reuse and fpath_xml.exists()):
+            commands.insert(0, (command_latexml, fpath_xml))
+        return commands
+
+    command_latexmlc = [
+        "latexmlc",
         fpath_tex,
-        f"--dest={fpath_xml}"
-    ]
-    command_latexmlpost = [
-        "latexmlpost",
-        fpath_xml,
-        "--format=jats",
-        "--nographicimages",
-        "--nodefaultresources",
-        "--nopictureimages",
-        "--nomathimages",
+        *POSTPROCESS_OPTIONS,
+        f"--sourcedirectory={fpath_tex.parent}",
+        *(latexml_options or []),
         f"--dest={fpath_jats}",
+        *(server_options or []),
     ]
-    subprocess_options = {
-        "cwd": dpath_work,
-        "stdout": None if verbose else subprocess.DEVNULL,
-        "stderr": None if verbose else subprocess.DEVNULL,
-    }
-    subprocess.run(command_latexml, **subprocess_options)
-    subprocess.run(command_latexmlpost, **subprocess_options)
-    return fpath_jats
+    return [(command_latexmlc, fpath_jats)]
 
 
 # ======================================================================
@@ -62,8 +436,41 @@ def tex2xml(dpath_source: Path, title: str, verbose: bool) -> Path:
 # modifications made by the developer
 
 
+def _natural_key(ref_id: str) -> str:
+    return _RE_DIGITS.sub(lambda m: m.group(0).zfill(REF_KEY_DIGITS), ref_id)
+
+
+def _first_descendants(elem, names):
+    """The first descendant of `elem` with each of `names`, in one walk."""
+    found = {}
+    for descendant in elem.descendants:
+        if descendant.name in names and descendant.name not in found:
+            found[descendant.name] = descendant
+    return found
+
+
+def _find_outside_math(elem, name):
+    """`elem.find(name)` that does not walk the MathML of formulas."""
+    stack = [iter(elem.contents)]
+    while stack:
+        for child in stack[-1]:
+            if child.name == name:
+                return child
+            if child.name is not None and child.name != "math":
+                stack.append(iter(child.contents))
+                break
+        else:
+            stack.pop()
+    return None
+
+
 class JATSConverter:
+    _collect_blocks = False
+
     def __init__(self, dpath_source: Path):
+        # bs4 takes long to import and is only needed from here on
+        from bs4 import BeautifulSoup
+
         fpath_jats = dpath_source / FNAME_JATS
         with open(fpath_jats, "r", encoding="utf-8") as f:
             content = f.read()
@@ -74,29 +481,97 @@ class JATSConverter:
         self.ref_counter = 0
         self.references = {}
         self.output = []
+        self._started = False
+        self._last_chunk = ""
+        self._blocks = []
+        self._section_path = []
+        self._cites = []
+        self._footnote_ids = set()
 
     def convert_to_md(self):
+        return "".join(self.iter_markdown())
+
+    def iter_markdown(self) -> Iterator[str]:
+        """
+        Yield the Markdown in chunks as it is produced.
+
+        The first chunk holds the title and the abstract, then each
+        top-level section follows in its own chunk, and the references
+        come last. Joined, the chunks equal `convert_to_md()`.
+        """
         self._clear()
 
         self._extract_title()
         self._extract_abstract()
-        self._extract_body()
+        yield from self._flush_output()
+        body = _find_outside_math(self.soup, "body")
+        if body:
+            for section in body.find_all("sec", recursive=False):
+                self._process_section(section, level=2)
+                yield from self._flush_output()
         self._extract_references()
         self._format_references()
+        yield from self._flush_output()
+        yield from self._finish_output()
+
+    def iter_blocks(self) -> Iterator[Block]:
+        """
+        Yield the document as `Block`s, in the order of the Markdown.
+
+        The blocks are recorded by the same walk that produces the
+        Markdown, so no second parse of the output is needed.
+        """
+        self._collect_blocks = True
+        try:
+            for _ in self.iter_markdown():
+                yield from self._blocks
+                self._blocks = []
+            yield from self._blocks
+        finally:
+            self._collect_blocks = False
+
+    def _add_block(self, block_type, markdown, text, block_id=None):
+        self.output.append(markdown)
+        if self._collect_blocks:
+            # Kept next to its line, so that it moves along with it
+            self.output.append(Block(
+                block_type,
+                text,
+                tuple(self._section_path),
+                tuple(dict.fromkeys(self._cites)),
+                block_id,
+            ))
+        self._cites = []
+
+    def _flush_output(self) -> Iterator[str]:
+        # Emit the lines collected so far as if all lines were joined
+        # with newlines at the end
+        if self._collect_blocks:
+            self._blocks += [b for b in self.output if isinstance(b, Block)]
+            self.output = [b for b in self.output if isinstance(b, str)]
+        if not self.output:
+            return
+        chunk = "\n".join(self.output)
+        if self._started:
+            chunk = "\n" + chunk
+        self._started = True
+        self.output = []
+        if chunk:
+            self._last_chunk = chunk
+            yield chunk
 
-        markdown_content = "\n".join(self.output)
-        if markdown_content[-1] != "\n":
-            markdown_content += "\n"
-
-        return markdown_content
+    def _finish_output(self) -> Iterator[str]:
+        if not self._last_chunk.endswith("\n"):
+            yield "\n"
 
     @staticmethod
     def _clean_text(text):
         if not text:
             return ""
-        text = text.strip()
-        text = re.sub(r"\s+", " ", text)
-        text = re.sub(r"\[\[(\^.*?)\]\]", r"[\1]", text)
+        # str.split() splits on the same whitespace as \s and strips
+        text = " ".join(text.split())
+        if "[[" in text:
+            text = _RE_FOOTNOTE_GROUP.sub(r"[\1]", text)
         return text
 
     @staticmethod
@@ -108,33 +583,31 @@ class JATSConverter:
         return fn_id.replace("id", "fn")
 
     def _extract_title(self):
-        title = self.soup.find("article-title")
+        title = _find_outside_math(self.soup, "article-title")
         if title:
-            self.output.append(f"# {self._clean_text(title.get_text())}\n")
+            title_text = self._clean_text(title.get_text())
+            self._add_block("title", f"# {title_text}\n", title_text)
 
     def _extract_abstract(self):
-        abstract = self.soup.find("abstract")
+        abstract = _find_outside_math(self.soup, "abstract")
         if abstract:
             self.output.append("## Abstract\n")
             for p in abstract.find_all("p"):
-                self.output.append(self._process_paragraph(p))
+                paragraph = self._process_paragraph(p)
+                self._add_block("abstract", paragraph, paragraph)
             self.output.append("")
 
-    def _extract_body(self):
-        body = self.soup.find("body")
-        if body:
-            for section in body.find_all("sec", recursive=False):
-                self._process_section(section, level=2)
-
     def _extract_references(self):
-        ref_list = self.soup.find("ref-list")
+        ref_list = _find_outside_math(self.soup, "ref-list")
         if not ref_list:
             return None
 
         for ref in ref_list.find_all("ref"):
             ref_id = ref.get("id", "")
             ref_id = self._clean_bibid(ref_id)
-            citation = ref.find("mixed-citation") or ref.find("element-citation")
+            found = _first_descendants(ref, CITATION_TAGS)
+            citation = found.get("mixed-citation") \
+                or found.get("element-citation")
             if citation:
                 ref_text = self._format_reference(citation)
                 self.references[ref_id] = ref_text
@@ -144,25 +617,32 @@ class JATSConverter:
             return
 
         self.output.append("## References\n")
-        max_digit = len(max(self.references.keys(), key=len))
+        # The sort key of each ID is computed once
         for ref_id, ref_text in sorted(
-            self.references.items(),
-            key=lambda x: re.sub(r"\d+", lambda m: m.group(0).zfill(max_digit), x[0])
+            self.references.items(), key=lambda x: _natural_key(x[0])
         ):
-            self.output.append(f"[^{ref_id}]: {ref_text}")
+            block_type = "footnote" if ref_id in self._footnote_ids \
+                else "reference"
+            self._add_block(
+                block_type, f"[^{ref_id}]: {ref_text}", ref_text, ref_id
+            )
         self.output.append("")
 
     def _process_section(self, section, level):
         title = section.find("title")
+        title_text = self._clean_text(title.get_text()) if title else ""
+        self._section_path.append(title_text)
         if title:
-            title_text = self._clean_text(title.get_text())
-            self.output.append(f"{'#' * level} {title_text}\n")
+            self._add_block(
+                "heading", f"{'#' * level} {title_text}\n", title_text
+            )
 
         for child in section.children:
             if child.name == "sec":
                 self._process_section(child, level + 1)
             elif child.name == "p":
-                self.output.append(self._process_paragraph(child))
+                paragraph = self._process_paragraph(child)
+                self._add_block("paragraph", paragraph, paragraph)
                 self.output.append("")
             elif child.name == "fig":
                 self._process_figure(child)
@@ -170,11 +650,13 @@ class JATSConverter:
                 self._process_table(child)
             elif child.name in ["disp-formula", "disp-formula-group"]:
                 self._process_formula(child)
+        self._section_path.pop()
 
     def _process_paragraph(self, p):
         result = []
         for child in p.children:
-            if isinstance(child, NavigableString):
+            # Only strings have no name
+            if child.name is None:
                 result.append(str(child))
             elif child.name == "xref":
                 ref_text = self._process_reference(child)
@@ -191,20 +673,25 @@ class JATSConverter:
             else:
                 result.append(self._process_mixed_content(child))
 
-        processed_text = "".join(result)
-        processed_text = re.sub(
-            r"\[\[(\d+)\](?:,\s*\[(\d+)\])*\]",
-            lambda m: self._fix_citation_group(m.group(0)),
-            processed_text
-        )
-        return self._clean_text(processed_text)
+        return self._clean_paragraph("".join(result))
+
+    def _clean_paragraph(self, processed_text):
+        # Collapsing the whitespace first does not change the citation
+        # groups, and the brackets are only searched if there are any
+        text = " ".join(processed_text.split())
+        if "[[" in text:
+            text = _RE_CITATION_GROUP.sub(
+                lambda m: self._fix_citation_group(m.group(0)), text
+            )
+            text = _RE_FOOTNOTE_GROUP.sub(r"[\1]", text)
+        return text
 
     def _fix_citation_group(self, citation_text):
-        numbers = re.findall(r"\d+", citation_text)
+        numbers = _RE_DIGITS.findall(citation_text)
         return f"[{', '.join(numbers)}]"
 
     def _process_mixed_content(self, elem):
-        if isinstance(elem, NavigableString):
+        if elem.name is None:
             return str(elem)
 
         if elem.name == "xref":
@@ -223,6 +710,7 @@ class JATSConverter:
         rid = xref.get("rid", "")
         if rid.startswith("bib.bib"): # Reference to bibliography
             rid = self._clean_bibid(rid)
+            self._cites.append(rid)
             return f"[^{rid}]"
         else: # Reference to figure/table
             return xref.get_text()
@@ -233,10 +721,21 @@ class JATSConverter:
         year = ""
         source = ""
 
-        for person_group in citation.find_all("person-group"):
-            for name in person_group.find_all("name"):
-                surname = name.find("surname")
-                given_names = name.find("given-names")
+        # One walk over the citation instead of a find() per field
+        person_groups, fields = [], {}
+        for elem in citation.descendants:
+            if elem.name == "person-group":
+                person_groups.append(elem)
+            elif elem.name in REFERENCE_FIELDS and elem.name not in fields:
+                fields[elem.name] = elem
+
+        for person_group in person_groups:
+            for name in person_group.descendants:
+                if name.name != "name":
+                    continue
+                name_fields = _first_descendants(name, NAME_FIELDS)
+                surname = name_fields.get("surname")
+                given_names = name_fields.get("given-names")
                 if surname:
                     author_name = surname.get_text()
                     if given_names:
@@ -244,18 +743,23 @@ class JATSConverter:
                         author_name = f"{surname.get_text()}, {initials}"
                     authors.append(author_name)
 
-        article_title = citation.find("article-title")
+        article_title = fields.get("article-title")
         if article_title:
             title = self._clean_text(article_title.get_text())
 
-        year_elem = citation.find("year")
+        year_elem = fields.get("year")
         if year_elem:
             year = year_elem.get_text().strip()
 
-        source_elem = citation.find("source")
+        source_elem = fields.get("source")
         if source_elem:
             source = self._clean_text(source_elem.get_text())
 
+        return self._join_reference(authors, title, year, source) \
+            or self._clean_text(citation.get_text())
+
+    @staticmethod
+    def _join_reference(authors, title, year, source):
         if authors and title:
             author_str = ", ".join(authors[:3])
             if len(authors) > 3:
@@ -271,27 +775,27 @@ class JATSConverter:
 
             return " ".join(ref_parts)
 
-        return self._clean_text(citation.get_text())
+        return None
 
     def _process_figure(self, fig):
         caption = fig.find("caption")
         if caption:
             caption_text = self._process_paragraph(caption.find("p"))
-            self.output.append(f"Figure: {caption_text}")
+            self._add_block("figure", f"Figure: {caption_text}", caption_text)
             self.output.append("")
 
     def _process_table(self, table_wrap):
         caption = table_wrap.find("caption")
         if caption:
             caption_text = self._process_paragraph(caption.find("p"))
-            self.output.append(f"Table: {caption_text}")
+            self._add_block("table", f"Table: {caption_text}", caption_text)
             self.output.append("")
 
     def _process_formula(self, formula):
         math_elem = formula.find("math")
         if math_elem:
             math_text = self._extract_math_text(math_elem)
-            self.output.append(f"$$\n{math_text}\n$$")
+            self._add_block("formula", f"$$\n{math_text}\n$$", math_text)
             self.output.append("")
 
     def _process_footnote(self, fn):
@@ -300,15 +804,21 @@ class JATSConverter:
         fn_text = fn.get_text(strip=True)
         if fn_id:
             self.references[fn_id] = fn_text
+            self._footnote_ids.add(fn_id)
             return f"[^{fn_id}]"
 
     def _extract_math_text(self, formula_elem):
         if not formula_elem:
             return ""
 
-        math_elem = formula_elem.find("math")
-        if not math_elem:
+        # Only the alttext of the math element is read. It is the
+        # element itself or a child of its formula, so its MathML is
+        # searched only if neither holds.
+        if formula_elem.name == "math":
             math_elem = formula_elem
+        else:
+            math_elem = formula_elem.find("math", recursive=False) \
+                or formula_elem.find("math") or formula_elem
 
         alttext = math_elem.get("alttext")
         if alttext:
@@ -317,12 +827,10 @@ class JATSConverter:
 
         return "[math]"
 
-    def _clean_math_alttext(self, alttext):
+    @staticmethod
+    def _clean_math_alttext(alttext):
         if not alttext:
             return ""
 
-        alttext = alttext.replace("&#10;", "")
-        alttext = alttext.replace("\n", "")
-        alttext = alttext.replace("%", "")
-        alttext = re.sub(r"\s+", " ", alttext)
-        return alttext.strip()
+        alttext = alttext.replace("&#10;", "").translate(_ALTTEXT_DELETE)
+        return " ".join(alttext.split())
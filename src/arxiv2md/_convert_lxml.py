@@ -0,0 +1,334 @@
+from pathlib import Path
+
+from lxml import etree
+
+from ._convert import (
+    JATSConverter, FNAME_JATS, CITATION_TAGS, REFERENCE_FIELDS, NAME_FIELDS
+)
+
+
+def _name(elem):
+    # Local name, as BeautifulSoup reports it for `mml:math` etc.
+    if not isinstance(elem.tag, str):
+        return None
+    return elem.tag.rpartition("}")[2]
+
+
+def _node_string(node):
+    # Comments and processing instructions are strings in BeautifulSoup
+    if isinstance(node, etree._ProcessingInstruction):
+        return f"{node.target} {node.text}" if node.text else node.target
+    return node.text or ""
+
+
+def _children(elem):
+    if elem.text:
+        yield elem.text
+    for child in elem:
+        yield child if isinstance(child.tag, str) else _node_string(child)
+        if child.tail:
+            yield child.tail
+
+
+def _get_text(elem, strip=False):
+    if strip:
+        return "".join(s.strip() for s in elem.itertext() if s.strip())
+    return "".join(elem.itertext())
+
+
+def _find(elem, name):
+    for descendant in elem.iterdescendants():
+        if _name(descendant) == name:
+            return descendant
+    return None
+
+
+def _find_child(elem, name):
+    for child in elem:
+        if _name(child) == name:
+            return child
+    return None
+
+
+def _find_all(elem, name):
+    return [d for d in elem.iterdescendants() if _name(d) == name]
+
+
+def _find_first(elem, names):
+    """The first descendant of `elem` with each of `names`, in one walk."""
+    found = {}
+    for descendant in elem.iterdescendants():
+        name = _name(descendant)
+        if name in names and name not in found:
+            found[name] = descendant
+    return found
+
+
+def _release(elem):
+    # Free the subtree and the already processed siblings before it
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+class JATSStreamConverter(JATSConverter):
+    """
+    JATS to Markdown converter on `lxml.etree.iterparse`.
+
+    The document is read in a single pass and every section and
+    reference is released once it is converted, so the whole tree is
+    never held in memory. The output is identical to `JATSConverter`.
+    """
+
+    def __init__(self, dpath_source: Path):
+        self.fpath_jats = dpath_source / FNAME_JATS
+        self._clear()
+
+    def iter_markdown(self):
+        self._clear()
+        title, abstract, body = [], [], []
+        bib_references = {}
+        first = {}
+        in_ref_list = False
+        front_done = False
+        # Sections are yielded as soon as they end once the title and
+        # the abstract are known. Until then they are kept, since the
+        # first `article-title` may also come later, e.g. in a citation.
+        streaming = False
+
+        context = etree.iterparse(
+            str(self.fpath_jats),
+            events=("start", "end"),
+            recover=True,
+            huge_tree=True,
+            strip_cdata=False,
+        )
+        for event, elem in context:
+            name = _name(elem)
+            if event == "start":
+                if name in ("article-title", "abstract", "body", "ref-list"):
+                    if name not in first:
+                        first[name] = elem
+                        in_ref_list = in_ref_list or name == "ref-list"
+                continue
+
+            parent = elem.getparent()
+            if elem is first.get("article-title"):
+                self.output = title
+                text = self._clean_text(_get_text(elem))
+                self._add_block("title", f"# {text}\n", text)
+            if elem is first.get("abstract"):
+                self.output = abstract
+                self.output.append("## Abstract\n")
+                for p in _find_all(elem, "p"):
+                    paragraph = self._process_paragraph(p)
+                    self._add_block("abstract", paragraph, paragraph)
+                self.output.append("")
+
+            if name == "sec" and parent is not None \
+                    and parent is first.get("body"):
+                if not streaming and "article-title" in first \
+                        and ("abstract" in first or front_done):
+                    self.output = title + abstract + body
+                    yield from self._flush_output()
+                    streaming = True
+                self.output = [] if streaming else body
+                self._process_section(elem, level=2)
+                if streaming:
+                    yield from self._flush_output()
+                _release(elem)
+            elif name == "ref" and in_ref_list:
+                self._extract_reference(elem, bib_references)
+                if parent is first["ref-list"]:
+                    _release(elem)
+            elif elem is first.get("ref-list"):
+                in_ref_list = False
+            elif parent is not None and parent.getparent() is None:
+                front_done = front_done or name == "front"
+                _release(elem)
+
+        if not streaming:
+            self.output = title + abstract + body
+            yield from self._flush_output()
+        self.references.update(bib_references)
+        self._format_references()
+        yield from self._flush_output()
+        yield from self._finish_output()
+
+    def _extract_reference(self, ref, references):
+        ref_id = ref.get("id", "")
+        ref_id = self._clean_bibid(ref_id)
+        found = _find_first(ref, CITATION_TAGS)
+        citation = found.get("mixed-citation")
+        if citation is None:
+            citation = found.get("element-citation")
+        if citation is not None:
+            references[ref_id] = self._format_reference(citation)
+
+    def _process_section(self, section, level):
+        title = _find(section, "title")
+        title_text = ""
+        if title is not None:
+            title_text = self._clean_text(_get_text(title))
+        self._section_path.append(title_text)
+        if title is not None:
+            self._add_block(
+                "heading", f"{'#' * level} {title_text}\n", title_text
+            )
+
+        for child in section:
+            name = _name(child)
+            if name == "sec":
+                self._process_section(child, level + 1)
+            elif name == "p":
+                paragraph = self._process_paragraph(child)
+                self._add_block("paragraph", paragraph, paragraph)
+                self.output.append("")
+            elif name == "fig":
+                self._process_figure(child)
+            elif name == "table-wrap":
+                self._process_table(child)
+            elif name in ["disp-formula", "disp-formula-group"]:
+                self._process_formula(child)
+        self._section_path.pop()
+
+    def _process_paragraph(self, p):
+        result = []
+        for child in _children(p):
+            if isinstance(child, str):
+                result.append(child)
+                continue
+            name = _name(child)
+            if name == "xref":
+                result.append(self._process_reference(child))
+            elif name == "italic":
+                result.append(f"*{self._clean_text(_get_text(child))}*")
+            elif name == "bold":
+                result.append(f"**{self._clean_text(_get_text(child))}**")
+            elif name == "inline-formula":
+                math_text = self._extract_math_text(child)
+                result.append(f"${math_text}$")
+            elif name == "fn":
+                result.append(self._process_footnote(child))
+            else:
+                result.append(self._process_mixed_content(child))
+
+        return self._clean_paragraph("".join(result))
+
+    def _process_mixed_content(self, elem):
+        name = _name(elem)
+        if name == "xref":
+            return self._process_reference(elem)
+        elif name == "italic":
+            return f"*{self._clean_text(_get_text(elem))}*"
+        elif name == "bold":
+            return f"**{self._clean_text(_get_text(elem))}**"
+        elif name == "inline-formula":
+            math_text = self._extract_math_text(elem)
+            return f"${math_text}$"
+        else:
+            return self._clean_text(_get_text(elem))
+
+    def _process_reference(self, xref):
+        rid = xref.get("rid", "")
+        if rid.startswith("bib.bib"):
+            rid = self._clean_bibid(rid)
+            self._cites.append(rid)
+            return f"[^{rid}]"
+        else:
+            return _get_text(xref)
+
+    def _format_reference(self, citation):
+        authors = []
+        title = ""
+        year = ""
+        source = ""
+
+        # One walk over the citation instead of a _find() per field
+        person_groups, fields = [], {}
+        for elem in citation.iterdescendants():
+            name = _name(elem)
+            if name == "person-group":
+                person_groups.append(elem)
+            elif name in REFERENCE_FIELDS and name not in fields:
+                fields[name] = elem
+
+        for person_group in person_groups:
+            for name in _find_all(person_group, "name"):
+                name_fields = _find_first(name, NAME_FIELDS)
+                surname = name_fields.get("surname")
+                given_names = name_fields.get("given-names")
+                if surname is not None:
+                    author_name = _get_text(surname)
+                    if given_names is not None:
+                        initials = "".join(
+                            [n[0] + "." for n in _get_text(given_names).split() if n]
+                        )
+                        author_name = f"{_get_text(surname)}, {initials}"
+                    authors.append(author_name)
+
+        article_title = fields.get("article-title")
+        if article_title is not None:
+            title = self._clean_text(_get_text(article_title))
+
+        year_elem = fields.get("year")
+        if year_elem is not None:
+            year = _get_text(year_elem).strip()
+
+        source_elem = fields.get("source")
+        if source_elem is not None:
+            source = self._clean_text(_get_text(source_elem))
+
+        return self._join_reference(authors, title, year, source) \
+            or self._clean_text(_get_text(citation))
+
+    def _process_figure(self, fig):
+        caption = _find(fig, "caption")
+        if caption is not None:
+            caption_text = self._process_paragraph(_find(caption, "p"))
+            self._add_block("figure", f"Figure: {caption_text}", caption_text)
+            self.output.append("")
+
+    def _process_table(self, table_wrap):
+        caption = _find(table_wrap, "caption")
+        if caption is not None:
+            caption_text = self._process_paragraph(_find(caption, "p"))
+            self._add_block("table", f"Table: {caption_text}", caption_text)
+            self.output.append("")
+
+    def _process_formula(self, formula):
+        math_elem = _find(formula, "math")
+        if math_elem is not None:
+            math_text = self._extract_math_text(math_elem)
+            self._add_block("formula", f"$$\n{math_text}\n$$", math_text)
+            self.output.append("")
+
+    def _process_footnote(self, fn):
+        fn_id = fn.get("id", "")
+        fn_id = self._clean_fnid(fn_id)
+        fn_text = _get_text(fn, strip=True)
+        if fn_id:
+            self.references[fn_id] = fn_text
+            self._footnote_ids.add(fn_id)
+            return f"[^{fn_id}]"
+
+    def _extract_math_text(self, formula_elem):
+        if formula_elem is None:
+            return ""
+
+        if _name(formula_elem) == "math":
+            math_elem = formula_elem
+        else:
+            math_elem = _find_child(formula_elem, "math")
+            if math_elem is None:
+                math_elem = _find(formula_elem, "math")
+            if math_elem is None:
+                math_elem = formula_elem
+
+        alttext = math_elem.get("alttext")
+        if alttext:
+            return self._clean_math_alttext(alttext)
+
+        return "[math]"
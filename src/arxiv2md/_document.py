@@ -0,0 +1,89 @@
+import json
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+
+BLOCK_TYPES = (
+    "title",
+    "abstract",
+    "heading",
+    "paragraph",
+    "figure",
+    "table",
+    "formula",
+    "reference",
+    "footnote",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Block:
+    """
+    One block of a converted paper.
+
+    Attributes:
+        type (str): One of `BLOCK_TYPES`.
+        text (str): The Markdown of the block without its syntax, e.g.
+            the title of a heading, the caption of a figure or the
+            LaTeX of a formula. Inline math, emphasis and citation
+            markers (`[^id]`) are kept in paragraphs.
+        section (Tuple[str, ...]): The titles of the enclosing
+            sections, outermost first. A heading is part of its own
+            section.
+        cites (Tuple[str, ...]): The bibliography IDs cited in the
+            block, in order of first appearance.
+        id (str | None): The ID of a reference or a footnote.
+    """
+
+    type: str
+    text: str
+    section: Tuple[str, ...] = ()
+    cites: Tuple[str, ...] = ()
+    id: str | None = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "type": self.type,
+            "text": self.text,
+            "section": list(self.section),
+            "cites": list(self.cites),
+            "id": self.id,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+@dataclass(frozen=True, slots=True)
+class Formula:
+    """
+    One formula of a converted paper.
+
+    Attributes:
+        index (int): The position of the formula in the paper, from 0.
+        latex (str): The LaTeX of the formula, from its alttext.
+        display (bool): True for a displayed formula, False for inline
+            math.
+        section (Tuple[str, ...]): The titles of the enclosing
+            sections, outermost first.
+        id (str | None): The ID of the formula in the JATS, e.g.
+            "S2.E1", if it has one.
+    """
+
+    index: int
+    latex: str
+    display: bool
+    section: Tuple[str, ...] = ()
+    id: str | None = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "index": self.index,
+            "id": self.id,
+            "latex": self.latex,
+            "display": self.display,
+            "section": list(self.section),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
@@ -0,0 +1,391 @@
+from pathlib import Path
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, IO, Iterator
+
+if TYPE_CHECKING:
+    import requests
+
+
+# arXiv asks automated clients for one request every three seconds
+ARXIV_RATE = 1 / 3
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 60.0
+CHUNK_SIZE = 1 << 20
+
+_RE_DIGEST_SHA256 = re.compile(r"sha-256=:?([A-Za-z0-9+/=]+):?", re.I)
+_RE_CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+
+class TokenBucket:
+    """
+    Rate limiter shared by the threads of a `DownloadManager`.
+
+    Up to `burst` requests pass at once, then one every `1 / rate`
+    seconds. `pause` holds every request back, e.g. for a server's
+    Retry-After. With `rate=None`, only pauses are applied.
+    """
+
+    def __init__(self, rate: float | None, burst: int = 1):
+        self.interval = 1 / rate if rate else 0.0
+        self.tolerance = self.interval * (burst - 1)
+        # The time at which the bucket is empty again (GCRA)
+        self._tat = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            wait = tat - self.tolerance - now
+            self._tat = tat + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tat = max(self._tat, now + seconds + self.tolerance)
+
+
+def _retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+        return max(date.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _digest_sha256(headers) -> str | None:
+    """The SHA-256 a server sends in `Repr-Digest` or `Digest`, in hex."""
+    for name in ("Repr-Digest", "Digest"):
+        match = _RE_DIGEST_SHA256.search(headers.get(name, ""))
+        if match:
+            try:
+                return base64.b64decode(match.group(1)).hex()
+            except (binascii.Error, ValueError):
+                return None
+    return None
+
+
+class _ResumableStream(io.RawIOBase):
+    """
+    The raw body of a response that resumes with a Range request if
+    the connection breaks, and checks its length and SHA-256 at the end.
+    """
+
+    def __init__(
+        self,
+        manager: "DownloadManager",
+        url: str,
+        response: "requests.Response",
+        sha256: str | None = None,
+        offset: int = 0,
+        sha=None,
+    ):
+        import urllib3
+
+        self._manager = manager
+        self._url = url
+        self._response = response
+        self._offset = offset
+        self._length = self._total_length(response)
+        self._validator = (
+            response.headers.get("ETag")
+            or response.headers.get("Last-Modified")
+        )
+        self._sha256 = sha256 or _digest_sha256(response.headers)
+        self._sha = sha or hashlib.sha256()
+        self._resumes = 0
+        self._verified = False
+        self._read_errors = (urllib3.exceptions.HTTPError, OSError)
+        response.raw.decode_content = False
+
+    @staticmethod
+    def _total_length(response: "requests.Response") -> int | None:
+        if response.status_code == 206:
+            match = _RE_CONTENT_RANGE.match(
+                response.headers.get("Content-Range", "")
+            )
+            if match and match.group(2) != "*":
+                return int(match.group(2))
+            return None
+        length = response.headers.get("Content-Length")
+        return int(length) if length and length.isdigit() else None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while True:
+            try:
+                data = self._response.raw.read(len(buffer))
+                break
+            except self._read_errors as e:
+                self._resume(e)
+        if not data:
+            self._verify()
+            return 0
+        self._offset += len(data)
+        self._sha.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _resume(self, error: Exception) -> None:
+        if self._resumes >= self._manager.retries:
+            raise error
+        self._resumes += 1
+        self._response.close()
+
+        headers = {"Range": f"bytes={self._offset}-"}
+        if self._validator:
+            # The server sends the whole file if it has changed
+            headers["If-Range"] = self._validator
+        response = self._manager._get(self._url, headers)
+        response.raw.decode_content = False
+        if response.status_code == 206:
+            match = _RE_CONTENT_RANGE.match(
+                response.headers.get("Content-Range", "")
+            )
+            if not match or int(match.group(1)) != self._offset:
+                response.close()
+                raise IOError(f"{self._url} resumed at a wrong offset")
+        else:
+            validator = (
+                response.headers.get("ETag")
+                or response.headers.get("Last-Modified")
+            )
+            if validator != self._validator:
+                response.close()
+                raise IOError(f"{self._url} changed during the download")
+            # Range is not supported, skip what has been read already
+            skip = self._offset
+            while skip:
+                chunk = response.raw.read(min(skip, CHUNK_SIZE))
+                if not chunk:
+                    break
+                skip -= len(chunk)
+        self._response = response
+
+    def _verify(self) -> None:
+        if self._verified:
+            return
+        self._verified = True
+        if self._length is not None and self._offset != self._length:
+            raise IOError(
+                f"{self._url} ended after {self._offset} of "
+                f"{self._length} bytes"
+            )
+        if self._sha256 and self._sha.hexdigest() != self._sha256.lower():
+            raise ValueError(f"The SHA-256 of {self._url} does not match")
+
+    def close(self) -> None:
+        self._response.close()
+        super().close()
+
+
+class DownloadManager:
+    """
+    Downloads the sources of arXiv papers over one pooled session.
+
+    Requests are rate-limited by a token bucket shared by all threads,
+    and a Retry-After of the server pauses all of them. Connection
+    errors and 429/5xx responses are retried with exponential backoff,
+    and a body cut off mid-way is resumed with a Range request instead
+    of starting over. The length of every body is checked, and its
+    SHA-256 if one is given or the server sends a digest header.
+
+    Args:
+        base_url (str | None, optional): The base URL of the sources,
+            e.g. a local mirror of `https://export.arxiv.org`. The
+            sources are fetched from `{base_url}/src/{id}`. If None,
+            arXiv's export server is used. Defaults to None.
+        rate (float | None, optional): The sustained number of
+            requests per second. If None, arXiv's limit is used for
+            arXiv and no limit for a mirror. Defaults to None.
+        burst (int, optional): The number of requests that may be sent
+            at once before the rate applies. Defaults to 1.
+        retries (int, optional): The number of retries of a request
+            and of resumes of a body. Defaults to 5.
+        backoff (float, optional): The delay in seconds before the
+            first retry, doubled for each further one. Defaults to 1.
+        timeout (float, optional): The connect and read timeout in
+            seconds. Defaults to 60.
+        pool_size (int, optional): The maximum number of pooled
+            connections per host. Defaults to 16.
+        session (requests.Session | None, optional): The session to
+            use instead of a new one. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        rate: float | None = None,
+        burst: int = 1,
+        retries: int = 5,
+        backoff: float = 1.0,
+        timeout: float = 60.0,
+        pool_size: int = 16,
+        session: "requests.Session | None" = None,
+    ):
+        self.base_url = base_url.rstrip("/") if base_url else None
+        if rate is None and base_url is None:
+            rate = ARXIV_RATE
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def _get(
+        self,
+        url: str,
+        headers: Dict[str, str] | None = None,
+    ) -> "requests.Response":
+        import requests
+
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(
+                    url, headers=headers, stream=True, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(min(self.backoff * 2 ** attempt, MAX_BACKOFF))
+                continue
+
+            if response.status_code in RETRY_STATUS \
+                    and attempt < self.retries:
+                delay = _retry_after(response.headers.get("Retry-After"))
+                response.close()
+                if delay is None:
+                    delay = min(self.backoff * 2 ** attempt, MAX_BACKOFF)
+                # Every thread waits, not only this one
+                self.bucket.pause(delay)
+                continue
+            if response.status_code == 416 and headers \
+                    and "Range" in headers:
+                return response
+            response.raise_for_status()
+            return response
+
+    @contextmanager
+    def open(self, url: str, sha256: str | None = None) -> Iterator[IO[bytes]]:
+        """
+        Open the raw body of `url` as a stream.
+
+        Raises:
+            IOError: If the body is cut off and cannot be resumed.
+            ValueError: If the SHA-256 of the body does not match.
+        """
+        response = self._get(url)
+        stream = _ResumableStream(self, url, response, sha256)
+        try:
+            yield stream
+            # Readers may stop early, e.g. at the end of a tar archive,
+            # and the body is only verified at its end
+            while stream.read(CHUNK_SIZE):
+                pass
+        finally:
+            stream.close()
+
+    def download(
+        self,
+        url: str,
+        fpath: str | Path,
+        sha256: str | None = None,
+    ) -> Path:
+        """
+        Download `url` to `fpath`.
+
+        The body is written to `fpath` + ".part" first, so a download
+        that failed in an earlier call continues where it stopped.
+
+        Raises:
+            IOError: If the body is cut off and cannot be resumed.
+            ValueError: If the SHA-256 of the file does not match.
+        """
+        fpath = Path(fpath)
+        fpath_part = fpath.with_name(fpath.name + ".part")
+        offset = fpath_part.stat().st_size if fpath_part.exists() else 0
+        sha = hashlib.sha256()
+        if offset:
+            with open(fpath_part, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    sha.update(chunk)
+
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        response = self._get(url, headers)
+        if response.status_code == 416:
+            # The part file is already complete
+            response.close()
+            if sha256 and sha.hexdigest() != sha256.lower():
+                fpath_part.unlink()
+                raise ValueError(f"The SHA-256 of {url} does not match")
+            os.replace(fpath_part, fpath)
+            return fpath
+        if response.status_code != 206:
+            offset, sha = 0, hashlib.sha256()
+
+        stream = _ResumableStream(self, url, response, sha256, offset, sha)
+        try:
+            with open(fpath_part, "ab" if offset else "wb") as f:
+                while chunk := stream.read(CHUNK_SIZE):
+                    f.write(chunk)
+        except ValueError:
+            # A corrupt file cannot be resumed
+            fpath_part.unlink(missing_ok=True)
+            raise
+        finally:
+            stream.close()
+        os.replace(fpath_part, fpath)
+        return fpath
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_download_manager() -> DownloadManager:
+    """Return the download manager shared by the calls in this process."""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = DownloadManager()
+        return _default_manager
+
+
+def set_download_manager(manager: DownloadManager) -> None:
+    """Use `manager` for the downloads of later calls, e.g. for a mirror."""
+    global _default_manager
+    with _default_manager_lock:
+        _default_manager = manager
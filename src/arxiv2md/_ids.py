@@ -0,0 +1,200 @@
+import itertools
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Tuple
+
+
+# New-style IDs (YYMM.NNNN from 2007, YYMM.NNNNN from 2015) and
+# old-style IDs (archive[.SC]/YYMMNNN until 2007). The subject class of
+# an old-style ID is not part of it, e.g. math.GT/0309136 is
+# math/0309136.
+_NEW_ID = r"\d\d(?:0[1-9]|1[0-2])\.\d{4,5}"
+_OLD_ARCHIVE = r"[a-z]+(?:-[a-z]+)?"
+_OLD_NUMBER = r"/\d\d(?:0[1-9]|1[0-2])\d{3}"
+_OLD_ID = rf"{_OLD_ARCHIVE}(?:\.[A-Z][A-Za-z])?{_OLD_NUMBER}"
+_VERSION = r"v[1-9]\d*"
+
+# An ID anywhere in a URL or a line of text
+_RE_ID = re.compile(
+    rf"(?<![\w.])(?:(?P<new>{_NEW_ID})|(?P<old>{_OLD_ID}))"
+    rf"(?:v(?P<version>[1-9]\d*))?(?![\w])"
+)
+# Any YYMM.NNNN(N) in the text, as matched before IDs were checked,
+# e.g. in 2101.00001_foo or 2113.00001
+_RE_LOOSE_ID = re.compile(r"\d{4}\.\d{4,5}")
+_RE_SUBJECT_CLASS = re.compile(r"\.[A-Za-z]+(?=/)")
+
+# A whole line that is an ID with an optional prefix, as in lists of
+# IDs and OAI harvests. `normalize_ids` matches many lines at once with
+# these and falls back to `parse_arxiv_id` for the rest, e.g. old-style
+# IDs with a subject class.
+_LINE_ID = rf"{_NEW_ID}|{_OLD_ARCHIVE}{_OLD_NUMBER}"
+_LINE = (
+    r"[ \t]*(?:(?i:oai:arxiv\.org:|arxiv:)"
+    r"|https?://(?:www\.|export\.)?arxiv\.org/abs/)?"
+    r"({id}){tail}[ \t\r]*"
+)
+# The prefix of the IDs in OAI harvests, removed before the plain IDs
+# are matched, which is faster than matching it
+OAI_PREFIX = "oai:arXiv.org:"
+
+
+def _compile_line(id: str, tail: str) -> Tuple[re.Pattern, re.Pattern]:
+    # The lines that are plain IDs, after "\n", and every line split
+    # into its ID or, if it is not one, the whole line
+    return (
+        re.compile(rf"\n({id}){tail}(?=\n)"),
+        re.compile(
+            rf"^(?:{_LINE.format(id=id, tail=tail)}|(.*))$", re.MULTILINE
+        ),
+    )
+
+
+# By `versions`
+_RE_LINES = {
+    True: _compile_line(rf"(?:{_LINE_ID})(?:{_VERSION})?", ""),
+    False: _compile_line(_LINE_ID, rf"(?:{_VERSION})?"),
+}
+
+# The number of lines matched at once by `normalize_ids`
+CHUNK_LINES = 4096
+
+
+class ArxivId(NamedTuple):
+    """
+    An arXiv ID and its version.
+
+    Attributes:
+        id (str): The ID without its version, e.g. "2101.00001" or
+            "hep-th/9901001".
+        version (int | None): The version, or None for the latest.
+    """
+
+    id: str
+    version: int | None = None
+
+    def __str__(self) -> str:
+        if self.version is None:
+            return self.id
+        return f"{self.id}v{self.version}"
+
+
+@lru_cache(maxsize=4096)
+def parse_arxiv_id(text: str) -> ArxivId:
+    """
+    Find the arXiv ID in a URL, an `arXiv:` reference or a bare ID.
+
+    Both new-style (2101.00001) and old-style (hep-th/9901001) IDs are
+    recognized, and a version suffix (v2) is kept. Text without a
+    well-formed ID falls back to the first `YYMM.NNNN(N)` in it, without
+    a version, as in earlier releases, e.g. "2101.00001" for
+    "2101.00001_foo".
+
+    Raises:
+        ValueError: If `text` holds no arXiv ID.
+    """
+    match = _RE_ID.search(text)
+    if match is None:
+        match = _RE_LOOSE_ID.search(text)
+        if match is None:
+            raise ValueError(
+                f"Invalid input URL: {text}. Could not extract arXiv ID."
+            )
+        return ArxivId(match.group())
+    version = match.group("version")
+    if match.group("new"):
+        arxiv_id = match.group("new")
+    else:
+        arxiv_id = _RE_SUBJECT_CLASS.sub("", match.group("old"), count=1)
+    return ArxivId(arxiv_id, int(version) if version else None)
+
+
+def file_safe_id(arxiv_id: str) -> str:
+    """
+    The ID as a part of a file name, e.g. "2101-00001v2" or
+    "hep-th-9901001".
+    """
+    return arxiv_id.replace(".", "-").replace("/", "-")
+
+
+def _parse_lines(
+    lines: List[Tuple[str, str]],
+    versions: bool,
+    on_invalid: Callable[[str], None] | None,
+) -> Tuple[List[str], int]:
+    # The IDs and the number of lines that matched as IDs
+    arxiv_ids, n_matched = [], 0
+    for arxiv_id, line in lines:
+        if arxiv_id:
+            arxiv_ids.append(arxiv_id)
+            n_matched += 1
+            continue
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            parsed = parse_arxiv_id(line)
+        except ValueError:
+            if on_invalid is None:
+                raise
+            on_invalid(line)
+            continue
+        arxiv_ids.append(str(parsed) if versions else parsed.id)
+    return arxiv_ids, n_matched
+
+
+def normalize_ids(
+    lines: Iterable[str],
+    versions: bool = True,
+    on_invalid: Callable[[str], None] | None = None,
+) -> Iterator[str]:
+    """
+    Normalize a stream of arXiv IDs or URLs, one per line.
+
+    Blank lines and lines starting with "#" are skipped, and each ID
+    is yielded once, in order of first appearance. Plain IDs, with or
+    without the `oai:arXiv.org:` prefix of OAI harvests, are matched
+    thousands of lines at a time with one regex; only chunks with
+    other lines, e.g. URLs, are parsed line by line.
+
+    Args:
+        lines (Iterable[str]): The lines, e.g. an open file.
+        versions (bool, optional): If False, the version suffixes are
+            dropped, so that the versions of a paper count as one ID.
+            Defaults to True.
+        on_invalid (Callable[[str], None] | None, optional): A function
+            called with each line that holds no valid ID. If None, such
+            a line raises a ValueError. Defaults to None.
+
+    Yields:
+        str: The normalized IDs, e.g. "2101.00001v2" or
+            "hep-th/9901001".
+    """
+    re_plain, re_mixed = _RE_LINES[versions]
+    seen = set()
+    plain = True
+    lines = iter(lines)
+    while chunk := list(itertools.islice(lines, CHUNK_LINES)):
+        text = "".join(chunk)
+        if text.count("\n") != len(chunk):
+            # Lines without their newline, e.g. a list of IDs
+            text = "\n".join(line.rstrip("\n") for line in chunk) + "\n"
+        arxiv_ids = None
+        if plain:
+            arxiv_ids = re_plain.findall("\n" + text.replace(OAI_PREFIX, ""))
+            if len(arxiv_ids) != len(chunk):
+                arxiv_ids = None
+        if arxiv_ids is None:
+            arxiv_ids, n_matched = _parse_lines(
+                re_mixed.findall(text), versions, on_invalid
+            )
+            # Once a chunk has other lines, e.g. URLs, blank or invalid
+            # lines, the next one is likely to have some too
+            plain = n_matched == len(chunk)
+        arxiv_ids = dict.fromkeys(arxiv_ids)
+        if not seen.isdisjoint(arxiv_ids):
+            arxiv_ids = list(
+                itertools.filterfalse(seen.__contains__, arxiv_ids)
+            )
+        seen.update(arxiv_ids)
+        yield from arxiv_ids
@@ -0,0 +1,74 @@
+from pathlib import Path
+import mmap
+import os
+import tempfile
+from typing import Iterable, List, Tuple
+
+
+class OffsetIndex:
+    """
+    A sorted file of `key<TAB>value...` lines, searched by bisection.
+
+    Used to find a paper in a large local file, e.g. a metadata
+    snapshot or a bulk source archive, without reading it all. The
+    index is memory-mapped, so a lookup reads a few pages of it
+    instead of loading millions of keys.
+    """
+
+    def __init__(self, fpath: str | Path):
+        self.fpath = Path(fpath)
+        self._f = open(self.fpath, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        # An empty file cannot be mapped
+        self._mm = (
+            mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            if size else b""
+        )
+
+    @staticmethod
+    def write(fpath: str | Path, rows: Iterable[Tuple[str, ...]]) -> None:
+        """Write the rows, keyed by their first field, atomically."""
+        fpath = Path(fpath)
+        lines = sorted(
+            "\t".join(map(str, row)).encode("utf-8") + b"\n" for row in rows
+        )
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=fpath.parent, prefix=".tmp-", delete=False,
+        ) as f:
+            f.writelines(lines)
+        os.replace(f.name, fpath)
+
+    def get(self, key: str) -> List[str] | None:
+        """The values of `key`, or None if it is not in the index."""
+        key = key.encode("utf-8")
+        mm = self._mm
+        lo, hi = 0, len(mm)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            # The line around `mid`. `lo` is always the start of a line.
+            start = mm.rfind(b"\n", lo, mid) + 1 or lo
+            end = mm.find(b"\n", mid)
+            fields = mm[start:end].split(b"\t")
+            if fields[0] == key:
+                return [value.decode("utf-8") for value in fields[1:]]
+            if fields[0] < key:
+                lo = end + 1
+            else:
+                hi = start
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def close(self) -> None:
+        if self._mm:
+            self._mm.close()
+        self._f.close()
+
+
+def is_stale(fpath_index: Path, fpaths: Iterable[Path]) -> bool:
+    """True if the index is missing or older than any indexed file."""
+    if not fpath_index.exists():
+        return True
+    mtime = fpath_index.stat().st_mtime
+    return any(fpath.stat().st_mtime > mtime for fpath in fpaths)
@@ -0,0 +1,285 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, Set, Tuple
+
+from ._utils import extract_arxiv_id
+from ._ids import parse_arxiv_id, file_safe_id
+from ._convert import LaTeXMLError, LaTeXMLNotFoundError
+from ._http import RETRY_STATUS
+from ._batch import BatchResult, arxiv2md_batch
+
+
+def _key(url: str) -> str:
+    # Invalid URLs are journaled under themselves and fail again
+    try:
+        return extract_arxiv_id(url)
+    except ValueError:
+        return url
+
+
+def shard_of(url: str, n_shards: int) -> int:
+    """
+    The shard of a paper, from 0 to `n_shards - 1`.
+
+    The shard is a hash of the arXiv ID without its version, so that it
+    is the same on every machine and all versions of a paper land in
+    the same shard.
+    """
+    try:
+        key = parse_arxiv_id(url).id
+    except ValueError:
+        key = url
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % n_shards
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a paper that failed with `error` may succeed if it is tried
+    again later: connection errors, timeouts and server errors of arXiv
+    are transient, LaTeXML failures and missing papers are not.
+    """
+    import arxiv
+    import requests
+    import urllib3
+
+    if isinstance(error, LaTeXMLError):
+        # Only a cancelled run, not a timeout or a crash
+        return error.returncode is None and not error.timed_out
+    if isinstance(error, requests.HTTPError):
+        return (
+            error.response is not None
+            and error.response.status_code in RETRY_STATUS
+        )
+    if isinstance(error, arxiv.HTTPError):
+        return error.status in RETRY_STATUS
+    if isinstance(error, arxiv.UnexpectedEmptyPageError):
+        return True
+    if isinstance(error, urllib3.exceptions.HTTPError):
+        return True
+    # Connection errors, timeouts and broken downloads, but not files
+    # missing from a local source
+    return isinstance(error, OSError) and not isinstance(
+        error, (FileNotFoundError, PermissionError, IsADirectoryError)
+    )
+
+
+class Journal:
+    """
+    An append-only log of the papers of a batch, as JSON Lines.
+
+    Each line records one attempt at a paper: its arXiv ID and URL, its
+    status ("done" or "failed"), the attempt number, the output file
+    relative to the output directory, the error and whether it is
+    transient, the stage timings and counters, and the time. Each line
+    is flushed and synced to disk before the next paper is recorded,
+    so a run that is killed loses at most the line being written.
+
+    Args:
+        fpath (str | Path): The journal file. It is created if needed.
+    """
+
+    def __init__(self, fpath: str | Path):
+        self.fpath = Path(fpath).resolve()
+        self._file = None
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        The latest record of each paper, by arXiv ID. Later lines
+        override earlier ones, and the superseded lines are compacted.
+        """
+        records, lines, n_lines = {}, {}, 0
+        if self.fpath.exists():
+            with open(self.fpath, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut off by an interrupted run
+                        continue
+                    records[record["arxiv_id"]] = record
+                    lines[record["arxiv_id"]] = line
+                    n_lines += 1
+        if n_lines > len(records):
+            # The kept lines are written back as they are, not encoded
+            # again
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=self.fpath.parent, delete=False,
+            ) as f:
+                f.writelines(
+                    line if line.endswith("\n") else line + "\n"
+                    for line in lines.values()
+                )
+            os.replace(f.name, self.fpath)
+        return records
+
+    def append(self, record: Dict) -> None:
+        if self._file is None:
+            self.fpath.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.fpath, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _is_finished(record: Dict, outputs: Set[str]) -> bool:
+    if record["status"] == "done":
+        return record["output"] in outputs
+    return not record["transient"]
+
+
+def _skipped(url: str, record: Dict, dpath_output: Path) -> BatchResult:
+    result = BatchResult(
+        url=url, arxiv_id=record["arxiv_id"], skipped=True,
+        attempts=record["attempt"],
+    )
+    if record["status"] == "done":
+        result.fpath_output = dpath_output / record["output"]
+    else:
+        result.error = RuntimeError(record["error"])
+    return result
+
+
+def _write_output(dpath_output: Path, result: BatchResult) -> Path:
+    # Written in full before it is journaled as done
+    fpath_output = dpath_output / f"arxiv_{file_safe_id(result.arxiv_id)}.md"
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=dpath_output, suffix=".tmp", delete=False,
+    ) as f:
+        f.write(result.content_md)
+    os.replace(f.name, fpath_output)
+    return fpath_output
+
+
+def arxiv2md_resume(
+    urls: Iterable[str],
+    dpath_output: str | Path,
+    fpath_journal: str | Path | None = None,
+    shard: Tuple[int, int] | None = None,
+    retries: int = 2,
+    backoff: float = 30.0,
+    **batch_options,
+) -> Iterator[BatchResult]:
+    """
+    Convert many arXiv papers to Markdown files, resuming earlier runs.
+
+    The papers are converted with `arxiv2md_batch` and written to
+    `dpath_output` as `arxiv_<id>.md`. Each result is recorded in a
+    `Journal`. Papers the journal records as done, whose output file
+    still exists, and papers that failed for good are skipped, so a run
+    that was interrupted can be started again with the same arguments.
+    Papers that failed with a transient error (see `is_transient`) are
+    tried again, in rounds after the rest of the batch, and again on
+    the next run if they still fail. Their attempts are counted on from
+    the journal. A paper whose output file cannot be written fails like
+    one that cannot be converted.
+
+    Args:
+        urls (Iterable[str]): URLs of the arXiv papers or arXiv IDs.
+        dpath_output (str | Path): The directory to write the Markdown
+            files to.
+        fpath_journal (str | Path | None, optional): The journal file.
+            If None, nothing is recorded and nothing is skipped.
+            Defaults to None.
+        shard (Tuple[int, int] | None, optional): `(index, count)` to
+            convert only the papers of one of `count` shards, by a hash
+            of their arXiv ID (see `shard_of`), e.g. one per machine
+            with its own journal. Defaults to None.
+        retries (int, optional): The number of times a transient
+            failure is tried again in this run. Defaults to 2.
+        backoff (float, optional): The wait in seconds before the
+            first retry round. It doubles after each round. Defaults
+            to 30.0.
+        **batch_options: Passed to `arxiv2md_batch`, e.g. `workers`.
+
+    Yields:
+        BatchResult: The result of each paper, with `fpath_output` and
+            `attempts`, in order of completion. Skipped papers come
+            first, with `skipped` set; those that failed for good
+            carry the error recorded in the journal.
+
+    Raises:
+        LaTeXMLNotFoundError: If LaTeXML is not installed. The run stops
+            at the first paper that needs it, which is not journaled.
+    """
+    dpath_output = Path(dpath_output).resolve()
+    dpath_output.mkdir(parents=True, exist_ok=True)
+    if shard is not None:
+        index, n_shards = shard
+        if not 0 <= index < n_shards:
+            raise ValueError(f"Invalid shard {index} of {n_shards}.")
+    journal = Journal(fpath_journal) if fpath_journal else None
+    records = journal.load() if journal else {}
+    # One listing instead of a stat per paper
+    outputs = set(os.listdir(dpath_output)) if records else set()
+
+    # The attempts of each pending paper in earlier runs
+    pending, attempts = [], {}
+    for url in urls:
+        if shard is not None and shard_of(url, n_shards) != index:
+            continue
+        record = records.get(_key(url))
+        if record and _is_finished(record, outputs):
+            yield _skipped(url, record, dpath_output)
+        else:
+            pending.append(url)
+            if record:
+                attempts[url] = record["attempt"]
+
+    n_round = 1
+    try:
+        while pending:
+            retry = []
+            for result in arxiv2md_batch(pending, **batch_options):
+                if isinstance(result.error, LaTeXMLNotFoundError):
+                    raise result.error
+                result.attempts = attempts.get(result.url, 0) + n_round
+                if result.ok:
+                    try:
+                        result.fpath_output = _write_output(
+                            dpath_output, result
+                        )
+                    except Exception as e:
+                        result.error = e
+                transient = not result.ok and is_transient(result.error)
+                if journal:
+                    journal.append({
+                        "arxiv_id": result.arxiv_id or result.url,
+                        "url": result.url,
+                        "status": "done" if result.ok else "failed",
+                        "attempt": result.attempts,
+                        "output": (
+                            result.fpath_output.name
+                            if result.fpath_output else None
+                        ),
+                        "error": None if result.ok else str(result.error),
+                        "transient": transient,
+                        "time": time.time(),
+                        **result.stats.to_dict(),
+                    })
+                if transient and n_round <= retries:
+                    retry.append(result.url)
+                else:
+                    yield result
+            if retry:
+                time.sleep(backoff * 2 ** (n_round - 1))
+            pending = retry
+            n_round += 1
+    finally:
+        if journal:
+            journal.close()
@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import Iterator
+
+from lxml import etree
+
+from ._convert import JATSConverter, FNAME_JATS
+from ._convert_lxml import _name, _get_text, _release
+from ._document import Formula
+
+
+FORMULA_TAGS = {"inline-formula": False, "disp-formula": True}
+INDEX_TAGS = ["{*}math", "{*}sec", "{*}title", "{*}p", "{*}ref-list"]
+
+
+def iter_formulas(dpath_work: str | Path) -> Iterator[Formula]:
+    """
+    Yield the formulas of the `paper.jats.xml` in `dpath_work`.
+
+    The JATS is read in one streaming pass. lxml still builds the
+    MathML of each formula, but only the `math` elements and the
+    sections, titles and paragraphs around them are handed to Python,
+    which reads the alttext without visiting the MathML, and each
+    paragraph and section is freed once it has been read. The LaTeX is
+    cleaned up as in the Markdown, and the section titles are those of
+    the headings.
+    Formulas without alttext and those in the references are left out.
+
+    Yields:
+        Formula: The formulas in document order.
+    """
+    fpath_jats = Path(dpath_work) / FNAME_JATS
+    sections = []
+    in_references = False
+    index = 0
+
+    # lxml builds the MathML too, but only these elements reach Python
+    context = etree.iterparse(
+        str(fpath_jats),
+        events=("start", "end"),
+        tag=INDEX_TAGS,
+        recover=True,
+        huge_tree=True,
+    )
+    for event, elem in context:
+        name = _name(elem)
+        if event == "start":
+            if name == "sec":
+                sections.append((elem, None))
+            elif name == "ref-list":
+                in_references = True
+            continue
+
+        parent = elem.getparent()
+        if name == "math":
+            alttext = elem.get("alttext")
+            if in_references or not alttext:
+                continue
+            parent_name = _name(parent) if parent is not None else None
+            if parent_name in FORMULA_TAGS:
+                display = FORMULA_TAGS[parent_name]
+                formula_id = elem.get("id") or parent.get("id")
+            else:
+                display = elem.get("display") == "block"
+                formula_id = elem.get("id")
+            yield Formula(
+                index,
+                JATSConverter._clean_math_alttext(alttext),
+                display,
+                tuple(title or "" for _, title in sections),
+                formula_id,
+            )
+            index += 1
+        elif name == "title" and sections and parent is sections[-1][0] \
+                and sections[-1][1] is None:
+            sections[-1] = (parent, JATSConverter._clean_text(_get_text(elem)))
+        elif name == "sec":
+            sections.pop()
+            _release(elem)
+        elif name == "p":
+            _release(elem)
+        elif name == "ref-list":
+            in_references = False
@@ -0,0 +1,305 @@
+from pathlib import Path
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    import arxiv
+
+from ._index import OffsetIndex, is_stale
+
+
+# The maximum number of IDs per query of the arXiv API
+PAGE_SIZE = 100
+SNAPSHOT_INDEX_SUFFIX = ".index"
+# How long an unversioned ID is answered with the latest cached version
+# before arXiv is asked for its current version again
+UNVERSIONED_TTL = 24 * 3600
+
+# Each line of the snapshot starts with its ID
+_RE_SNAPSHOT_ID = re.compile(rb'"id"\s*:\s*"([^"]+)"')
+_RE_VERSION = re.compile(r"v\d+$")
+
+
+def _unversioned(arxiv_id: str) -> str:
+    return _RE_VERSION.sub("", arxiv_id)
+
+
+def _version(arxiv_id: str) -> int:
+    match = _RE_VERSION.search(arxiv_id)
+    return int(match.group()[1:]) if match else 0
+
+
+class MetadataResolver:
+    """
+    Looks up arXiv papers with one shared client.
+
+    Many IDs are grouped into one `id_list` query of up to `PAGE_SIZE`
+    IDs, and the results are cached, so resolving hundreds of papers
+    only takes a handful of API requests. A paper is cached under its
+    versioned ID, and under its ID without version only if it was
+    queried by that ID, which arXiv answers with the latest version.
+    The latter expires after `unversioned_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        client: "arxiv.Client | None" = None,
+        max_cached: int = 10000,
+        unversioned_ttl: float = UNVERSIONED_TTL,
+    ):
+        if client is None:
+            import arxiv
+            client = arxiv.Client(page_size=PAGE_SIZE)
+        self.client = client
+        self.max_cached = max_cached
+        self.unversioned_ttl = unversioned_ttl
+        # Each paper with the time its key expires, or None
+        self._papers: "OrderedDict[str, Tuple[arxiv.Result, float]]" = (
+            OrderedDict()
+        )
+        # Guards the cached papers only, never held across a query
+        self._lock = threading.Lock()
+        # The client is not thread-safe and keeps the delay between
+        # requests that arXiv asks for, so queries run one at a time
+        self._query_lock = threading.Lock()
+
+    def _cached(self, arxiv_id: str) -> "arxiv.Result | None":
+        cached = self._papers.get(arxiv_id)
+        if cached is None:
+            return None
+        paper, expires = cached
+        if expires is not None and expires < time.monotonic():
+            # A newer version may have been published since
+            del self._papers[arxiv_id]
+            return None
+        self._papers.move_to_end(arxiv_id)
+        return paper
+
+    def _add(self, paper: "arxiv.Result", latest: bool = False) -> None:
+        short_id = paper.get_short_id()
+        keys = {short_id: None}
+        if latest:
+            keys[_unversioned(short_id)] = \
+                time.monotonic() + self.unversioned_ttl
+        for key, expires in keys.items():
+            self._papers[key] = (paper, expires)
+            self._papers.move_to_end(key)
+        while len(self._papers) > self.max_cached:
+            self._papers.popitem(last=False)
+
+    def cached(self, arxiv_ids: Iterable[str]) -> "Dict[str, arxiv.Result]":
+        """Look up papers in the cache only."""
+        with self._lock:
+            papers = {i: self._cached(i) for i in arxiv_ids}
+        return {i: paper for i, paper in papers.items() if paper is not None}
+
+    def add(
+        self,
+        papers: "Iterable[arxiv.Result]",
+        queried: Iterable[str] = (),
+    ) -> None:
+        """
+        Cache papers fetched by other means, e.g. the async API.
+
+        `queried` are the IDs of the query that returned them. A paper
+        queried by its ID without version is the latest version, and is
+        also cached under that ID.
+        """
+        queried = set(queried)
+        # If several versions of a paper were queried, the latest one
+        # is added last
+        papers = sorted(papers, key=lambda p: _version(p.get_short_id()))
+        with self._lock:
+            for paper in papers:
+                self._add(paper, _unversioned(paper.get_short_id()) in queried)
+
+    def resolve(self, arxiv_ids: Iterable[str]) -> "Dict[str, arxiv.Result]":
+        import arxiv
+
+        arxiv_ids = list(dict.fromkeys(arxiv_ids))
+        missing = self._missing(arxiv_ids)
+        for i in range(0, len(missing), PAGE_SIZE):
+            with self._query_lock:
+                # Papers queried by another thread meanwhile are not
+                # queried again
+                chunk = self._missing(missing[i:i + PAGE_SIZE])
+                if not chunk:
+                    continue
+                search = arxiv.Search(id_list=chunk, max_results=len(chunk))
+                papers = list(self.client.results(search))
+            self.add(papers, chunk)
+        return self.cached(arxiv_ids)
+
+    def _missing(self, arxiv_ids: List[str]) -> List[str]:
+        with self._lock:
+            return [i for i in arxiv_ids if self._cached(i) is None]
+
+    def get(self, arxiv_id: str) -> "arxiv.Result":
+        paper = self.resolve([arxiv_id]).get(arxiv_id)
+        if paper is None:
+            raise ValueError(f"Could not find the paper arXiv:{arxiv_id}.")
+        return paper
+
+
+def _snapshot_paper(
+    record: Dict,
+    version: int | None = None,
+) -> "arxiv.Result | None":
+    import arxiv
+
+    # The record of a version, by default the latest, as the arXiv API
+    # returns it, or None if the paper has no such version
+    versions = record.get("versions") or [{}]
+    if version is None:
+        version = len(versions)
+    elif version > len(versions):
+        return None
+    short_id = f"{record['id']}v{version}"
+    dates = [
+        parsedate_to_datetime(entry["created"])
+        for entry in versions[:version] if "created" in entry
+    ] or [datetime.min]
+    if record.get("authors_parsed"):
+        authors = [
+            " ".join(part for part in (first, last, *suffix) if part)
+            for last, first, *suffix in record["authors_parsed"]
+        ]
+    else:
+        authors = [
+            name.strip() for name in record.get("authors", "").split(",")
+        ]
+    categories = (record.get("categories") or "").split()
+    return arxiv.Result(
+        entry_id=f"http://arxiv.org/abs/{short_id}",
+        updated=dates[-1],
+        published=dates[0],
+        title=" ".join(record.get("title", "").split()),
+        authors=[arxiv.Result.Author(name) for name in authors if name],
+        summary=(record.get("abstract") or "").strip(),
+        comment=record.get("comments"),
+        journal_ref=record.get("journal-ref"),
+        doi=record.get("doi"),
+        primary_category=categories[0] if categories else "",
+        categories=categories,
+        links=[
+            arxiv.Result.Link(
+                f"http://arxiv.org/abs/{short_id}", rel="alternate"
+            ),
+            arxiv.Result.Link(
+                f"http://arxiv.org/pdf/{short_id}", title="pdf",
+                rel="related",
+            ),
+        ],
+    )
+
+
+class SnapshotResolver(MetadataResolver):
+    """
+    Looks up arXiv papers in a local metadata snapshot, offline.
+
+    The snapshot is a JSON Lines file with one record per paper, as in
+    the arXiv metadata dataset on Kaggle or an OAI-PMH harvest
+    converted to that format. On first use, an index of the offset of
+    each record is written next to it, so a lookup only reads the
+    record of the paper. The index is rebuilt when the snapshot is
+    newer. An earlier version of a paper gets its own version number
+    and dates, and the title, authors and abstract of the latest
+    version; a version the snapshot does not list is not found.
+
+    Args:
+        fpath_snapshot (str | Path): The path to the snapshot.
+        fpath_index (str | Path | None, optional): The path to the
+            index. If None, the snapshot path with `.index` appended
+            is used. Defaults to None.
+        max_cached (int, optional): The maximum number of papers kept
+            in memory. Defaults to 10000.
+    """
+
+    def __init__(
+        self,
+        fpath_snapshot: str | Path,
+        fpath_index: str | Path | None = None,
+        max_cached: int = 10000,
+    ):
+        super().__init__(client=None, max_cached=max_cached)
+        self.fpath_snapshot = Path(fpath_snapshot)
+        self.fpath_index = Path(fpath_index) if fpath_index else \
+            self.fpath_snapshot.with_name(
+                self.fpath_snapshot.name + SNAPSHOT_INDEX_SUFFIX
+            )
+        self._index = None
+
+    def build_index(self) -> None:
+        """Index the offset of every record of the snapshot."""
+        rows = {}
+        with open(self.fpath_snapshot, "rb") as f:
+            offset = 0
+            for line in f:
+                match = _RE_SNAPSHOT_ID.search(line, 0, 256)
+                if match:
+                    # Later records of a paper override earlier ones
+                    rows[match.group(1).decode("utf-8")] = offset
+                offset += len(line)
+        OffsetIndex.write(self.fpath_index, rows.items())
+
+    def _get_index(self) -> OffsetIndex:
+        if self._index is None:
+            if is_stale(self.fpath_index, [self.fpath_snapshot]):
+                self.build_index()
+            self._index = OffsetIndex(self.fpath_index)
+        return self._index
+
+    def _load(self, arxiv_id: str) -> "arxiv.Result | None":
+        values = self._get_index().get(_unversioned(arxiv_id))
+        if values is None:
+            return None
+        with open(self.fpath_snapshot, "rb") as f:
+            f.seek(int(values[0]))
+            record = json.loads(f.readline())
+        version = _version(arxiv_id)
+        return _snapshot_paper(record, version or None)
+
+    def cached(self, arxiv_ids: Iterable[str]) -> "Dict[str, arxiv.Result]":
+        """Look up papers in memory, then in the snapshot."""
+        papers = {}
+        with self._lock:
+            for arxiv_id in arxiv_ids:
+                paper = self._cached(arxiv_id)
+                if paper is None:
+                    paper = self._load(arxiv_id)
+                    if paper is None:
+                        continue
+                    # Without a version, the latest one was loaded
+                    self._add(paper, arxiv_id == _unversioned(arxiv_id))
+                papers[arxiv_id] = paper
+        return papers
+
+    def resolve(self, arxiv_ids: Iterable[str]) -> "Dict[str, arxiv.Result]":
+        return self.cached(dict.fromkeys(arxiv_ids))
+
+
+_default_resolver = None
+_default_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> MetadataResolver:
+    """Return the resolver shared by the calls in this process."""
+    global _default_resolver
+    if _default_resolver is None:
+        with _default_resolver_lock:
+            # Created once, even if several threads get here first
+            if _default_resolver is None:
+                _default_resolver = MetadataResolver()
+    return _default_resolver
+
+
+def set_resolver(resolver: MetadataResolver) -> None:
+    """Use `resolver` for the lookups of later calls, e.g. a snapshot."""
+    global _default_resolver
+    _default_resolver = resolver
@@ -0,0 +1,174 @@
+from pathlib import Path
+import multiprocessing
+import os
+import tempfile
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from ._convert import FNAME_JATS
+from ._document import Block
+
+
+# A worker is replaced after this many papers, so the memory that the
+# parsers leave fragmented does not grow without bound
+MAX_TASKS_PER_CHILD = 100
+CHUNKSIZE = 4
+
+# A tiny document that runs every converter through its parsers once
+WARM_UP_JATS = """<?xml version="1.0" encoding="UTF-8"?>
+<article xmlns:mml="http://www.w3.org/1998/Math/MathML">
+<front><article-meta>
+<title-group><article-title>Warm-up</article-title></title-group>
+<abstract><p>An abstract.</p></abstract>
+</article-meta></front>
+<body><sec><title>Introduction</title>
+<p>Text <inline-formula><mml:math alttext="x^{2}"/></inline-formula>
+and a citation <xref ref-type="bibr" rid="bib1">[1]</xref>.</p>
+</sec></body>
+<back><ref-list><ref id="bib1"><mixed-citation>
+<string-name>A. Author</string-name> <article-title>A paper</article-title>
+</mixed-citation></ref></ref-list></back>
+</article>
+"""
+
+
+def _warm_up(backends: Tuple[str, ...]) -> None:
+    # Imports bs4, lxml and the converters, and compiles their lazily
+    # built parsers and regexes before the first real paper arrives
+    from ._api import get_converter
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        dpath_work = Path(tempdir)
+        with open(dpath_work / FNAME_JATS, "w", encoding="utf-8") as f:
+            f.write(WARM_UP_JATS)
+        for backend in backends:
+            get_converter(backend)(dpath_work).convert_to_md()
+
+
+def _convert_paper(
+    task: Tuple[Path, str, bool],
+) -> Tuple[Path, str | List[Block] | None, Exception | None]:
+    from ._api import get_converter
+
+    dpath_work, backend, blocks = task
+    try:
+        converter = get_converter(backend)(dpath_work)
+        if blocks:
+            return dpath_work, list(converter.iter_blocks()), None
+        return dpath_work, converter.convert_to_md(), None
+    except Exception as e:
+        return dpath_work, None, e
+
+
+def _start_method() -> str:
+    # Forking a process that runs threads, e.g. the batch API, can
+    # deadlock a child on a lock held by another thread
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return "forkserver"
+    return "spawn"
+
+
+class ConverterPool:
+    """
+    A pool of processes for the JATS to Markdown stage.
+
+    The converters are pure Python, so threads convert one paper at a
+    time under the GIL. The workers of this pool share nothing with
+    the caller: they are sent the path of a work directory that holds
+    `paper.jats.xml` and send back only the Markdown or the blocks.
+    Each worker imports the converters and converts a small document
+    when it starts, and is replaced after `max_tasks_per_child`
+    papers to bound its memory.
+
+    Args:
+        processes (int | None, optional): The number of worker
+            processes. If None, the number of CPUs is used. Defaults
+            to None.
+        backends (Iterable[str], optional): The converter backends to
+            warm up in each worker. Defaults to ("bs4",).
+        max_tasks_per_child (int | None, optional): The number of
+            papers after which a worker is replaced. If None, workers
+            live as long as the pool. Defaults to 100.
+    """
+
+    def __init__(
+        self,
+        processes: int | None = None,
+        backends: Iterable[str] = ("bs4",),
+        max_tasks_per_child: int | None = MAX_TASKS_PER_CHILD,
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        context = multiprocessing.get_context(_start_method())
+        self._pool = context.Pool(
+            self.processes,
+            initializer=_warm_up,
+            initargs=(tuple(backends),),
+            maxtasksperchild=max_tasks_per_child,
+        )
+
+    def convert(
+        self,
+        dpath_work: str | Path,
+        backend: str = "bs4",
+        blocks: bool = False,
+    ) -> str | List[Block]:
+        """
+        Convert the JATS in `dpath_work` in a worker. Several threads
+        may call this at once.
+
+        Returns:
+            str | List[Block]: The Markdown, or the blocks if `blocks`
+                is True.
+        """
+        _, output, error = self._pool.apply(
+            _convert_paper, ((Path(dpath_work), backend, blocks),)
+        )
+        if error is not None:
+            raise error
+        return output
+
+    def map(
+        self,
+        dpaths_work: Iterable[str | Path],
+        backend: str = "bs4",
+        blocks: bool = False,
+        chunksize: int = CHUNKSIZE,
+    ) -> Iterator[Tuple[Path, str | List[Block] | None, Exception | None]]:
+        """
+        Convert the JATS in many work directories.
+
+        The directories are sent to the workers `chunksize` at a time.
+
+        Yields:
+            Tuple[Path, str | List[Block] | None, Exception | None]:
+                The work directory, its Markdown or blocks, and the
+                exception raised if it failed, in order of completion.
+        """
+        tasks = ((Path(d), backend, blocks) for d in dpaths_work)
+        yield from self._pool.imap_unordered(_convert_paper, tasks, chunksize)
+
+    def imap_unordered(
+        self,
+        func: Callable,
+        tasks: Iterable,
+        chunksize: int = CHUNKSIZE,
+    ) -> Iterator:
+        """Run a module-level function on each task in the workers."""
+        return self._pool.imap_unordered(func, tasks, chunksize)
+
+    def close(self) -> None:
+        """Wait for the submitted papers, then stop the workers."""
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self) -> None:
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self) -> "ConverterPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,243 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
+
+from ._utils import FNAME_METADATA, concat_metadata
+from ._ids import file_safe_id
+from ._convert import FNAME_JATS
+from ._cache import Cache, DNAME_INDEX, DNAME_OBJECTS, converter_version
+from ._api import get_converter
+from ._pool import ConverterPool, MAX_TASKS_PER_CHILD
+
+
+FNAME_MANIFEST = ".arxiv2md-reconvert.jsonl"
+
+
+@dataclass
+class ReconvertResult:
+    fpath_jats: Path
+    fpath_output: Path | None = None
+    arxiv_id: str | None = None
+    skipped: bool = False
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _sha256(fpath: Path) -> str:
+    sha = hashlib.sha256()
+    with open(fpath, "rb") as f:
+        while chunk := f.read(1 << 20):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _load_manifest(fpath_manifest: Path) -> Dict[str, Dict]:
+    """The latest record of each paper. Later lines override earlier ones."""
+    records, n_lines = {}, 0
+    if fpath_manifest.exists():
+        with open(fpath_manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut off by an interrupted run
+                    continue
+                records[record["jats"]] = record
+                n_lines += 1
+    if n_lines > len(records):
+        # Compact the superseded records left by earlier runs
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=fpath_manifest.parent, delete=False,
+        ) as f:
+            for record in records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(f.name, fpath_manifest)
+    return records
+
+
+def _is_unchanged(
+    record: Dict,
+    jats_sha256: str,
+    version: str,
+    frontmatter: bool,
+    fpath_output: Path,
+) -> bool:
+    return (
+        "md_sha256" in record
+        and record["jats_sha256"] == jats_sha256
+        and record["converter_version"] == version
+        and record["frontmatter"] == frontmatter
+        and fpath_output.name == record["output"]
+        and fpath_output.exists()
+        and _sha256(fpath_output) == record["md_sha256"]
+    )
+
+
+def _cache_dir(fpath_jats: Path) -> Path | None:
+    # The cache directory if the JATS is in one of its objects
+    dpath_objects = fpath_jats.parent.parent
+    if dpath_objects.name == DNAME_OBJECTS \
+            and (dpath_objects.parent / DNAME_INDEX).is_dir():
+        return dpath_objects.parent
+    return None
+
+
+def _reconvert_paper(task: Tuple) -> Tuple[Dict, Exception | None]:
+    # Runs in a worker process, so the JATS is hashed in parallel too
+    (
+        fpath_jats, metadata, dpath_output, record, version, frontmatter,
+        backend,
+    ) = task
+    result = {"jats": record["jats"], "output": None, "arxiv_id": None}
+    try:
+        if metadata is None:
+            fpath_metadata = fpath_jats.parent / FNAME_METADATA
+            if not fpath_metadata.exists():
+                raise FileNotFoundError(
+                    f"No `{FNAME_METADATA}` next to the JATS and no entry "
+                    "in a cache index for it."
+                )
+            with open(fpath_metadata, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        arxiv_id = metadata["arxiv_id"]
+        fpath_output = dpath_output / f"arxiv_{file_safe_id(arxiv_id)}.md"
+        result.update(output=fpath_output.name, arxiv_id=arxiv_id)
+
+        jats_sha256 = _sha256(fpath_jats)
+        if _is_unchanged(
+            record, jats_sha256, version, frontmatter, fpath_output
+        ):
+            return {**result, "skipped": True}, None
+
+        content_md = get_converter(backend)(fpath_jats.parent).convert_to_md()
+        if frontmatter:
+            content_md = concat_metadata(content_md, metadata)
+        # Replace the previous output only once the new one is complete
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=dpath_output, delete=False,
+        ) as f:
+            f.write(content_md)
+        os.replace(f.name, fpath_output)
+    except Exception as e:
+        return result, e
+
+    return {
+        **result,
+        "jats_sha256": jats_sha256,
+        "md_sha256": hashlib.sha256(content_md.encode("utf-8")).hexdigest(),
+        "converter_version": version,
+        "frontmatter": frontmatter,
+    }, None
+
+
+def arxiv2md_reconvert(
+    dpath_source: str | Path,
+    dpath_output: str | Path,
+    frontmatter: bool = False,
+    backend: str = "bs4",
+    workers: int | None = None,
+    chunksize: int = 16,
+    force: bool = False,
+    max_tasks_per_child: int | None = MAX_TASKS_PER_CHILD,
+) -> Iterator[ReconvertResult]:
+    """
+    Convert the retained JATS files of earlier runs to Markdown again.
+
+    Only the JATS to Markdown stage runs, without downloading or
+    LaTeXML, e.g. after upgrading arxiv2md. `dpath_source` is searched
+    recursively for the `paper.jats.xml` files that `arxiv2md` leaves
+    next to `metadata.json` in its source directories, or in the
+    objects of a cache directory, whose index holds the metadata. A
+    JATS with neither is reported as failed. The papers are converted
+    in a process pool and written to `dpath_output` as `arxiv_<id>.md`.
+
+    A manifest in `dpath_output` records the hashes of the JATS and
+    the Markdown of each paper and the converter version. Papers whose
+    JATS, converter version, options and output file are unchanged
+    since the last run are skipped.
+
+    Args:
+        dpath_source (str | Path): The directory to search for
+            `paper.jats.xml` files.
+        dpath_output (str | Path): The directory to write the Markdown
+            files and the manifest to.
+        frontmatter (bool, optional): If True, the output Markdown
+            will include frontmatter metadata. Defaults to False.
+        backend (str, optional): The JATS to Markdown converter, "bs4"
+            or "lxml". Defaults to "bs4".
+        workers (int | None, optional): The number of worker
+            processes. If None, the number of CPUs is used. Defaults
+            to None.
+        chunksize (int, optional): The number of papers sent to a
+            worker at once. Defaults to 16.
+        force (bool, optional): If True, convert every paper even if
+            it is unchanged. Defaults to False.
+        max_tasks_per_child (int | None, optional): The number of
+            papers after which a worker process is replaced. If None,
+            workers live until the end. Defaults to 100.
+
+    Yields:
+        ReconvertResult: The result of each paper, in order of
+            completion. `skipped` is True if the paper was unchanged,
+            and `error` holds the raised exception if it failed.
+    """
+    dpath_source = Path(dpath_source).resolve()
+    dpath_output = Path(dpath_output).resolve()
+    dpath_output.mkdir(parents=True, exist_ok=True)
+    get_converter(backend)
+
+    fpath_manifest = dpath_output / FNAME_MANIFEST
+    records = {} if force else _load_manifest(fpath_manifest)
+    version = converter_version()
+
+    # The metadata of the objects of each cache directory, by hash
+    cache_metadata = {}
+
+    def tasks():
+        for fpath_jats in dpath_source.rglob(FNAME_JATS):
+            metadata = None
+            dpath_cache = _cache_dir(fpath_jats)
+            if dpath_cache:
+                if fpath_jats.parent.name.startswith("."):
+                    # Being stored or evicted
+                    continue
+                if dpath_cache not in cache_metadata:
+                    cache_metadata[dpath_cache] = \
+                        Cache(dpath_cache).object_metadata()
+                metadata = cache_metadata[dpath_cache].get(
+                    fpath_jats.parent.name
+                )
+            key = fpath_jats.relative_to(dpath_source).as_posix()
+            record = records.get(key, {"jats": key})
+            yield (
+                fpath_jats, metadata, dpath_output, record, version,
+                frontmatter, backend,
+            )
+
+    with ConverterPool(workers, (backend,), max_tasks_per_child) as pool, \
+            open(fpath_manifest, "a", encoding="utf-8") as f_manifest:
+        for record, error in pool.imap_unordered(
+            _reconvert_paper, tasks(), chunksize
+        ):
+            skipped = record.pop("skipped", False)
+            if error is None and not skipped:
+                # Flushed per paper, so an interrupted run can resume
+                f_manifest.write(json.dumps(record) + "\n")
+                f_manifest.flush()
+            yield ReconvertResult(
+                fpath_jats=dpath_source / record["jats"],
+                fpath_output=(
+                    dpath_output / record["output"]
+                    if record["output"] else None
+                ),
+                arxiv_id=record["arxiv_id"],
+                skipped=skipped,
+                error=error,
+            )
@@ -0,0 +1,434 @@
+from pathlib import Path
+import dataclasses
+import json
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+from urllib.parse import urlsplit, parse_qs
+
+from ._utils import extract_arxiv_id, concat_metadata
+from ._cache import Cache
+from ._api import (
+    _core_arxiv2md, get_converter, check_engine, ConvertOptions
+)
+from ._convert import LaTeXMLServerPool
+from ._pool import _warm_up
+
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+# The longest a client may block on `?wait=`, so that a handler thread
+# is not held forever
+MAX_WAIT = 60.0
+RETRY_AFTER = 1
+
+
+class DeadlineExceeded(Exception):
+    """A job did not finish before its deadline."""
+
+
+@dataclass(eq=False)
+class Job:
+    """
+    A conversion submitted to a `ConversionService`.
+
+    Attributes:
+        id (str): The ID of the job.
+        arxiv_id (str): The arXiv ID of the paper.
+        status (str): One of `JOB_STATUSES`.
+        deadline (float | None): The `time.monotonic()` by which the
+            job must be done, or None.
+        content_md (str | None): The Markdown once the job is done.
+        error (Exception | None): The raised exception if the job
+            failed.
+    """
+
+    id: str
+    arxiv_id: str
+    status: str = "queued"
+    deadline: float | None = None
+    submitted: float = field(default_factory=time.monotonic)
+    started: float | None = None
+    finished: float | None = None
+    content_md: str | None = None
+    error: Exception | None = None
+    cancel: threading.Event = field(default_factory=threading.Event)
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def to_dict(self) -> Dict:
+        record = {
+            "job": self.id,
+            "arxiv_id": self.arxiv_id,
+            "status": self.status,
+        }
+        if self.started is not None:
+            record["queued_seconds"] = round(
+                self.started - self.submitted, 3
+            )
+        if self.finished is not None and self.started is not None:
+            record["seconds"] = round(self.finished - self.started, 3)
+        if self.error is not None:
+            record["error"] = str(self.error)
+        return record
+
+
+class ConversionService:
+    """
+    A long-running converter that takes papers from a bounded queue.
+
+    The converters are imported and warmed up once, and with the
+    "server" engine the `latexmls` servers stay up between papers.
+    Papers are converted by `workers` threads:
+
+    - The queue holds at most `queue_size` papers. `submit` raises
+      `queue.Full` beyond that, so callers can back off instead of
+      piling up work.
+    - A paper submitted again while it is queued or running joins the
+      job in flight, and a paper that is done is served from the
+      result store without converting it again.
+    - A job that is still queued at its deadline fails without being
+      converted, and a running one has its LaTeXML processes killed.
+      The metadata lookup and the download are not interrupted: a job
+      that passes its deadline during them fails once they return.
+
+    Args:
+        workers (int, optional): The number of concurrent conversions.
+            Defaults to 2.
+        queue_size (int, optional): The number of papers that can wait
+            for a worker. Defaults to 64.
+        deadline (float | None, optional): The default time in seconds
+            from submission by which a job must be done. If None,
+            jobs have no deadline. Defaults to None.
+        max_results (int, optional): The number of finished jobs kept
+            with their Markdown. The oldest are dropped beyond it.
+            Defaults to 1000.
+        convert (Callable[[str, threading.Event], str] | None,
+            optional): The function that converts a paper, called
+            with the arXiv ID and an event that is set at the deadline,
+            and returning the Markdown. If None, the paper is
+            downloaded and converted with LaTeXML. Defaults to None.
+        options (ConvertOptions | None, optional): The options of the
+            default conversion. Defaults to None.
+        dpath_cache (str | Path | None, optional): The directory of a
+            persistent cache for the default conversion. Defaults to
+            None.
+        cache_max_size (int | None, optional): The maximum size of the
+            cache in bytes. Defaults to None.
+        frontmatter (bool, optional): If True, the Markdown of the
+            default conversion includes frontmatter metadata. Defaults
+            to True.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_size: int = 64,
+        deadline: float | None = None,
+        max_results: int = 1000,
+        convert: Callable[[str, threading.Event], str] | None = None,
+        options: ConvertOptions | None = None,
+        dpath_cache: str | Path | None = None,
+        cache_max_size: int | None = None,
+        frontmatter: bool = True,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.max_results = max_results
+        self.frontmatter = frontmatter
+        self.options = options or ConvertOptions()
+        get_converter(self.options.backend)
+        check_engine(self.options.engine)
+        if self.options.engine == "server" and not self.options.server_pool:
+            self.options = dataclasses.replace(
+                self.options, server_pool=LaTeXMLServerPool(workers)
+            )
+        self.cache = (
+            Cache(dpath_cache, cache_max_size) if dpath_cache else None
+        )
+        self._convert = convert or self._convert_paper
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        # Every job by ID, and the latest job of each paper
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._papers: Dict[str, Job] = {}
+        self._threads = []
+        self._closed = False
+
+    def start(self) -> "ConversionService":
+        """Warm up the converters and start the workers."""
+        _warm_up((self.options.backend,))
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _convert_paper(self, arxiv_id: str, cancel: threading.Event) -> str:
+        options = dataclasses.replace(self.options, cancel=cancel)
+        with tempfile.TemporaryDirectory() as tempdir:
+            content_md, metadata = _core_arxiv2md(
+                arxiv_id, Path(tempdir), options, self.cache
+            )
+        if self.frontmatter:
+            content_md = concat_metadata(content_md, metadata)
+        return content_md
+
+    def submit(self, url: str, deadline: float | None = None) -> Job:
+        """
+        Queue the conversion of a paper, or return the job that is
+        already converting or has converted it.
+
+        Args:
+            url (str): The URL of the arXiv paper or the arXiv ID.
+            deadline (float | None, optional): The time in seconds by
+                which the job must be done. If None, the default of
+                the service is used. Defaults to None.
+
+        Raises:
+            ValueError: If no arXiv ID can be extracted from `url`.
+            queue.Full: If the queue is full.
+        """
+        arxiv_id = extract_arxiv_id(url)
+        deadline = self.deadline if deadline is None else deadline
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The service is closed.")
+            job = self._papers.get(arxiv_id)
+            if job is not None and job.status != "failed":
+                self._jobs.move_to_end(job.id)
+                return job
+
+            job = Job(uuid.uuid4().hex, arxiv_id)
+            if deadline is not None:
+                job.deadline = job.submitted + deadline
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+            self._papers[arxiv_id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Return the job with this ID, if it is still kept."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        """The number of jobs in each status and the queue capacity."""
+        with self._lock:
+            counts = dict.fromkeys(JOB_STATUSES, 0)
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {
+            **counts,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+        }
+
+    def _evict(self) -> None:
+        # Drop the oldest finished jobs, never the ones in flight
+        finished = [
+            job for job in self._jobs.values() if job.finished is not None
+        ]
+        for job in finished[:max(0, len(finished) - self.max_results)]:
+            del self._jobs[job.id]
+            if self._papers.get(job.arxiv_id) is job:
+                del self._papers[job.arxiv_id]
+
+    def _finish(self, job: Job, content_md=None, error=None) -> None:
+        with self._lock:
+            job.finished = time.monotonic()
+            job.content_md = content_md
+            job.error = error
+            job.status = "failed" if error is not None else "done"
+            self._evict()
+        job.done.set()
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if self._closed:
+                self._finish(job, error=RuntimeError("The service stopped."))
+                continue
+
+            timer = None
+            if job.deadline is not None:
+                remaining = job.deadline - time.monotonic()
+                if remaining <= 0:
+                    self._finish(job, error=DeadlineExceeded(
+                        "The deadline passed before a worker was free."
+                    ))
+                    continue
+                timer = threading.Timer(remaining, job.cancel.set)
+                timer.start()
+
+            with self._lock:
+                job.started = time.monotonic()
+                job.status = "running"
+            try:
+                content_md = self._convert(job.arxiv_id, job.cancel)
+            except Exception as e:
+                content_md, error = None, e
+            else:
+                error = None
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            if job.cancel.is_set() and not self._closed:
+                content_md, error = None, DeadlineExceeded(
+                    "The conversion did not finish before the deadline."
+                )
+            self._finish(job, content_md, error)
+
+    def close(self) -> None:
+        """Fail the queued jobs, cancel the running ones and stop."""
+        with self._lock:
+            self._closed = True
+            running = [
+                job for job in self._jobs.values() if job.status == "running"
+            ]
+        for job in running:
+            job.cancel.set()
+        for _ in self._threads:
+            # The workers fail the queued jobs before they see this
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self) -> "ConversionService":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, code: int, body: str | Dict, headers=()) -> None:
+        if isinstance(body, dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            data = body.encode("utf-8")
+            content_type = "text/markdown; charset=utf-8"
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_job(self, job: Job, markdown: bool = False) -> None:
+        if job.status == "done":
+            self._send(200, job.content_md if markdown else job.to_dict())
+        elif job.status == "failed":
+            code = 504 if isinstance(job.error, DeadlineExceeded) else 500
+            self._send(code, job.to_dict())
+        else:
+            self._send(202, job.to_dict(), [("Retry-After", RETRY_AFTER)])
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        if parts.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": "Not found."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            url = request["id"]
+            if not isinstance(url, str):
+                raise TypeError("The `id` must be a string.")
+            deadline = request.get("deadline")
+            if deadline is not None:
+                deadline = float(deadline)
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {
+                "error": "Expected a JSON object with a string `id` and an "
+                "optional `deadline` in seconds."
+            })
+            return
+        try:
+            job = self.server.service.submit(url, deadline)
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+        except queue.Full:
+            self._send(
+                503, {"error": "The queue is full."},
+                [("Retry-After", RETRY_AFTER)],
+            )
+        except RuntimeError as e:
+            self._send(503, {"error": str(e)})
+        else:
+            self._send_job(job)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        segments = [s for s in parts.path.split("/") if s]
+        if segments == ["health"]:
+            self._send(200, self.server.service.stats())
+            return
+        if not (
+            len(segments) in (2, 3) and segments[0] == "jobs"
+            and segments[2:] in ([], ["markdown"])
+        ):
+            self._send(404, {"error": "Not found."})
+            return
+        job = self.server.service.get(segments[1])
+        if job is None:
+            self._send(404, {"error": "No such job."})
+            return
+        try:
+            wait = float(parse_qs(parts.query).get("wait", ["0"])[0])
+        except ValueError:
+            self._send(400, {"error": "`wait` must be a number."})
+            return
+        if wait > 0:
+            job.done.wait(min(wait, MAX_WAIT))
+        self._send_job(job, markdown=len(segments) == 3)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: ConversionService, verbose: bool):
+        self.service = service
+        self.verbose = verbose
+        super().__init__(address, _Handler)
+
+
+def make_server(
+    service: ConversionService,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    """
+    Create an HTTP server for a started `ConversionService`.
+
+    - `POST /jobs` with `{"id": "<URL or arXiv ID>", "deadline": 60}`
+      submits a paper. The answer is the job as JSON, with status 202
+      while it is queued or running, 200 once it is done and 503 with
+      `Retry-After` if the queue is full.
+    - `GET /jobs/<job>` returns the job and `GET /jobs/<job>/markdown`
+      its Markdown, with status 202 until it is done, 500 if it failed
+      and 504 if it missed its deadline. `?wait=<seconds>` blocks until
+      the job is done, for up to `MAX_WAIT` seconds.
+    - `GET /health` returns the number of jobs in each status.
+
+    Call `serve_forever()` on the returned server to handle requests.
+    """
+    return _Server((host, port), service, verbose)
@@ -0,0 +1,295 @@
+from pathlib import Path
+import io
+import re
+import tarfile
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, ContextManager, Dict, IO, Iterator, Tuple
+
+if TYPE_CHECKING:
+    import arxiv
+
+from ._utils import extract_arxiv_id, query_paper, open_source, save_source
+from ._ids import parse_arxiv_id
+from ._http import DownloadManager, CHUNK_SIZE
+from ._index import OffsetIndex, is_stale
+from ._metadata import MetadataResolver
+
+
+FNAME_BULK_INDEX = "arXiv_src.index"
+BULK_ARCHIVE_GLOB = "arXiv_src_*.tar"
+# Sources up to this size are packed in memory, larger ones on disk
+SPOOL_SIZE = 64 << 20
+
+# The members of the bulk archives are named e.g. `2301/2301.00001.gz`
+# or `0001/astro-ph0001001.gz` for old-style IDs, possibly with a
+# version. The subject class of an old-style ID is not part of it.
+_RE_BULK_NEW_ID = re.compile(r"(\d{4}\.\d{4,5})(?:v(\d+))?$")
+_RE_BULK_OLD_ID = re.compile(
+    r"([a-z-]+)(?:\.[A-Z]{2})?(\d{7})(?:v(\d+))?$"
+)
+
+
+class SourceProvider(ABC):
+    """
+    Where the source of a paper comes from.
+
+    `open` yields the source as it is published on arXiv: a gzipped
+    tarball, a gzipped .tex file or a PDF. Subclasses implement it for
+    HTTP downloads and for local copies of the sources.
+    """
+
+    @abstractmethod
+    def open(self, paper: "arxiv.Result") -> ContextManager[IO[bytes]]:
+        """A context manager that yields the source of `paper`."""
+
+
+class HTTPSource(SourceProvider):
+    """
+    Downloads the sources from arXiv or a mirror.
+
+    Args:
+        manager (DownloadManager | None, optional): The download
+            manager to use. If None, the shared one is used. Defaults
+            to None.
+    """
+
+    def __init__(self, manager: DownloadManager | None = None):
+        self.manager = manager
+
+    @contextmanager
+    def open(self, paper: "arxiv.Result") -> Iterator[IO[bytes]]:
+        with open_source(paper, self.manager) as stream:
+            yield stream
+
+
+class TarballSource(SourceProvider):
+    """
+    Reads the source of one paper from a local file, e.g. a tarball
+    downloaded earlier. Every paper opened gets this source.
+
+    Args:
+        fpath (str | Path): The path to the tarball, gzipped or not,
+            or to a single (gzipped) .tex file.
+    """
+
+    def __init__(self, fpath: str | Path):
+        self.fpath = Path(fpath)
+        if not self.fpath.is_file():
+            raise FileNotFoundError(f"No such file: `{self.fpath}`")
+
+    @contextmanager
+    def open(self, paper: "arxiv.Result") -> Iterator[IO[bytes]]:
+        with open(self.fpath, "rb") as f:
+            yield f
+
+
+class DirectorySource(SourceProvider):
+    """
+    Reads the already extracted source of one paper from a directory.
+    Every paper opened gets this source.
+
+    The files are packed into an uncompressed tarball with fixed
+    owners and times, so the same files always give the same bytes
+    and hash in the cache.
+
+    Args:
+        dpath (str | Path): The directory of the source.
+    """
+
+    def __init__(self, dpath: str | Path):
+        self.dpath = Path(dpath)
+        if not self.dpath.is_dir():
+            raise NotADirectoryError(f"No such directory: `{self.dpath}`")
+
+    def _add(self, tar: tarfile.TarFile, fpath: Path) -> None:
+        info = tarfile.TarInfo(fpath.relative_to(self.dpath).as_posix())
+        info.size = fpath.stat().st_size
+        with open(fpath, "rb") as f:
+            tar.addfile(info, f)
+
+    @contextmanager
+    def open(self, paper: "arxiv.Result") -> Iterator[IO[bytes]]:
+        with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as f:
+            tar = tarfile.open(fileobj=f, mode="w", format=tarfile.GNU_FORMAT)
+            with tar:
+                for fpath in sorted(self.dpath.rglob("*")):
+                    if fpath.is_file():
+                        self._add(tar, fpath)
+            f.seek(0)
+            yield f
+
+
+class _SliceStream(io.RawIOBase):
+    """A range of bytes of a file."""
+
+    def __init__(self, f: IO[bytes], offset: int, size: int):
+        self._f = f
+        self._f.seek(offset)
+        self._remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._f.read(min(len(buffer), self._remaining))
+        self._remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _bulk_member_id(name: str) -> Tuple[str, str] | None:
+    # The ID and the version, "" if the name has none
+    stem = Path(name).name.split(".gz")[0].removesuffix(".pdf")
+    match = _RE_BULK_NEW_ID.match(stem)
+    if match:
+        return match.group(1), match.group(2) or ""
+    match = _RE_BULK_OLD_ID.match(stem)
+    if match:
+        return f"{match.group(1)}/{match.group(2)}", match.group(3) or ""
+    return None
+
+
+class BulkArchiveSource(SourceProvider):
+    """
+    Reads the sources from a local copy of arXiv's bulk source
+    archives, the monthly `arXiv_src_YYMM_NNN.tar` files.
+
+    On first use, the member headers of every archive are read to
+    index the offset and size of each paper, and the index is written
+    to `dpath_bulk`. A paper is then read straight from its range of
+    its archive, without extracting anything else. The index is
+    rebuilt when an archive is newer.
+
+    The archives hold the latest version of each paper at the time they
+    were made. Its version is checked against the one requested: the
+    version in the member name if there is one, otherwise the latest
+    version according to `resolver`. A paper that is not in the
+    archives, or not in the requested version, is read from `fallback`.
+
+    Args:
+        dpath_bulk (str | Path): The directory of the archives. It is
+            searched recursively.
+        fpath_index (str | Path | None, optional): The path to the
+            index, e.g. if `dpath_bulk` is read-only. If None,
+            `arXiv_src.index` in `dpath_bulk` is used. Defaults to None.
+        fallback (SourceProvider | None, optional): The provider of the
+            papers the archives do not hold, e.g. `HTTPSource()`. If
+            None, they raise a FileNotFoundError. Defaults to None.
+        resolver (MetadataResolver | None, optional): The resolver of
+            the latest version of a paper. If None, the shared one is
+            used. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        dpath_bulk: str | Path,
+        fpath_index: str | Path | None = None,
+        fallback: SourceProvider | None = None,
+        resolver: MetadataResolver | None = None,
+    ):
+        self.dpath_bulk = Path(dpath_bulk)
+        if not self.dpath_bulk.is_dir():
+            raise NotADirectoryError(
+                f"No such directory: `{self.dpath_bulk}`"
+            )
+        self.fpath_index = Path(fpath_index) if fpath_index else \
+            self.dpath_bulk / FNAME_BULK_INDEX
+        self.fallback = fallback
+        self.resolver = resolver
+        self._index = None
+        self._lock = threading.Lock()
+
+    def build_index(self) -> None:
+        """Index the offset and size of every paper in the archives."""
+        rows: Dict[str, Tuple] = {}
+        for fpath in sorted(self.dpath_bulk.rglob(BULK_ARCHIVE_GLOB)):
+            fname = fpath.relative_to(self.dpath_bulk).as_posix()
+            # Only the headers are read, the data is skipped with seeks
+            with tarfile.open(fpath, mode="r:") as tar:
+                for member in tar:
+                    parsed = _bulk_member_id(member.name)
+                    if member.isfile() and parsed:
+                        # Later archives override earlier ones
+                        arxiv_id, version = parsed
+                        rows[arxiv_id] = (
+                            arxiv_id, fname, member.offset_data,
+                            member.size, version,
+                        )
+        OffsetIndex.write(self.fpath_index, rows.values())
+
+    def _get_index(self) -> OffsetIndex:
+        with self._lock:
+            if self._index is None:
+                fpaths = self.dpath_bulk.rglob(BULK_ARCHIVE_GLOB)
+                if is_stale(self.fpath_index, fpaths):
+                    self.build_index()
+                self._index = OffsetIndex(self.fpath_index)
+        return self._index
+
+    def _archived_version(self, arxiv_id: str, version: str) -> int:
+        if version:
+            return int(version)
+        latest = query_paper(arxiv_id, self.resolver)
+        return parse_arxiv_id(latest.get_short_id()).version
+
+    @contextmanager
+    def open(self, paper: "arxiv.Result") -> Iterator[IO[bytes]]:
+        arxiv_id = parse_arxiv_id(paper.get_short_id())
+        values = self._get_index().get(arxiv_id.id)
+        if values is None:
+            error = (
+                f"arXiv:{arxiv_id.id} is not in the bulk archives in "
+                f"`{self.dpath_bulk}`."
+            )
+        else:
+            # Indexes written before versions were recorded have none
+            fname, offset, size, version = (values + [""])[:4]
+            version = self._archived_version(arxiv_id.id, version)
+            error = None if version == arxiv_id.version else (
+                f"The bulk archives in `{self.dpath_bulk}` hold "
+                f"arXiv:{arxiv_id.id}v{version}, not v{arxiv_id.version}."
+            )
+
+        if error is None:
+            with open(self.dpath_bulk / fname, "rb") as f:
+                yield io.BufferedReader(
+                    _SliceStream(f, int(offset), int(size)), CHUNK_SIZE
+                )
+        elif self.fallback is not None:
+            with self.fallback.open(paper) as stream:
+                yield stream
+        else:
+            raise FileNotFoundError(error)
+
+
+_default_provider = None
+
+
+def get_source_provider() -> SourceProvider:
+    """Return the source provider shared by the calls in this process."""
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = HTTPSource()
+    return _default_provider
+
+
+def set_source_provider(provider: SourceProvider) -> None:
+    """Use `provider` for the sources of later calls, e.g. offline."""
+    global _default_provider
+    _default_provider = provider
+
+
+def get_source(
+    url: str,
+    dpath_source: Path,
+    resolver: MetadataResolver | None = None,
+    provider: SourceProvider | None = None,
+) -> Tuple[Path, Dict]:
+    arxiv_id = extract_arxiv_id(url)
+    paper = query_paper(arxiv_id, resolver)
+    provider = provider or get_source_provider()
+    with provider.open(paper) as stream:
+        return save_source(paper, stream, dpath_source)
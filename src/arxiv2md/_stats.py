@@ -0,0 +1,116 @@
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator
+
+
+_current_stats: ContextVar["Stats | None"] = ContextVar(
+    "arxiv2md_stats", default=None
+)
+
+
+def _peak_rss(children: bool = False) -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak_rss = resource.getrusage(who).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+@dataclass
+class Stats:
+    """
+    Timings and counters of one paper's conversion.
+
+    `stages` holds the seconds spent in each stage: "metadata",
+    "download", "extract", "main_tex", "latexml", "latexmlpost" (or
+    "latexmlc") and "convert". The time of a nested stage is not
+    counted in the enclosing one, e.g. "extract" does not include the
+    network reads of "download". The peak RSS values are the maxima
+    of this process and of its finished child processes so far, as
+    reported by `getrusage`.
+    """
+
+    stages: Dict[str, float] = field(default_factory=dict)
+    bytes_downloaded: int = 0
+    peak_rss: int = 0
+    peak_rss_children: int = 0
+    _stack: list = field(default_factory=list, repr=False)
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            elapsed_children = self._stack.pop()
+            self.stages[name] = (
+                self.stages.get(name, 0.0) + elapsed - elapsed_children
+            )
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def update_rss(self) -> None:
+        self.peak_rss = _peak_rss()
+        self.peak_rss_children = _peak_rss(children=True)
+
+    def to_dict(self) -> Dict:
+        return {
+            "stages": dict(self.stages),
+            "total": self.total,
+            "bytes_downloaded": self.bytes_downloaded,
+            "peak_rss": self.peak_rss,
+            "peak_rss_children": self.peak_rss_children,
+        }
+
+    def format(self) -> str:
+        lines = [
+            f"{name:<12} {seconds:9.3f} s"
+            for name, seconds in self.stages.items()
+        ]
+        lines += [
+            f"{'total':<12} {self.total:9.3f} s",
+            f"{'downloaded':<12} {self.bytes_downloaded / 1024 ** 2:9.2f} MB",
+            f"{'peak RSS':<12} {self.peak_rss / 1024 ** 2:9.1f} MB "
+            f"(LaTeXML {self.peak_rss_children / 1024 ** 2:.1f} MB)",
+        ]
+        return "\n".join(lines)
+
+
+@contextmanager
+def collect_stats(stats: Stats | None) -> Iterator[Stats | None]:
+    """Record the stages run in this context into `stats`."""
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        if stats is not None:
+            stats.update_rss()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    with stats.stage(name):
+        yield
+
+
+def add_bytes_downloaded(n: int) -> None:
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.bytes_downloaded += n
@@ -0,0 +1,161 @@
+from pathlib import Path
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import List
+
+from ._stats import stage
+
+
+DNAME_OBJECTS = "objects"
+DNAME_BINDINGS = "bindings"
+STYLE_SUFFIXES = (".sty", ".cls")
+BINDING_SUFFIX = ".ltxml"
+
+
+@dataclass
+class BundledStyle:
+    """
+    A .sty or .cls file found in a source tree.
+
+    Attributes:
+        fpath (Path): The file in the source tree.
+        sha256 (str): The SHA-256 of its contents.
+        fpath_binding (Path | None): The LaTeXML binding used instead
+            of the file, or None if LaTeXML interprets the raw file.
+    """
+
+    fpath: Path
+    sha256: str
+    fpath_binding: Path | None = None
+
+
+def _sha256(fpath: Path) -> str:
+    return hashlib.sha256(fpath.read_bytes()).hexdigest()
+
+
+def _write_atomic(fpath: Path, data: bytes) -> None:
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    fd, fname_tmp = tempfile.mkstemp(prefix=".tmp-", dir=fpath.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(fname_tmp, fpath)
+
+
+class StyleStore:
+    """
+    Style files bundled with arXiv sources, shared by all papers.
+
+    Many papers bundle the same large conference styles, and LaTeXML
+    interprets them as raw TeX for every paper. The store keeps one
+    copy of each bundled .sty and .cls file under the SHA-256 of its
+    contents, and maps the files it recognizes to LaTeXML bindings
+    (`<name>.sty.ltxml`), which LaTeXML looks up on its `--path` before
+    the raw files:
+
+    - A binding added with `add_binding` is used for files with the
+      same contents, wherever they are bundled.
+    - A binding in the `bindings` directory of the store, e.g.
+      `bindings/neurips_2023.sty.ltxml`, is used for every file of
+      that name.
+
+    Args:
+        dpath_store (str | Path): The directory of the store. It is
+            created if it does not exist.
+    """
+
+    def __init__(self, dpath_store: str | Path):
+        self.dpath_store = Path(dpath_store).resolve()
+        self.dpath_objects = self.dpath_store / DNAME_OBJECTS
+        self.dpath_bindings = self.dpath_store / DNAME_BINDINGS
+        self.dpath_objects.mkdir(parents=True, exist_ok=True)
+        self.dpath_bindings.mkdir(parents=True, exist_ok=True)
+
+    def _dpath_object(self, sha256: str) -> Path:
+        return self.dpath_objects / sha256[:2] / sha256
+
+    def _store(self, fpath: Path, sha256: str) -> Path:
+        fpath_object = self._dpath_object(sha256) / fpath.name
+        if not fpath_object.exists():
+            _write_atomic(fpath_object, fpath.read_bytes())
+        return fpath_object
+
+    def _find_binding(self, fpath: Path, sha256: str) -> Path | None:
+        fname_binding = fpath.name + BINDING_SUFFIX
+        fpath_binding = self._dpath_object(sha256) / fname_binding
+        if fpath_binding.exists():
+            return fpath_binding
+
+        fpath_binding = self.dpath_bindings / fname_binding
+        if fpath_binding.exists():
+            return fpath_binding
+        return None
+
+    def scan(self, dpath_source: str | Path) -> List[BundledStyle]:
+        """
+        Find the style files bundled in `dpath_source`, add them to
+        the store and look up their bindings.
+
+        Returns:
+            List[BundledStyle]: The style files, sorted by path.
+        """
+        styles = []
+        fpaths = sorted(
+            fpath for fpath in Path(dpath_source).rglob("*")
+            if fpath.suffix in STYLE_SUFFIXES and fpath.is_file()
+        )
+        for fpath in fpaths:
+            sha256 = _sha256(fpath)
+            self._store(fpath, sha256)
+            styles.append(BundledStyle(
+                fpath, sha256, self._find_binding(fpath, sha256)
+            ))
+        return styles
+
+    def latexml_options(self, dpath_source: str | Path) -> List[str]:
+        """
+        The `--path` options that make LaTeXML use the bindings of the
+        style files bundled in `dpath_source`.
+        """
+        with stage("styles"):
+            styles = self.scan(dpath_source)
+        dpaths = []
+        for style in styles:
+            if style.fpath_binding is None:
+                continue
+            dpath = style.fpath_binding.parent
+            if dpath not in dpaths:
+                dpaths.append(dpath)
+        return [f"--path={dpath}" for dpath in dpaths]
+
+    def add_binding(self, fpath_style: str | Path, binding: str) -> Path:
+        """
+        Use `binding`, the Perl source of a LaTeXML binding, for every
+        bundled file with the same contents as `fpath_style`.
+
+        Returns:
+            Path: The stored binding.
+        """
+        fpath_style = Path(fpath_style)
+        sha256 = _sha256(fpath_style)
+        self._store(fpath_style, sha256)
+        fpath_binding = (
+            self._dpath_object(sha256) / (fpath_style.name + BINDING_SUFFIX)
+        )
+        _write_atomic(fpath_binding, binding.encode("utf-8"))
+        return fpath_binding
+
+
+_default_store = None
+
+
+def get_style_store() -> StyleStore | None:
+    """Return the style store shared by the calls in this process."""
+    return _default_store
+
+
+def set_style_store(store: StyleStore | None) -> None:
+    """Use `store` for the bundled style files of later conversions."""
+    global _default_store
+    _default_store = store
@@ -1,89 +1,358 @@
+import os
 import re
+import itertools
 from pathlib import Path
 import tarfile
+import gzip
+import io
 import json
-from typing import Dict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, IO, Iterator, List, Set, Tuple
+from urllib.parse import urlparse
 from difflib import SequenceMatcher
 
-import arxiv
+if TYPE_CHECKING:
+    import arxiv
+
+from ._ids import parse_arxiv_id, file_safe_id
+from ._metadata import MetadataResolver, get_resolver
+from ._http import DownloadManager, get_download_manager
+from ._stats import stage, add_bytes_downloaded
 
 
 DNAME_SOURCE_ARXIV = "source_arxiv_{arxiv_id}"
 FNAME_METADATA = "metadata.json"
+FNAME_SINGLE_TEX = "main.tex"
+SOURCE_DOMAIN = "export.arxiv.org"
+
+# Files that LaTeXML does not read, as it is run without images: they
+# are skipped when the tarball is extracted. Everything else is kept,
+# since papers bundle classes, options, inputs without a suffix, etc.
+SKIPPED_SUFFIXES = {
+    # Images and documents
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp",
+    ".eps", ".ps", ".pdf", ".svg",
+    # Media, archives and data
+    ".mp4", ".mov", ".avi", ".gz", ".zip", ".tar", ".tgz",
+    ".npy", ".npz", ".h5", ".pkl", ".mat",
+}
+
+# Only the head of each .tex file is read to find the \documentclass
+MAIN_TEX_HEAD_SIZE = 1 << 14
+MAIN_TEX_INPUT_SCORE = 5
+MAIN_TEX_INPUTS_CAP = 10
+
+# The literal "%" first lets the regex engine skip ahead quickly
+_RE_TEX_COMMENT = re.compile(r"%(?<!\\%)[^\n]*")
+_RE_DOCUMENTCLASS = re.compile(r"\\document(?:class|style)\b")
+_RE_BEGIN_DOCUMENT = re.compile(r"\\begin\s*\{document\}")
+_RE_MAKETITLE = re.compile(r"\\maketitle\b")
+_RE_TITLE = re.compile(r"\\title\s*(?:\[[^\]]*\])?\s*\{(.*)")
+_RE_INPUT = re.compile(
+    r"\\(?:input|include|subfile)\s*\{([^}]+)\}"
+    r"|\\input\s+([^\s{}\\]+)"
+)
 
 
 def extract_arxiv_id(url: str) -> str:
-    match = re.search(r"(\d{4}\.\d{4,5})", url)
-    if match:
-        arxiv_id = match.group(1)
-        return arxiv_id
-    else:
-        raise ValueError(
-            f"Invalid input URL: {url}. Could not extract arXiv ID."
-        )
+    # With its version if it has one, so that versions are kept apart
+    return str(parse_arxiv_id(url))
 
 
-def get_source(url: str, dpath_source: Path) -> str:
-    arxiv_id = extract_arxiv_id(url)
-    paper = next(arxiv.Client().results(arxiv.Search(id_list=[arxiv_id])))
-    fpath_source = paper.download_source(dpath_source)
+def query_paper(
+    arxiv_id: str,
+    resolver: MetadataResolver | None = None,
+) -> "arxiv.Result":
+    resolver = resolver or get_resolver()
+    with stage("metadata"):
+        return resolver.get(arxiv_id)
 
-    dname_source_arxiv = DNAME_SOURCE_ARXIV.format(
-        arxiv_id=arxiv_id.replace('.', '-')
-    )
-    dpath_source_arxiv = dpath_source / dname_source_arxiv
-    with tarfile.open(fpath_source, mode="r:gz") as tar:
-        tar.extractall(dpath_source_arxiv)
 
-    metadata = {
-        "arxiv_id": arxiv_id,
+def get_metadata(paper: "arxiv.Result") -> Dict:
+    arxiv_id = parse_arxiv_id(paper.entry_id)
+    return {
+        "arxiv_id": arxiv_id.id,
+        "version": arxiv_id.version,
         "title": paper.title,
         "published": paper.published.strftime("%Y-%m-%d"),
         "authors": [author.name for author in paper.authors],
     }
+
+
+class _PeekableStream(io.RawIOBase):
+    def __init__(self, stream: IO[bytes]):
+        self._stream = stream
+        self._head = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def peek(self, size: int) -> bytes:
+        while len(self._head) < size:
+            chunk = self._stream.read(size - len(self._head))
+            if not chunk:
+                break
+            self._head += chunk
+        return self._head[:size]
+
+    def readinto(self, buffer) -> int:
+        if self._head:
+            data = self._head[:len(buffer)]
+            self._head = self._head[len(data):]
+        else:
+            data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _MeteredStream(io.RawIOBase):
+    def __init__(self, stream: IO[bytes]):
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        with stage("download"):
+            data = self._stream.read(len(buffer))
+        add_bytes_downloaded(len(data))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _is_tar_header(block: bytes) -> bool:
+    try:
+        tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+    except tarfile.HeaderError:
+        return False
+    return True
+
+
+def _is_source_member(name: str) -> bool:
+    return Path(name).suffix.lower() not in SKIPPED_SUFFIXES
+
+
+def source_url(paper: "arxiv.Result", base_url: str | None = None) -> str:
+    url = urlparse(paper.pdf_url)._replace(netloc=SOURCE_DOMAIN).geturl()
+    url = url.replace("/pdf/", "/src/")
+    if base_url:
+        url = base_url + urlparse(url).path
+    return url
+
+
+@contextmanager
+def open_source(
+    paper: "arxiv.Result",
+    manager: DownloadManager | None = None,
+) -> Iterator[IO[bytes]]:
+    manager = manager or get_download_manager()
+    # The bytes are kept as served so that they can be hashed and cached
+    with manager.open(source_url(paper, manager.base_url)) as stream:
+        yield _MeteredStream(stream)
+
+
+def extract_source(
+    stream: IO[bytes],
+    dpath_dest: Path,
+) -> None:
+    """
+    Extract the files LaTeXML may read from a source stream, skipping
+    images and other binary files (see `SKIPPED_SUFFIXES`).
+
+    The stream is read sequentially, so the tarball never has to be
+    written to disk. Sources that are a single (gzipped) .tex file
+    instead of a tarball are written to `main.tex`.
+    """
+    stream = _PeekableStream(stream)
+    if stream.peek(2) == b"\x1f\x8b":
+        stream = _PeekableStream(gzip.GzipFile(fileobj=stream, mode="rb"))
+
+    head = stream.peek(tarfile.BLOCKSIZE)
+    dpath_dest.mkdir(parents=True, exist_ok=True)
+    if _is_tar_header(head):
+        extract_options = {}
+        if hasattr(tarfile, "data_filter"):
+            extract_options["filter"] = "data"
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in tar:
+                if member.isfile() and _is_source_member(member.name):
+                    tar.extract(member, dpath_dest, **extract_options)
+    elif head.startswith(b"%PDF"):
+        raise FileNotFoundError(
+            "The paper does not provide its LaTeX source code."
+        )
+    else:
+        with open(dpath_dest / FNAME_SINGLE_TEX, "wb") as f:
+            while chunk := stream.read(1 << 20):
+                f.write(chunk)
+
+
+def save_source(
+    paper: "arxiv.Result",
+    stream: IO[bytes],
+    dpath_source: Path,
+) -> Tuple[Path, Dict]:
+    metadata = get_metadata(paper)
+    dname_source_arxiv = DNAME_SOURCE_ARXIV.format(
+        arxiv_id=file_safe_id(metadata["arxiv_id"])
+    )
+    dpath_source_arxiv = dpath_source / dname_source_arxiv
+    with stage("extract"):
+        extract_source(stream, dpath_source_arxiv)
+
     with open(dpath_source / FNAME_METADATA, "w", encoding="utf-8") as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
 
     return dpath_source_arxiv, metadata
 
 
-def _main_tex_score(fpath_tex, title: str) -> float:
-    score = 0
-    with open(fpath_tex, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith(r"\documentclass"):
-                score += 20
-            elif line.startswith(r"\begin{document}"):
-                score += 5
-            elif line.startswith(r"\title"):
-                title_latex = re.sub(
-                    r"[{}]", "", line[len(r"\title"):].strip()
-                )
-                ratio = SequenceMatcher(None, title, title_latex).ratio()
-                score += 5 * ratio
-            elif line.startswith(r"\maketitle"):
-                score += 3
+def _read_head(fpath: str | Path, size: int = MAIN_TEX_HEAD_SIZE) -> str:
+    with open(fpath, "rb") as f:
+        head = f.read(size)
+    return _RE_TEX_COMMENT.sub("", head.decode("utf-8", errors="replace"))
+
+
+def _readme_hints(dpath_source: Path) -> Tuple[List[Path], Set[Path]]:
+    """The top-level and ignored files declared in arXiv's 00README."""
+    toplevel, ignore = [], set()
+    fpath_json = dpath_source / "00README.json"
+    fpath_xxx = dpath_source / "00README.XXX"
+    if fpath_json.exists():
+        try:
+            with open(fpath_json, "r", encoding="utf-8") as f:
+                sources = json.load(f).get("sources", [])
+        except (ValueError, AttributeError):
+            sources = []
+        for source in sources:
+            if not isinstance(source, dict) or "filename" not in source:
+                continue
+            fpath = dpath_source / source["filename"]
+            if source.get("usage") == "toplevel":
+                toplevel.append(fpath)
+            elif source.get("usage") == "ignore":
+                ignore.add(fpath)
+    elif fpath_xxx.exists():
+        with open(fpath_xxx, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) != 2:
+                    continue
+                fpath = dpath_source / fields[0]
+                if fields[1] == "toplevelfile":
+                    toplevel.append(fpath)
+                elif fields[1] == "ignore":
+                    ignore.add(fpath)
+    return [f for f in toplevel if f.suffix == ".tex"], ignore
+
+
+def _resolve_input(
+    name: str,
+    dpath_root: str,
+    dpath_main: str,
+    tex_files: Set[str],
+) -> str | None:
+    # LaTeX looks up inputs relative to the directory it runs in, which
+    # is the directory of the main file
+    name = name.strip()
+    if not name.endswith(".tex"):
+        name += ".tex"
+    for dpath in (dpath_main, dpath_root):
+        fpath = os.path.normpath(os.path.join(dpath, name))
+        if fpath in tex_files:
+            return fpath
+    return None
+
+
+def _main_tex_score(text: str, title: str) -> float:
+    score = 20
+    if _RE_BEGIN_DOCUMENT.search(text):
+        score += 5
+    if _RE_MAKETITLE.search(text):
+        score += 3
+    if title and (match := _RE_TITLE.search(text)):
+        title_latex = re.sub(r"[{}]", "", match.group(1)).strip()
+        score += 5 * SequenceMatcher(None, title, title_latex).ratio()
     return score
 
+
 def get_main_texfile(dpath_source: Path, title: str) -> Path | None:
-    tex_files = [
-        (f, _main_tex_score(f, title))
-        for f in dpath_source.glob("*.tex")
-    ]
-    tex_files = [(f, s) for f, s in tex_files if s > 0]
+    """
+    Find the file to run LaTeXML on.
 
-    if not tex_files:
-        return None
-    main_tex_file = max(tex_files, key=lambda x: x[1])[0]
-    return main_tex_file
+    A top-level file declared in `00README.json` or `00README.XXX` is
+    used if there is one. Otherwise, only the head of each .tex file is
+    read to find the ones that declare a document class, one directory
+    level at a time from the top. If the first level that has any has
+    several, the ones that another one inputs or includes are dropped,
+    and the rest are ranked by the number of files they pull in,
+    whether they begin the document and make a title, and the
+    similarity of their title to `title`.
+    """
+    toplevel, ignore = _readme_hints(dpath_source)
+    for fpath in toplevel:
+        if fpath.is_file():
+            return fpath
 
+    # Plain strings, as pathlib is slow with hundreds of fragments
+    ignore = {os.path.normpath(f) for f in ignore}
+    tex_files = sorted(
+        (
+            fpath for f in dpath_source.rglob("*.tex")
+            if (fpath := os.path.normpath(f)) not in ignore
+        ),
+        key=lambda f: (f.count(os.sep), f),
+    )
+    heads, candidates = {}, []
+    levels = itertools.groupby(tex_files, key=lambda f: f.count(os.sep))
+    for _, fpaths in levels:
+        for fpath in fpaths:
+            heads[fpath] = _read_head(fpath)
+            if _RE_DOCUMENTCLASS.search(heads[fpath]):
+                candidates.append(fpath)
+        # Subdirectories are only searched if there is no main file above
+        if candidates:
+            break
+    if not candidates:
+        # Without a \documentclass, fall back to a fragment that at
+        # least begins the document
+        candidates = [
+            f for f in tex_files if _RE_BEGIN_DOCUMENT.search(heads[f])
+        ][:1]
+    if len(candidates) <= 1:
+        return Path(candidates[0]) if candidates else None
 
-def concat_metadata(markdown: str, metadata: Dict) -> str:
+    dpath_root = os.path.normpath(dpath_source)
+    tex_files = set(tex_files)
+    texts, inputs = {}, {}
+    for fpath in candidates:
+        with open(fpath, "r", encoding="utf-8", errors="replace") as f:
+            texts[fpath] = _RE_TEX_COMMENT.sub("", f.read())
+        fpaths_input = (
+            _resolve_input(
+                match.group(1) or match.group(2),
+                dpath_root, os.path.dirname(fpath), tex_files,
+            )
+            for match in _RE_INPUT.finditer(texts[fpath])
+        )
+        inputs[fpath] = {f for f in fpaths_input if f}
+
+    included = set().union(*inputs.values())
+    # Files that include each other are all candidates again
+    roots = [f for f in candidates if f not in included] or candidates
+    return Path(max(
+        roots,
+        key=lambda f: (
+            MAIN_TEX_INPUT_SCORE * min(len(inputs[f]), MAIN_TEX_INPUTS_CAP)
+            + _main_tex_score(texts[f], title)
+        ),
+    ))
+
+
+def format_frontmatter(metadata: Dict) -> str:
     authors = "\n".join(
         [f"  - \"{author}\"" for author in metadata["authors"]]
     )
-    frontmatter = "\n".join([
+    return "\n".join([
         "---",
         f"title: \"{metadata['title']}\"",
         f"arxiv_id: \"{metadata['arxiv_id']}\"",
@@ -92,4 +361,7 @@ def concat_metadata(markdown: str, metadata: Dict) -> str:
         "---",
         "",
     ])
-    return frontmatter + markdown
+
+
+def concat_metadata(markdown: str, metadata: Dict) -> str:
+    return format_frontmatter(metadata) + markdown
@@ -1,28 +1,234 @@
 from pathlib import Path
+import json
+import sys
+import threading
+from functools import partial
+from typing import TYPE_CHECKING, Iterator, List, Tuple
 
 import typer
+from typer.core import TyperGroup
 
-from ._utils import extract_arxiv_id
-from ._api import arxiv2md_cli
-
+if TYPE_CHECKING:
+    from ._document import Formula
+    from ._stats import Stats
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
-app = typer.Typer(add_completion=False, context_settings=CONTEXT_SETTINGS)
+DEFAULT_COMMAND = "convert"
 
 
-@app.command()
+class _DefaultCommandGroup(TyperGroup):
+    """Run `convert` unless the first argument names another command."""
+
+    def parse_args(self, ctx, args):
+        if not args or args[0] not in self.commands:
+            args = [DEFAULT_COMMAND, *args]
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(
+    cls=_DefaultCommandGroup,
+    add_completion=False,
+    context_settings=CONTEXT_SETTINGS,
+)
+
+
+def _read_batch_file(fpath_batch: str) -> List[str]:
+    from ._ids import normalize_ids
+
+    # Each paper once; the invalid lines go last and fail in the batch
+    invalid = []
+    if fpath_batch == "-":
+        arxiv_ids = list(normalize_ids(sys.stdin, on_invalid=invalid.append))
+    else:
+        with open(fpath_batch, "r", encoding="utf-8") as f:
+            arxiv_ids = list(normalize_ids(f, on_invalid=invalid.append))
+    return arxiv_ids + invalid
+
+
+def _write_stats(f_stats, url: str, arxiv_id: str | None, stats: "Stats"):
+    record = {"url": url, "arxiv_id": arxiv_id, **stats.to_dict()}
+    f_stats.write(json.dumps(record) + "\n")
+    f_stats.flush()
+
+
+def _write_formulas(
+    f_math,
+    lock: threading.Lock,
+    arxiv_id: str,
+    formulas: List["Formula"],
+):
+    lines = "".join(
+        json.dumps(
+            {"arxiv_id": arxiv_id, **formula.to_dict()}, ensure_ascii=False
+        ) + "\n"
+        for formula in formulas
+    )
+    # Batch workers index their papers concurrently
+    with lock:
+        f_math.write(lines)
+        f_math.flush()
+
+
+def _write_chunks(fpath_output: Path, chunks: Iterator[str]) -> None:
+    first_chunk = next(chunks, "")
+    with open(fpath_output, "w", encoding="utf-8") as f:
+        f.write(first_chunk)
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def _parse_shard(shard: str) -> Tuple[int, int]:
+    try:
+        index, n_shards = (int(part) for part in shard.split("/"))
+    except ValueError:
+        index = n_shards = 0
+    if not 0 <= index < n_shards:
+        raise typer.BadParameter(
+            "Give the shard as INDEX/COUNT with 0 <= INDEX < COUNT, "
+            "e.g. 0/4.",
+            param_hint="--shard",
+        )
+    return index, n_shards
+
+
+def _cli_batch(
+    urls: List[str],
+    dpath_output: str | None,
+    batch_options: dict,
+    profile: bool,
+    f_stats,
+):
+    from ._journal import arxiv2md_resume
+    from ._convert import LaTeXMLNotFoundError
+    from ._stats import Stats
+
+    n_total = n_failed = n_skipped = 0
+    stats_total = Stats()
+    results = arxiv2md_resume(urls, dpath_output or ".", **batch_options)
+    try:
+        for result in results:
+            n_total += 1
+            if result.skipped:
+                n_skipped += 1
+                if not result.ok:
+                    n_failed += 1
+                    typer.echo(
+                        f"Failed to convert `{result.url}` in an earlier "
+                        f"run: {result.error}",
+                        err=True,
+                    )
+                continue
+            if f_stats:
+                _write_stats(
+                    f_stats, result.url, result.arxiv_id, result.stats
+                )
+            for name, seconds in result.stats.stages.items():
+                stats_total.stages[name] = (
+                    stats_total.stages.get(name, 0.0) + seconds
+                )
+            stats_total.bytes_downloaded += result.stats.bytes_downloaded
+
+            if not result.ok:
+                n_failed += 1
+                typer.echo(
+                    f"Failed to convert `{result.url}`: {result.error}",
+                    err=True,
+                )
+                continue
+            print(f"Markdown file saved to `{result.fpath_output}`")
+    except LaTeXMLNotFoundError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
+
+    summary = f"Converted {n_total - n_failed}/{n_total} papers"
+    if n_skipped:
+        summary += f" ({n_skipped} finished in earlier runs)"
+    print(summary)
+    if profile:
+        stats_total.update_rss()
+        typer.echo(stats_total.format(), err=True)
+    if n_failed:
+        raise typer.Exit(code=1)
+
+
+@app.command(DEFAULT_COMMAND)
 def cli(
-    url: str = typer.Argument(
+    urls: List[str] = typer.Argument(
+        None,
         help=(
-            "The URL of the arXiv paper or the arXiv ID."
+            "The URL of the arXiv paper or the arXiv ID. If several "
+            "are given, they are converted as a batch."
         ),
+        show_default=False,
     ),
     fpath_output: str = typer.Option(
         None,
         "--output", "-o",
         help=(
             "The path to the output Markdown file. If None, the file "
-            "will be named as `arxiv_<arxiv_id>.md`."
+            "will be named as `arxiv_<arxiv_id>.md`. In batch mode, "
+            "the directory to save the Markdown files in."
+        ),
+    ),
+    fpath_batch: str = typer.Option(
+        None,
+        "--batch", "-b",
+        help=(
+            "A file listing URLs or arXiv IDs to convert, one per "
+            "line. Use `-` to read the list from stdin."
+        ),
+    ),
+    workers: int = typer.Option(
+        4,
+        "--workers", "-j",
+        help=(
+            "The maximum number of papers converted concurrently in "
+            "batch mode."
+        ),
+    ),
+    fpath_journal: str = typer.Option(
+        None,
+        "--journal",
+        help=(
+            "Record the status, stage timings, output file and error "
+            "of each paper in this file (JSON Lines) in batch mode. "
+            "When the batch is run again, the papers it records as "
+            "done or as failed for good are skipped."
+        ),
+    ),
+    shard: str = typer.Option(
+        None,
+        "--shard",
+        help=(
+            "Convert only one shard of the batch, given as "
+            "INDEX/COUNT, e.g. 0/4 to 3/4 on four machines. Papers "
+            "are assigned to shards by a hash of their arXiv ID."
+        ),
+    ),
+    retries: int = typer.Option(
+        2,
+        "--retries",
+        help=(
+            "The number of times a paper that failed with a transient "
+            "error (connection errors, timeouts, server errors) is "
+            "tried again in batch mode."
+        ),
+    ),
+    retry_backoff: float = typer.Option(
+        30.0,
+        "--retry-backoff",
+        help=(
+            "The wait in seconds before the first retry of the "
+            "failed papers. It doubles after each retry."
+        ),
+    ),
+    convert_processes: int = typer.Option(
+        None,
+        "--convert-processes",
+        help=(
+            "The number of processes converting JATS to Markdown in "
+            "batch mode, so that the conversions run in parallel on "
+            "all cores. By default, they run in the worker threads."
         ),
     ),
     yes: bool = typer.Option(
@@ -42,6 +248,159 @@ def cli(
             "be used."
         ),
     ),
+    dpath_cache: str = typer.Option(
+        None,
+        "--cache-dir",
+        help=(
+            "The directory of a persistent cache for the source files "
+            "and the conversion results. Cached papers are converted "
+            "again without downloading or running LaTeXML."
+        ),
+    ),
+    cache_max_size: int = typer.Option(
+        None,
+        "--cache-max-size",
+        help=(
+            "The maximum size of the cache in MB. The least recently "
+            "used papers are evicted beyond this size."
+        ),
+    ),
+    mirror: str = typer.Option(
+        None,
+        "--mirror",
+        help=(
+            "The base URL to download the sources from instead of "
+            "arXiv, e.g. a local mirror of https://export.arxiv.org. "
+            "Downloads from arXiv are limited to one request every "
+            "three seconds, those from a mirror are not limited."
+        ),
+    ),
+    fpath_tarball: str = typer.Option(
+        None,
+        "--from-tarball",
+        help=(
+            "Read the source of the paper from this local tarball "
+            "instead of downloading it. Not supported in batch mode."
+        ),
+    ),
+    dpath_from: str = typer.Option(
+        None,
+        "--from-dir",
+        help=(
+            "Read the source of the paper from this directory of "
+            "already extracted files instead of downloading it. Not "
+            "supported in batch mode."
+        ),
+    ),
+    dpath_bulk: str = typer.Option(
+        None,
+        "--bulk-dir",
+        help=(
+            "Read the sources from a local copy of arXiv's bulk "
+            "source archives (arXiv_src_YYMM_NNN.tar) instead of "
+            "downloading them. An index of the archives is written "
+            "to this directory on first use."
+        ),
+    ),
+    fpath_snapshot: str = typer.Option(
+        None,
+        "--metadata-snapshot",
+        help=(
+            "Look up the metadata in a local arXiv metadata snapshot "
+            "(JSON Lines, as on Kaggle) instead of the arXiv API. An "
+            "index is written next to it on first use."
+        ),
+    ),
+    backend: str = typer.Option(
+        "bs4",
+        "--backend",
+        help=(
+            "The JATS to Markdown converter: `bs4` or `lxml`. `lxml` "
+            "converts in a single streaming pass and uses less memory "
+            "on large papers. Both produce the same output."
+        ),
+    ),
+    engine: str = typer.Option(
+        "latexml",
+        "--engine",
+        help=(
+            "How LaTeXML is run: `latexml` (latexml and latexmlpost), "
+            "`latexmlc` (both steps in one process) or `server` (warm "
+            "latexmls servers that skip the start-up cost, useful for "
+            "batches)."
+        ),
+    ),
+    timeout: float = typer.Option(
+        None,
+        "--timeout",
+        help=(
+            "The wall-clock limit in seconds for each LaTeXML process."
+        ),
+    ),
+    memory_limit: int = typer.Option(
+        None,
+        "--memory-limit",
+        help=(
+            "The address space limit in MB for each LaTeXML process. "
+            "Not applied with `--engine server`."
+        ),
+    ),
+    cpu_limit: int = typer.Option(
+        None,
+        "--cpu-limit",
+        help=(
+            "The CPU time limit in seconds for each LaTeXML process. "
+            "Not applied with `--engine server`."
+        ),
+    ),
+    dpath_styles: str = typer.Option(
+        None,
+        "--style-store",
+        help=(
+            "A directory of style files and LaTeXML bindings shared by "
+            "all papers. A style bundled with a paper that has a "
+            "binding in `DIR/bindings/` is not interpreted by LaTeXML; "
+            "the binding is loaded instead."
+        ),
+    ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help=(
+            "Print the time spent in each stage of the pipeline, the "
+            "downloaded bytes and the peak memory usage to stderr. In "
+            "batch mode, the times are summed over all papers."
+        ),
+    ),
+    fpath_stats: str = typer.Option(
+        None,
+        "--stats-json",
+        help=(
+            "Append the stage timings and counters of each paper to "
+            "this file as JSON Lines."
+        ),
+    ),
+    fpath_math: str = typer.Option(
+        None,
+        "--math-index",
+        help=(
+            "Append every formula of the converted papers to this file "
+            "as JSON Lines: the arXiv ID, the position and JATS ID of "
+            "the formula, its LaTeX, whether it is displayed or inline "
+            "and its section path."
+        ),
+    ),
+    output_format: str = typer.Option(
+        "markdown",
+        "--format",
+        help=(
+            "The output format: `markdown` or `jsonl`. `jsonl` writes "
+            "one JSON object per block (heading, paragraph, caption, "
+            "formula, reference, ...) with its section path and cited "
+            "bibliography IDs, for indexing. Not supported in batch "
+            "mode."
+        ),
+    ),
     no_frontmatter: bool = typer.Option(
         False,
         "--no-frontmatter",
@@ -58,8 +417,114 @@ def cli(
         ),
     ),
 ):
+    """
+    Convert arXiv papers to Markdown. See `arxiv2md reconvert --help`
+    to convert the JATS files kept by earlier runs again.
+    """
+    # Imported here, so that `--help` does not wait for them
+    from ._utils import extract_arxiv_id
+    from ._ids import file_safe_id
+    from ._api import (
+        arxiv2md_cli, ConvertOptions, CONVERTERS, OUTPUT_FORMATS
+    )
+    from ._convert import ENGINES, LaTeXMLError
+    from ._cache import Cache
+    from ._http import DownloadManager, set_download_manager
+    from ._sources import (
+        TarballSource, DirectorySource, BulkArchiveSource,
+        set_source_provider,
+    )
+    from ._metadata import SnapshotResolver, set_resolver
+    from ._styles import StyleStore, set_style_store
+    from ._stats import Stats
+
+    urls = list(urls or [])
+    if fpath_batch:
+        urls += _read_batch_file(fpath_batch)
+    if not urls:
+        raise typer.BadParameter("No arXiv URL or ID was given.")
+    batch = len(urls) > 1 or fpath_batch is not None
+    if backend not in CONVERTERS:
+        raise typer.BadParameter(
+            f"Choose from {', '.join(CONVERTERS)}.",
+            param_hint="--backend",
+        )
+    if engine not in ENGINES:
+        raise typer.BadParameter(
+            f"Choose from {', '.join(ENGINES)}.",
+            param_hint="--engine",
+        )
+    if output_format not in OUTPUT_FORMATS:
+        raise typer.BadParameter(
+            f"Choose from {', '.join(OUTPUT_FORMATS)}.",
+            param_hint="--format",
+        )
+    if not batch and (fpath_journal or shard):
+        raise typer.BadParameter(
+            "Only supported in batch mode.",
+            param_hint="--journal" if fpath_journal else "--shard",
+        )
+    if shard:
+        shard = _parse_shard(shard)
+    if batch and output_format != "markdown":
+        raise typer.BadParameter(
+            "Only Markdown is supported in batch mode.",
+            param_hint="--format",
+        )
+    if mirror:
+        set_download_manager(DownloadManager(base_url=mirror))
+    sources = [
+        (option, value) for option, value in (
+            ("--from-tarball", fpath_tarball),
+            ("--from-dir", dpath_from),
+            ("--bulk-dir", dpath_bulk),
+        ) if value
+    ]
+    if len(sources) > 1:
+        raise typer.BadParameter(
+            "Only one source can be given.",
+            param_hint=" / ".join(option for option, _ in sources),
+        )
+    if batch and (fpath_tarball or dpath_from):
+        raise typer.BadParameter(
+            "A single source is not supported in batch mode.",
+            param_hint=sources[0][0],
+        )
+    try:
+        if fpath_tarball:
+            set_source_provider(TarballSource(fpath_tarball))
+        elif dpath_from:
+            set_source_provider(DirectorySource(dpath_from))
+        elif dpath_bulk:
+            set_source_provider(BulkArchiveSource(dpath_bulk))
+    except OSError as e:
+        raise typer.BadParameter(str(e), param_hint=sources[0][0])
+    if fpath_snapshot:
+        if not Path(fpath_snapshot).is_file():
+            raise typer.BadParameter(
+                f"No such file: `{fpath_snapshot}`",
+                param_hint="--metadata-snapshot",
+            )
+        set_resolver(SnapshotResolver(fpath_snapshot))
+    if dpath_styles:
+        set_style_store(StyleStore(dpath_styles))
+    if cache_max_size is not None:
+        cache_max_size *= 1024 ** 2
+    if memory_limit is not None:
+        memory_limit *= 1024 ** 2
+    limits = {
+        "timeout": timeout,
+        "memory_limit": memory_limit,
+        "cpu_limit": cpu_limit,
+    }
+
     stdout = fpath_output == "-"
-    arxiv_id = extract_arxiv_id(url)
+    if batch and stdout:
+        raise typer.BadParameter(
+            "Writing to stdout is not supported in batch mode."
+        )
+    if not batch:
+        arxiv_id = extract_arxiv_id(urls[0])
 
     if dpath_source:
         dpath_source = Path(dpath_source).resolve()
@@ -76,8 +541,49 @@ def cli(
         else:
             dpath_source.mkdir(parents=True)
 
+    f_stats = None
+    if fpath_stats:
+        fpath_stats = Path(fpath_stats).resolve()
+        fpath_stats.parent.mkdir(parents=True, exist_ok=True)
+        f_stats = open(fpath_stats, "a", encoding="utf-8")
+    f_math = on_formulas = None
+    if fpath_math:
+        fpath_math = Path(fpath_math).resolve()
+        fpath_math.parent.mkdir(parents=True, exist_ok=True)
+        f_math = open(fpath_math, "a", encoding="utf-8")
+        on_formulas = partial(_write_formulas, f_math, threading.Lock())
+    if batch:
+        batch_options = {
+            "workers": workers,
+            "dpath_source": dpath_source,
+            "frontmatter": not no_frontmatter,
+            "verbose": verbose,
+            "dpath_cache": dpath_cache,
+            "cache_max_size": cache_max_size,
+            "backend": backend,
+            "engine": engine,
+            "convert_processes": convert_processes,
+            "on_formulas": on_formulas,
+            "fpath_journal": fpath_journal,
+            "shard": shard,
+            "retries": retries,
+            "backoff": retry_backoff,
+            **limits,
+        }
+        try:
+            _cli_batch(urls, fpath_output, batch_options, profile, f_stats)
+        finally:
+            if f_stats:
+                f_stats.close()
+            if f_math:
+                f_math.close()
+        return
+
+    suffix = ".jsonl" if output_format == "jsonl" else ".md"
     if not stdout:
-        fpath_output = fpath_output or f"arxiv_{arxiv_id.replace('.', '-')}.md"
+        fpath_output = (
+            fpath_output or f"arxiv_{file_safe_id(arxiv_id)}{suffix}"
+        )
         fpath_output = Path(fpath_output).resolve()
 
         if not fpath_output.parent.exists():
@@ -89,7 +595,7 @@ def cli(
                 fpath_output.parent.mkdir(parents=True)
 
         if not fpath_output.suffix:
-            fpath_output = fpath_output.with_suffix(".md")
+            fpath_output = fpath_output.with_suffix(suffix)
 
         if fpath_output.exists() and (not yes):
             if not typer.confirm(
@@ -98,13 +604,352 @@ def cli(
             ):
                 raise typer.Exit()
 
-    content_md = arxiv2md_cli(
-        arxiv_id, dpath_source, not no_frontmatter, verbose
+    cache = Cache(dpath_cache, cache_max_size) if dpath_cache else None
+    stats = Stats() if (profile or f_stats) else None
+    chunks = arxiv2md_cli(
+        arxiv_id,
+        dpath_source,
+        not no_frontmatter,
+        ConvertOptions(
+            verbose, backend, engine, **limits, on_formulas=on_formulas
+        ),
+        cache,
+        stats,
+        output_format,
     )
+    try:
+        # The output is written chunk by chunk as the sections are
+        # converted, and the file is only created once LaTeXML is done
+        if stdout:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+                sys.stdout.flush()
+            if output_format == "markdown":
+                print()
+        else:
+            _write_chunks(fpath_output, chunks)
+    except LaTeXMLError as e:
+        typer.echo(f"Failed to convert `{urls[0]}`: {e}", err=True)
+        raise typer.Exit(code=1)
+    finally:
+        if f_stats:
+            _write_stats(f_stats, urls[0], arxiv_id, stats)
+            f_stats.close()
+        if f_math:
+            f_math.close()
 
-    if stdout:
-        print(content_md)
-    else:
-        with open(fpath_output, "w", encoding="utf-8") as f:
-            f.write(content_md)
+    if profile:
+        typer.echo(stats.format(), err=True)
+    if not stdout and output_format == "jsonl":
+        print(f"JSON Lines file saved to `{fpath_output}`")
+    elif not stdout:
         print(f"Markdown file saved to `{fpath_output}`")
+
+
+@app.command()
+def reconvert(
+    dpath_source: str = typer.Argument(
+        ...,
+        help=(
+            "The directory to search for the `paper.jats.xml` files "
+            "kept by earlier runs with `--source-dir` or `--cache-dir`."
+        ),
+        show_default=False,
+    ),
+    dpath_output: str = typer.Option(
+        None,
+        "--output", "-o",
+        help=(
+            "The directory to write the Markdown files to. Defaults to "
+            "the current directory."
+        ),
+    ),
+    workers: int = typer.Option(
+        None,
+        "--workers", "-w",
+        help=(
+            "The number of worker processes. Defaults to the number of "
+            "CPUs."
+        ),
+    ),
+    backend: str = typer.Option(
+        "bs4",
+        "--backend",
+        help=(
+            "The JATS to Markdown converter: `bs4` or `lxml`."
+        ),
+    ),
+    force: bool = typer.Option(
+        False,
+        "--force",
+        help=(
+            "Convert every paper, even if its JATS and the converter "
+            "are unchanged since the last run."
+        ),
+    ),
+    no_frontmatter: bool = typer.Option(
+        False,
+        "--no-frontmatter",
+        help=(
+            "The output Markdown files will not include frontmatter "
+            "metadata."
+        ),
+    ),
+):
+    """
+    Convert the JATS files of earlier runs to Markdown again, without
+    downloading or running LaTeXML. Papers that are unchanged since the
+    last run are skipped.
+    """
+    from ._api import CONVERTERS
+    from ._reconvert import arxiv2md_reconvert
+
+    if backend not in CONVERTERS:
+        raise typer.BadParameter(
+            f"Choose from {', '.join(CONVERTERS)}.",
+            param_hint="--backend",
+        )
+    if not Path(dpath_source).is_dir():
+        raise typer.BadParameter(
+            f"`{dpath_source}` is not a directory.",
+            param_hint="DPATH_SOURCE",
+        )
+
+    n_total = n_skipped = n_failed = 0
+    for result in arxiv2md_reconvert(
+        dpath_source,
+        dpath_output or ".",
+        frontmatter=not no_frontmatter,
+        backend=backend,
+        workers=workers,
+        force=force,
+    ):
+        n_total += 1
+        if not result.ok:
+            n_failed += 1
+            typer.echo(
+                f"Failed to convert `{result.fpath_jats}`: {result.error}",
+                err=True,
+            )
+        elif result.skipped:
+            n_skipped += 1
+        else:
+            print(f"Markdown file saved to `{result.fpath_output}`")
+
+    print(
+        f"Converted {n_total - n_skipped - n_failed}/{n_total} papers "
+        f"({n_skipped} unchanged)"
+    )
+    if n_failed:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def serve(
+    host: str = typer.Option(
+        "127.0.0.1",
+        "--host",
+        help="The address to listen on.",
+    ),
+    port: int = typer.Option(
+        8000,
+        "--port", "-p",
+        help="The port to listen on.",
+    ),
+    workers: int = typer.Option(
+        2,
+        "--workers", "-j",
+        help="The maximum number of papers converted concurrently.",
+    ),
+    queue_size: int = typer.Option(
+        64,
+        "--queue-size",
+        help=(
+            "The number of papers that can wait for a worker. Further "
+            "submissions are answered with 503 until the queue drains."
+        ),
+    ),
+    deadline: float = typer.Option(
+        None,
+        "--deadline",
+        help=(
+            "The default time in seconds from submission by which a "
+            "job must be done. A request can set its own."
+        ),
+    ),
+    max_results: int = typer.Option(
+        1000,
+        "--max-results",
+        help=(
+            "The number of finished jobs kept in memory with their "
+            "Markdown, to serve repeated requests."
+        ),
+    ),
+    dpath_cache: str = typer.Option(
+        None,
+        "--cache-dir",
+        help=(
+            "The directory of a persistent cache for the source files "
+            "and the conversion results, kept across restarts."
+        ),
+    ),
+    cache_max_size: int = typer.Option(
+        None,
+        "--cache-max-size",
+        help=(
+            "The maximum size of the cache in MB. The least recently "
+            "used papers are evicted beyond this size."
+        ),
+    ),
+    mirror: str = typer.Option(
+        None,
+        "--mirror",
+        help=(
+            "The base URL to download the sources from instead of "
+            "arXiv, e.g. a local mirror of https://export.arxiv.org."
+        ),
+    ),
+    dpath_bulk: str = typer.Option(
+        None,
+        "--bulk-dir",
+        help=(
+            "Read the sources from a local copy of arXiv's bulk "
+            "source archives instead of downloading them."
+        ),
+    ),
+    fpath_snapshot: str = typer.Option(
+        None,
+        "--metadata-snapshot",
+        help=(
+            "Look up the metadata in a local arXiv metadata snapshot "
+            "instead of the arXiv API."
+        ),
+    ),
+    dpath_styles: str = typer.Option(
+        None,
+        "--style-store",
+        help=(
+            "A directory of style files and LaTeXML bindings shared by "
+            "all papers."
+        ),
+    ),
+    backend: str = typer.Option(
+        "bs4",
+        "--backend",
+        help=(
+            "The JATS to Markdown converter: `bs4` or `lxml`."
+        ),
+    ),
+    engine: str = typer.Option(
+        "server",
+        "--engine",
+        help=(
+            "How LaTeXML is run: `latexml`, `latexmlc` or `server`. "
+            "With `server`, warm latexmls servers are kept between "
+            "papers."
+        ),
+    ),
+    timeout: float = typer.Option(
+        None,
+        "--timeout",
+        help=(
+            "The wall-clock limit in seconds for each LaTeXML process."
+        ),
+    ),
+    memory_limit: int = typer.Option(
+        None,
+        "--memory-limit",
+        help=(
+            "The address space limit in MB for each LaTeXML process. "
+            "Not applied with `--engine server`."
+        ),
+    ),
+    cpu_limit: int = typer.Option(
+        None,
+        "--cpu-limit",
+        help=(
+            "The CPU time limit in seconds for each LaTeXML process. "
+            "Not applied with `--engine server`."
+        ),
+    ),
+    no_frontmatter: bool = typer.Option(
+        False,
+        "--no-frontmatter",
+        help=(
+            "The Markdown will not include frontmatter metadata."
+        ),
+    ),
+    verbose: bool = typer.Option(
+        False,
+        "--verbose", "-v",
+        help=(
+            "Log every request."
+        ),
+    ),
+):
+    """
+    Convert papers over HTTP. `POST /jobs` with `{"id": "<arXiv ID>"}`
+    returns a job, and `GET /jobs/<job>/markdown` its Markdown once it
+    is done. The converters stay loaded between papers.
+    """
+    from ._api import ConvertOptions, CONVERTERS
+    from ._convert import ENGINES
+    from ._http import DownloadManager, set_download_manager
+    from ._sources import BulkArchiveSource, set_source_provider
+    from ._metadata import SnapshotResolver, set_resolver
+    from ._styles import StyleStore, set_style_store
+    from ._server import ConversionService, make_server
+
+    if backend not in CONVERTERS:
+        raise typer.BadParameter(
+            f"Choose from {', '.join(CONVERTERS)}.",
+            param_hint="--backend",
+        )
+    if engine not in ENGINES:
+        raise typer.BadParameter(
+            f"Choose from {', '.join(ENGINES)}.",
+            param_hint="--engine",
+        )
+    if mirror:
+        set_download_manager(DownloadManager(base_url=mirror))
+    if dpath_bulk:
+        try:
+            set_source_provider(BulkArchiveSource(dpath_bulk))
+        except OSError as e:
+            raise typer.BadParameter(str(e), param_hint="--bulk-dir")
+    if fpath_snapshot:
+        if not Path(fpath_snapshot).is_file():
+            raise typer.BadParameter(
+                f"No such file: `{fpath_snapshot}`",
+                param_hint="--metadata-snapshot",
+            )
+        set_resolver(SnapshotResolver(fpath_snapshot))
+    if dpath_styles:
+        set_style_store(StyleStore(dpath_styles))
+    if cache_max_size is not None:
+        cache_max_size *= 1024 ** 2
+    if memory_limit is not None:
+        memory_limit *= 1024 ** 2
+
+    service = ConversionService(
+        workers=workers,
+        queue_size=queue_size,
+        deadline=deadline,
+        max_results=max_results,
+        options=ConvertOptions(
+            False, backend, engine,
+            timeout=timeout, memory_limit=memory_limit, cpu_limit=cpu_limit,
+        ),
+        dpath_cache=dpath_cache,
+        cache_max_size=cache_max_size,
+        frontmatter=not no_frontmatter,
+    )
+    with service:
+        server = make_server(service, host, port, verbose)
+        print(f"Serving on http://{host}:{server.server_port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
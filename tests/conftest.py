@@ -0,0 +1,54 @@
+import io
+import tarfile
+from datetime import datetime
+
+import arxiv
+import pytest
+
+from arxiv2md._ids import parse_arxiv_id
+
+
+def make_paper(short_id: str, title: str = "A Paper") -> arxiv.Result:
+    return arxiv.Result(
+        entry_id=f"http://arxiv.org/abs/{short_id}",
+        title=title,
+        published=datetime(2021, 1, 1),
+        authors=[arxiv.Result.Author("Ann Author")],
+    )
+
+
+def make_tarball(files: dict, compression: str = "gz") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=f"w:{compression}") as tar:
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class FakeClient:
+    """
+    An `arxiv.Client` that knows the versions of a few papers and
+    records the ID lists of its queries.
+    """
+
+    def __init__(self, latest: dict):
+        # The latest version of each paper, by its unversioned ID
+        self.latest = latest
+        self.queries = []
+
+    def results(self, search: arxiv.Search):
+        self.queries.append(list(search.id_list))
+        for arxiv_id in search.id_list:
+            parsed = parse_arxiv_id(arxiv_id)
+            latest = self.latest.get(parsed.id)
+            if latest is None or (parsed.version or 0) > latest:
+                continue
+            yield make_paper(f"{parsed.id}v{parsed.version or latest}")
+
+
+@pytest.fixture
+def client():
+    return FakeClient({"2101.00001": 2, "2101.00002": 1, "math/0101001": 3})
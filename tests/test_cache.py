@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from arxiv2md._cache import Cache, converter_version
+from arxiv2md._metadata import MetadataResolver
+from arxiv2md._sources import TarballSource
+
+from conftest import make_paper, make_tarball
+
+
+@pytest.fixture
+def source(tmp_path):
+    fpath = tmp_path / "source.tar.gz"
+    fpath.write_bytes(make_tarball({"main.tex": "\\documentclass{article}"}))
+    return TarballSource(fpath)
+
+
+@pytest.fixture
+def resolver(client):
+    return MetadataResolver(client)
+
+
+def test_get_source_and_lookup(tmp_path, source, resolver):
+    cache = Cache(tmp_path / "cache")
+    with cache.get_source("2101.00001", resolver, source) as entry:
+        assert entry.metadata["arxiv_id"] == "2101.00001"
+        assert entry.metadata["version"] == 2
+        assert (entry.dpath_source_arxiv / "main.tex").exists()
+
+    with cache.lookup("2101.00001v2") as entry:
+        assert entry.metadata["version"] == 2
+    assert cache.lookup("2101.00001v1") is None
+    # Answered with the latest cached version while it is current
+    with cache.lookup("2101.00001") as entry:
+        assert entry.metadata["version"] == 2
+
+
+def test_unversioned_lookup_expires(tmp_path, source, resolver):
+    cache = Cache(tmp_path / "cache", unversioned_ttl=-1)
+    cache.get_source("2101.00001", resolver, source).release()
+    assert cache.lookup("2101.00001") is None
+    assert cache.lookup("2101.00001v2") is not None
+
+
+def test_identical_sources_share_an_object(tmp_path, source, resolver):
+    cache = Cache(tmp_path / "cache")
+    with cache.get_source("2101.00001v1", resolver, source) as first, \
+            cache.get_source("2101.00001v2", resolver, source) as second:
+        assert first.dpath == second.dpath
+    assert list(cache.object_metadata().values()) == [second.metadata]
+
+
+def test_markdown(tmp_path, source, resolver):
+    cache = Cache(tmp_path / "cache")
+    with cache.get_source("2101.00001", resolver, source) as entry:
+        assert cache.read_markdown(entry) is None
+        cache.write_markdown(entry, "# A Paper\n")
+        assert cache.read_markdown(entry) == "# A Paper\n"
+        assert entry.fpath_markdown.name == f"{converter_version()}.md"
+        with pytest.raises(RuntimeError):
+            with cache.open_markdown(entry) as f:
+                f.write("# Cut")
+                raise RuntimeError
+        assert cache.read_markdown(entry) == "# A Paper\n"
+        assert [f.name for f in entry.fpath_markdown.parent.iterdir()] == [
+            entry.fpath_markdown.name
+        ]
+
+
+def test_evicted_object_is_not_found(tmp_path, source, resolver):
+    cache = Cache(tmp_path / "cache", max_size=0)
+    cache.get_source("2101.00001", resolver, source).release()
+    cache.evict()
+    assert os.listdir(cache.dpath_objects) == []
+    assert cache.lookup("2101.00001v2") is None
+    assert os.listdir(cache.dpath_index) == []
+
+
+def test_objects_in_use_are_not_evicted(tmp_path, resolver):
+    pytest.importorskip("fcntl")
+    cache = Cache(tmp_path / "cache", max_size=0)
+    entries = []
+    for i, arxiv_id in enumerate(["2101.00001", "2101.00002"]):
+        fpath = tmp_path / f"{i}.tar.gz"
+        fpath.write_bytes(make_tarball({"main.tex": f"% {i}"}))
+        entries.append(
+            cache.get_source(arxiv_id, resolver, TarballSource(fpath))
+        )
+    entries[1].release()
+    cache.evict()
+    assert os.listdir(cache.dpath_objects) == [entries[0].dpath.name]
+    entries[0].release()
+    cache.evict()
+    assert os.listdir(cache.dpath_objects) == []
+
+
+def test_object_metadata_latest_version(tmp_path, source):
+    cache = Cache(tmp_path / "cache")
+    with open(source.fpath, "rb") as f:
+        cache._store(make_paper("2101.00001v2"), f).release()
+    with open(source.fpath, "rb") as f:
+        cache._store(make_paper("2101.00001v1"), f).release()
+    (metadata,) = cache.object_metadata().values()
+    assert metadata["version"] == 2
@@ -0,0 +1,81 @@
+import pytest
+
+from arxiv2md import _ids
+from arxiv2md._ids import ArxivId, parse_arxiv_id, normalize_ids, file_safe_id
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2101.00001", ArxivId("2101.00001")),
+    ("2101.00001v2", ArxivId("2101.00001", 2)),
+    ("0704.0001", ArxivId("0704.0001")),
+    ("https://arxiv.org/abs/2101.00001v3", ArxivId("2101.00001", 3)),
+    ("https://arxiv.org/pdf/2101.00001.pdf", ArxivId("2101.00001")),
+    ("arXiv:2101.00001", ArxivId("2101.00001")),
+    ("hep-th/9901001", ArxivId("hep-th/9901001")),
+    ("https://arxiv.org/abs/math.GT/0309136v2", ArxivId("math/0309136", 2)),
+    # Not well-formed, but accepted as before IDs were checked
+    ("2101.00001_foo", ArxivId("2101.00001")),
+    ("2113.00001", ArxivId("2113.00001")),
+    ("x2101.00001v2", ArxivId("2101.00001")),
+])
+def test_parse_arxiv_id(text, expected):
+    assert parse_arxiv_id(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "not an id", "2101.001", "hep-th"])
+def test_parse_arxiv_id_invalid(text):
+    with pytest.raises(ValueError):
+        parse_arxiv_id(text)
+
+
+def test_str_and_file_safe_id():
+    assert str(ArxivId("2101.00001", 2)) == "2101.00001v2"
+    assert str(ArxivId("hep-th/9901001")) == "hep-th/9901001"
+    assert file_safe_id("2101.00001v2") == "2101-00001v2"
+    assert file_safe_id("hep-th/9901001") == "hep-th-9901001"
+
+
+def test_normalize_ids():
+    lines = [
+        "2101.00001\n",
+        "oai:arXiv.org:2101.00002v2\n",
+        "\n",
+        "# a comment\n",
+        "https://arxiv.org/abs/2101.00003\n",
+        "math.GT/0309136\n",
+        "2101.00001\n",
+        "2101.00004_foo\n",
+    ]
+    assert list(normalize_ids(lines)) == [
+        "2101.00001", "2101.00002v2", "2101.00003", "math/0309136",
+        "2101.00004",
+    ]
+
+
+def test_normalize_ids_without_versions():
+    lines = ["2101.00001v1", "2101.00001v2", "2101.00002v1"]
+    assert list(normalize_ids(lines, versions=False)) == [
+        "2101.00001", "2101.00002",
+    ]
+
+
+def test_normalize_ids_invalid():
+    with pytest.raises(ValueError):
+        list(normalize_ids(["2101.00001", "not an id"]))
+    invalid = []
+    arxiv_ids = list(normalize_ids(
+        ["2101.00001", "not an id"], on_invalid=invalid.append
+    ))
+    assert arxiv_ids == ["2101.00001"]
+    assert invalid == ["not an id"]
+
+
+def test_normalize_ids_across_chunks(monkeypatch):
+    # Plain chunks, a chunk with a URL, and duplicates across chunks
+    monkeypatch.setattr(_ids, "CHUNK_LINES", 3)
+    lines = [f"2101.{i:05d}\n" for i in range(1, 7)]
+    lines[4] = "https://arxiv.org/abs/2101.00005\n"
+    lines += ["2101.00001\n", "2101.00007\n"]
+    assert list(normalize_ids(lines)) == [
+        f"2101.{i:05d}" for i in range(1, 8)
+    ]
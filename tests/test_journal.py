@@ -0,0 +1,143 @@
+import json
+
+import pytest
+import requests
+
+from arxiv2md import _journal
+from arxiv2md._batch import BatchResult
+from arxiv2md._convert import LaTeXMLError, LaTeXMLNotFoundError
+from arxiv2md._journal import (
+    Journal, arxiv2md_resume, is_transient, shard_of
+)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    # The outcome of each attempt at a paper, by its URL: an exception,
+    # or the Markdown once they run out
+    outcomes = {}
+
+    def arxiv2md_batch(urls, **options):
+        for url in urls:
+            result = BatchResult(url=url, arxiv_id=url)
+            attempts = outcomes.get(url, [])
+            if attempts:
+                result.error = attempts.pop(0)
+            else:
+                result.content_md = f"# {url}\n"
+            yield result
+
+    monkeypatch.setattr(_journal, "arxiv2md_batch", arxiv2md_batch)
+    return outcomes
+
+
+def _resume(tmp_path, urls, **options):
+    return list(arxiv2md_resume(
+        urls, tmp_path / "out", tmp_path / "journal.jsonl", backoff=0,
+        **options,
+    ))
+
+
+def _http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+@pytest.mark.parametrize("error, transient", [
+    (ConnectionError(), True),
+    (TimeoutError(), True),
+    (_http_error(503), True),
+    (_http_error(404), False),
+    (FileNotFoundError(), False),
+    (LaTeXMLNotFoundError(), False),
+    (ValueError(), False),
+    (LaTeXMLError("latexml", None, "", 1.0), True),
+    (LaTeXMLError("latexml", None, "", 1.0, timed_out=True), False),
+    (LaTeXMLError("latexml", 1, "", 1.0), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_shard_of():
+    shards = {shard_of(f"2101.{i:05d}", 4) for i in range(100)}
+    assert shards == {0, 1, 2, 3}
+    assert shard_of("2101.00001v1", 4) == shard_of(
+        "https://arxiv.org/abs/2101.00001v2", 4
+    )
+
+
+def test_done_papers_are_skipped(tmp_path, batch):
+    results = _resume(tmp_path, ["2101.00001", "2101.00002"])
+    assert [r.ok and not r.skipped for r in results] == [True, True]
+    assert results[0].fpath_output.read_text() == "# 2101.00001\n"
+
+    results[1].fpath_output.unlink()
+    results = _resume(tmp_path, ["2101.00001", "2101.00002"])
+    assert [(r.url, r.skipped) for r in results] == [
+        ("2101.00001", True), ("2101.00002", False),
+    ]
+
+
+def test_permanent_failures_are_skipped(tmp_path, batch):
+    batch["2101.00001"] = [ValueError("No such paper")]
+    (result,) = _resume(tmp_path, ["2101.00001"])
+    assert not result.ok
+    (result,) = _resume(tmp_path, ["2101.00001"])
+    assert result.skipped
+    assert str(result.error) == "No such paper"
+
+
+def test_attempts_continue_across_runs(tmp_path, batch):
+    batch["2101.00001"] = [ConnectionError()] * 4
+    (result,) = _resume(tmp_path, ["2101.00001"], retries=2)
+    assert not result.ok and result.attempts == 3
+    (result,) = _resume(tmp_path, ["2101.00001"], retries=2)
+    assert result.ok and result.attempts == 5
+
+    with Journal(tmp_path / "journal.jsonl") as journal:
+        assert journal.load()["2101.00001"]["attempt"] == 5
+
+
+def test_write_errors_are_journaled(tmp_path, batch, monkeypatch):
+    def write_output(dpath_output, result):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(_journal, "_write_output", write_output)
+    results = _resume(tmp_path, ["2101.00001", "2101.00002"], retries=0)
+    assert [type(r.error) for r in results] == [OSError, OSError]
+    with Journal(tmp_path / "journal.jsonl") as journal:
+        records = journal.load()
+    assert [r["status"] for r in records.values()] == ["failed", "failed"]
+    assert all(r["transient"] for r in records.values())
+
+
+def test_missing_latexml_stops_the_run(tmp_path, batch):
+    batch["2101.00002"] = [LaTeXMLNotFoundError("No latexml")]
+    results = arxiv2md_resume(
+        ["2101.00001", "2101.00002", "2101.00003"],
+        tmp_path / "out", tmp_path / "journal.jsonl",
+    )
+    assert next(results).ok
+    with pytest.raises(LaTeXMLNotFoundError):
+        next(results)
+    with Journal(tmp_path / "journal.jsonl") as journal:
+        assert list(journal.load()) == ["2101.00001"]
+
+
+def test_journal_compacts_superseded_lines(tmp_path):
+    fpath = tmp_path / "journal.jsonl"
+    with Journal(fpath) as journal:
+        for attempt in (1, 2):
+            journal.append({"arxiv_id": "2101.00001", "attempt": attempt})
+    with open(fpath, "a") as f:
+        f.write('{"arxiv_id": "2101.0')
+
+    with Journal(fpath) as journal:
+        assert journal.load() == {
+            "2101.00001": {"arxiv_id": "2101.00001", "attempt": 2}
+        }
+    assert [json.loads(line) for line in fpath.open()] == [
+        {"arxiv_id": "2101.00001", "attempt": 2}
+    ]
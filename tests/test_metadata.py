@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from arxiv2md import _metadata
+from arxiv2md._metadata import MetadataResolver, SnapshotResolver
+
+from conftest import make_paper
+
+
+def test_resolve_pages_and_caches(client, monkeypatch):
+    monkeypatch.setattr(_metadata, "PAGE_SIZE", 2)
+    resolver = MetadataResolver(client)
+    papers = resolver.resolve(["2101.00001v1", "2101.00002", "math/0101001"])
+    assert {i: p.get_short_id() for i, p in papers.items()} == {
+        "2101.00001v1": "2101.00001v1",
+        "2101.00002": "2101.00002v1",
+        "math/0101001": "math/0101001v3",
+    }
+    assert len(client.queries) == 2
+    resolver.resolve(["2101.00002", "math/0101001v3"])
+    assert len(client.queries) == 2
+
+
+def test_versioned_query_is_not_the_latest(client):
+    resolver = MetadataResolver(client)
+    resolver.resolve(["2101.00001v1"])
+    assert resolver.cached(["2101.00001"]) == {}
+    assert resolver.get("2101.00001").get_short_id() == "2101.00001v2"
+    assert client.queries == [["2101.00001v1"], ["2101.00001"]]
+
+
+def test_unversioned_key_expires(client):
+    resolver = MetadataResolver(client, unversioned_ttl=-1)
+    resolver.resolve(["2101.00001"])
+    assert resolver.cached(["2101.00001"]) == {}
+    # The versioned key does not expire
+    assert "2101.00001v2" in resolver.cached(["2101.00001v2"])
+
+
+def test_add_keeps_the_latest_version():
+    resolver = MetadataResolver(client=object())
+    resolver.add(
+        [make_paper("2101.00001v2"), make_paper("2101.00001v1")],
+        queried=["2101.00001"],
+    )
+    paper = resolver.cached(["2101.00001"])["2101.00001"]
+    assert paper.get_short_id() == "2101.00001v2"
+    resolver.add([make_paper("2101.00002v1")], queried=["2101.00002v1"])
+    assert resolver.cached(["2101.00002"]) == {}
+
+
+def test_max_cached(client):
+    resolver = MetadataResolver(client, max_cached=2)
+    resolver.resolve(["2101.00001v1", "2101.00001v2", "2101.00002v1"])
+    assert list(resolver.cached(
+        ["2101.00001v1", "2101.00001v2", "2101.00002v1"]
+    )) == ["2101.00001v2", "2101.00002v1"]
+
+
+def test_get_missing(client):
+    with pytest.raises(ValueError):
+        MetadataResolver(client).get("2101.09999")
+    with pytest.raises(ValueError):
+        MetadataResolver(client).get("2101.00002v2")
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    records = [
+        {
+            "id": "2101.00001",
+            "title": "An  Old\n Title",
+            "authors": "Ann Author, Bob Author",
+            "categories": "cs.LG stat.ML",
+            "versions": [
+                {"version": "v1", "created": "Mon, 4 Jan 2021 10:00:00 GMT"},
+                {"version": "v2", "created": "Tue, 2 Feb 2021 10:00:00 GMT"},
+            ],
+        },
+        {
+            "id": "math/0101001",
+            "title": "Old Style",
+            "authors_parsed": [["Author", "Ann", ""], ["Author", "Bob", "Jr"]],
+            "versions": [
+                {"version": "v1", "created": "Mon, 1 Jan 2001 10:00:00 GMT"},
+            ],
+        },
+    ]
+    fpath = tmp_path / "snapshot.jsonl"
+    fpath.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return fpath
+
+
+def test_snapshot_versions(snapshot):
+    resolver = SnapshotResolver(snapshot)
+    latest = resolver.get("2101.00001")
+    assert latest.get_short_id() == "2101.00001v2"
+    assert latest.title == "An Old Title"
+    assert [a.name for a in latest.authors] == ["Ann Author", "Bob Author"]
+    assert latest.primary_category == "cs.LG"
+    assert str(latest.published.date()) == "2021-01-04"
+    assert str(latest.updated.date()) == "2021-02-02"
+
+    first = resolver.get("2101.00001v1")
+    assert first.get_short_id() == "2101.00001v1"
+    assert str(first.updated.date()) == "2021-01-04"
+    with pytest.raises(ValueError):
+        resolver.get("2101.00001v3")
+    with pytest.raises(ValueError):
+        resolver.get("2101.09999")
+
+
+def test_snapshot_old_style_and_index(snapshot):
+    resolver = SnapshotResolver(snapshot)
+    paper = resolver.get("math/0101001")
+    assert paper.get_short_id() == "math/0101001v1"
+    assert [a.name for a in paper.authors] == ["Ann Author", "Bob Author Jr"]
+    assert resolver.fpath_index.exists()
@@ -0,0 +1,106 @@
+import io
+import tarfile
+
+import pytest
+
+from arxiv2md._index import OffsetIndex
+from arxiv2md._metadata import MetadataResolver
+from arxiv2md._sources import (
+    BulkArchiveSource, DirectorySource, TarballSource, _bulk_member_id
+)
+
+from conftest import make_paper
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("2301/2301.00001.gz", ("2301.00001", "")),
+    ("2301/2301.00002v2.gz", ("2301.00002", "2")),
+    ("0704/0704.0001.pdf", ("0704.0001", "")),
+    ("0001/astro-ph0001001.gz", ("astro-ph/0001001", "")),
+    ("0101/math.AG0101001v3.gz", ("math/0101001", "3")),
+    ("0101/hep-th0101001", ("hep-th/0101001", "")),
+    ("README", None),
+])
+def test_bulk_member_id(name, expected):
+    assert _bulk_member_id(name) == expected
+
+
+@pytest.fixture
+def dpath_bulk(tmp_path):
+    members = {
+        "2301/2301.00001.gz": b"2301.00001",
+        "2301/2301.00002v2.gz": b"2301.00002v2",
+        "0101/math0101001.gz": b"math/0101001",
+        "2301/README": b"",
+    }
+    with tarfile.open(tmp_path / "arXiv_src_2301_001.tar", "w") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return tmp_path
+
+
+@pytest.fixture
+def bulk(dpath_bulk, client):
+    client.latest.update({"2301.00001": 3, "2301.00002": 3})
+    return BulkArchiveSource(dpath_bulk, resolver=MetadataResolver(client))
+
+
+def _read(source, short_id: str) -> bytes:
+    with source.open(make_paper(short_id)) as f:
+        return f.read()
+
+
+def test_bulk_archive_versions(bulk):
+    # Without a version in the member name, the latest one is archived
+    assert _read(bulk, "2301.00001v3") == b"2301.00001"
+    assert _read(bulk, "math/0101001v3") == b"math/0101001"
+    assert _read(bulk, "2301.00002v2") == b"2301.00002v2"
+    for short_id in ["2301.00001v1", "2301.00002v1", "2301.09999v1"]:
+        with pytest.raises(FileNotFoundError):
+            _read(bulk, short_id)
+    assert bulk.fpath_index.exists()
+
+
+def test_bulk_archive_fallback(bulk, tmp_path):
+    fpath = tmp_path / "fallback.tar"
+    fpath.write_bytes(b"fallback")
+    bulk.fallback = TarballSource(fpath)
+    assert _read(bulk, "2301.00001v1") == b"fallback"
+    assert _read(bulk, "2301.09999v1") == b"fallback"
+    assert _read(bulk, "2301.00001v3") == b"2301.00001"
+
+
+def test_bulk_index_without_versions(bulk, dpath_bulk):
+    # Indexes written before versions were recorded
+    bulk.build_index()
+    index = OffsetIndex(bulk.fpath_index)
+    rows = [
+        [key, *index.get(key)[:3]]
+        for key in ["2301.00001", "2301.00002", "math/0101001"]
+    ]
+    index.close()
+    OffsetIndex.write(bulk.fpath_index, rows)
+    assert _read(bulk, "2301.00001v3") == b"2301.00001"
+    # Taken for the latest version, v3, without the member name's v2
+    with pytest.raises(FileNotFoundError):
+        _read(bulk, "2301.00002v2")
+
+
+def test_bulk_archive_missing_directory(tmp_path):
+    with pytest.raises(NotADirectoryError):
+        BulkArchiveSource(tmp_path / "missing")
+
+
+def test_directory_source_is_reproducible(tmp_path):
+    dpath = tmp_path / "source"
+    (dpath / "figures").mkdir(parents=True)
+    (dpath / "main.tex").write_text("\\documentclass{article}")
+    (dpath / "figures" / "a.png").write_bytes(b"png")
+    source = DirectorySource(dpath)
+    data = _read(source, "2101.00001v1")
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        assert tar.getnames() == ["figures/a.png", "main.tex"]
+    (dpath / "main.tex").touch()
+    assert _read(source, "2101.00001v1") == data